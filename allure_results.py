@@ -0,0 +1,54 @@
+# allure_results.py
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Attachments are read up to this many bytes and truncated beyond it.
+ATTACHMENT_MAX_BYTES = 64 * 1024
+
+# Attachment MIME type prefixes that carry no text worth embedding.
+SKIPPED_ATTACHMENT_TYPES = (
+    "image/", "video/", "audio/", "application/octet-stream", "application/zip", "application/x-tar",
+)
+
+
+def iter_result_files(results_dir):
+    """
+    Yield the paths of all `*-result.json` files under `results_dir`; a
+    missing directory has none.
+    """
+    try:
+        entries = os.scandir(results_dir)
+    except (FileNotFoundError, NotADirectoryError) as exc:
+        logger.warning("Skipping missing Allure results directory %s: %s", results_dir, exc)
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_result_files(entry.path)
+            elif entry.name.endswith("-result.json"):
+                yield entry.path
+
+
+def read_attachment(results_dir, attachment, max_bytes=ATTACHMENT_MAX_BYTES):
+    """
+    Read a text attachment, truncated to `max_bytes`; binary types are skipped.
+    """
+    if attachment.get("type", "").startswith(SKIPPED_ATTACHMENT_TYPES):
+        return None
+    attachment_path = os.path.join(results_dir, attachment["source"])
+    if not os.path.exists(attachment_path):
+        return None
+    with open(attachment_path, "rb") as file:
+        data = file.read(max_bytes + 1)
+    text = data[:max_bytes].decode("utf-8", errors="replace")
+    if len(data) > max_bytes:
+        text += f"\n[truncated at {max_bytes} bytes]"
+    return text
+
+
+def load_json(path):
+    with open(path, "r") as file:
+        return json.load(file)
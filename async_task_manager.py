@@ -0,0 +1,18 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import async_engine, get_async_session
+from task_queries import ndjson_lines, stream_statement
+from task_routes import make_router
+
+
+async def _stream_tasks(statement):
+    """
+    Yield tasks as NDJSON, one batch of lines per chunk of the database cursor.
+    """
+    async with AsyncSession(async_engine) as session:
+        result = await session.stream(stream_statement(statement))
+        async for rows in result.partitions():
+            yield ndjson_lines(rows)
+
+
+router = make_router(get_async_session, _stream_tasks, asynchronous=True)
@@ -0,0 +1,108 @@
+"""
+Compare request throughput of the sync (threadpool) and async (event loop)
+database modes of the task API under concurrent load.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_db_modes --rows 10000 --requests 2000 --concurrency 1 16 64 256
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _run_load(app, total_requests: int, concurrency: int, max_id: int):
+    import httpx
+
+    latencies = []
+    queue = asyncio.Queue()
+    for index in range(total_requests):
+        queue.put_nowait(index)
+
+    async def worker(client):
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            # Mix first pages, deep keyset pages and filtered pages.
+            params = {"limit": 50}
+            if index % 3 == 1:
+                params["after_id"] = (index * 7919) % max_id
+            elif index % 3 == 2:
+                params["status"] = "completed"
+            started = time.perf_counter()
+            response = await client.get("/tasks/", params=params)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests_per_second": total_requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def _seed(engine, rows: int):
+    from sqlalchemy import insert
+    from sqlmodel import SQLModel
+    from db_models import Task
+
+    SQLModel.metadata.create_all(engine)
+    statuses = ("pending", "in_progress", "completed")
+    with engine.begin() as connection:
+        connection.execute(insert(Task.__table__), [
+            {"title": f"Task {index}", "description": None, "status": statuses[index % 3],
+             "created_at": Task.model_fields["created_at"].default_factory()}
+            for index in range(rows)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The engines are configured from the environment at import time. Give
+        # them at least as many connections as there are concurrent requests.
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["DATABASE_PROFILE"] = "production"
+        os.environ["DATABASE_POOL_SIZE"] = str(max(args.concurrency) + 40)
+        import database
+        from task_manager import create_app
+
+        _seed(database.engine, args.rows)
+
+        async def run_all():
+            print(f"{'mode':<6} {'concurrency':>11} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+            for async_mode in (False, True):
+                app = create_app(async_mode=async_mode)
+                for concurrency in args.concurrency:
+                    stats = await _run_load(app, args.requests, concurrency, args.rows)
+                    print(f"{'async' if async_mode else 'sync':<6} {concurrency:>11} "
+                          f"{stats['requests_per_second']:>10.1f} {stats['p50_ms']:>9.2f} "
+                          f"{stats['p99_ms']:>9.2f}")
+            await database.async_engine.dispose()
+
+        asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Measure EmbeddingScheduler throughput against the local stub embedding server
+at several in-flight limits.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_embedding_scheduler --texts 5000 --in-flight 1 2 4 8 16
+"""
+import argparse
+import threading
+import time
+
+
+def start_stub_server(port: int, latency: float, max_concurrent: int, dimensions: int):
+    import uvicorn
+    from benchmarks.stub_embedding_server import create_stub_app
+
+    app = create_stub_app(dimensions=dimensions, latency=latency, max_concurrent=max_concurrent)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    # Small vectors keep the in-process stub's JSON encoding from dominating.
+    parser.add_argument("--dimensions", type=int, default=32)
+    args = parser.parse_args()
+
+    from langchain_openai import OpenAIEmbeddings
+    from vectorizer import EmbeddingScheduler
+
+    server, thread, app = start_stub_server(args.port, args.latency, args.max_concurrent, args.dimensions)
+    texts = [f"Test Name: test_{index}\nStatus: passed\nStep Name: Send GET request {index}" for index in range(args.texts)]
+    client = OpenAIEmbeddings(base_url=f"http://127.0.0.1:{args.port}/v1", api_key="stub",
+                              check_embedding_ctx_length=False, max_retries=0)
+
+    print(f"{'in-flight':>9} {'texts/s':>10} {'tokens/s':>10} {'requests':>9} {'retries':>8}")
+    for max_in_flight in args.in_flight:
+        scheduler = EmbeddingScheduler(client, batch_size=args.batch_size, max_in_flight=max_in_flight,
+                                       backoff_base=0.05)
+        scheduler.embed_documents(texts)
+        metrics = scheduler.metrics.as_dict()
+        print(f"{max_in_flight:>9} {metrics['texts_per_second']:>10.1f} {metrics['tokens_per_second']:>10.1f} "
+              f"{metrics['requests']:>9} {metrics['retries']:>8}")
+
+    server.should_exit = True
+    thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Benchmark the task API, Allure ingestion and RAG retrieval, and write the
+results as JSON so that runs can be compared for regressions.
+
+Run from the repository root:
+
+    python -m benchmarks.run_suite --rows 10000 100000 --concurrency 1 16 64 --output bench.json
+    python -m benchmarks.run_suite --only ingest retrieval --compare bench.json
+    python -m benchmarks.run_suite --only serialization --page-sizes 100 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STATUSES = ("pending", "in_progress", "completed")
+# Task API scenarios served through the response cache; all others bypass it.
+CACHED_SCENARIOS = ("list_first_page_cached",)
+SEED_CHUNK_ROWS = 100_000
+
+# Metrics where a larger value is better; for all others smaller is better.
+HIGHER_IS_BETTER = {"requests_per_second", "documents_per_second", "results_per_second", "queries_per_second",
+                    "pages_per_second"}
+# Fields identifying a result, as opposed to its measured metrics.
+KEY_FIELDS = ("benchmark", "mode", "rows", "scenario", "concurrency", "results", "cache", "path")
+
+
+def latency_stats(latencies):
+    """
+    p50/p95/p99/max in milliseconds of latencies given in seconds.
+    """
+    ordered = sorted(latencies)
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(rank(0.95), 3),
+        "p99_ms": round(rank(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+# Task API
+
+def task_api_scenarios(max_id: int):
+    """
+    Request factories per scenario; each takes the request index.
+    """
+    return {
+        "list_first_page": lambda index: ("GET", "/tasks/", {"limit": 50}),
+        "list_first_page_cached": lambda index: ("GET", "/tasks/", {"limit": 50}),
+        "list_keyset_page": lambda index: ("GET", "/tasks/", {"limit": 50, "after_id": (index * 7919) % max_id}),
+        "list_by_status": lambda index: ("GET", "/tasks/", {"limit": 50, "status": STATUSES[index % 3]}),
+        "read_task": lambda index: ("GET", f"/tasks/{(index * 7919) % max_id + 1}/", None),
+        "create_task": lambda index: ("POST", "/tasks/", {"title": f"Bench {index}", "description": "load test"}),
+        "update_status": lambda index: ("PUT", f"/tasks/{(index * 7919) % max_id + 1}/",
+                                        {"status": STATUSES[index % 3]}),
+    }
+
+
+async def run_load(app, make_request, total_requests: int, concurrency: int):
+    import httpx
+
+    latencies = []
+    errors = 0
+    next_index = iter(range(total_requests))
+
+    async def worker(client):
+        nonlocal errors
+        for index in next_index:
+            method, url, payload = make_request(index)
+            started = time.perf_counter()
+            if method == "POST":
+                response = await client.post(url, json=payload)
+            else:
+                response = await client.request(method, url, params=payload)
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"requests": total_requests, "errors": errors,
+            "requests_per_second": round(total_requests / elapsed, 1), **latency_stats(latencies)}
+
+
+def seed_tasks(engine, start: int, stop: int):
+    from sqlalchemy import insert
+    from db_models import Task
+
+    created_at = Task.model_fields["created_at"].default_factory
+    for chunk_start in range(start, stop, SEED_CHUNK_ROWS):
+        with engine.begin() as connection:
+            connection.execute(insert(Task.__table__), [
+                {"title": f"Task {index}", "description": None, "status": STATUSES[index % 3],
+                 "created_at": created_at()}
+                for index in range(chunk_start, min(stop, chunk_start + SEED_CHUNK_ROWS))
+            ])
+
+
+def bench_task_api(directory, row_counts, concurrency_levels, total_requests, modes, scenarios=None):
+    """
+    Measure every scenario at every table size and concurrency level. The
+    table is grown between sizes instead of being rebuilt. The response cache
+    is disabled except for CACHED_SCENARIOS, which are labelled as such, so
+    the other reads measure SQLite at every size.
+    """
+    # The engines are configured from the environment at import time. Give
+    # them at least as many connections as there are concurrent requests.
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ["DATABASE_PROFILE"] = "production"
+    os.environ["DATABASE_POOL_SIZE"] = str(max(concurrency_levels) + 40)
+    import database
+    from sqlmodel import SQLModel
+    from cache import task_cache
+    from task_manager import create_app
+
+    SQLModel.metadata.create_all(database.engine)
+    cache_entries = task_cache.max_entries
+    results = []
+
+    async def run_all():
+        seeded = 0
+        for rows in sorted(row_counts):
+            seed_tasks(database.engine, seeded, rows)
+            seeded = rows
+            for mode in modes:
+                app = create_app(async_mode=mode == "async")
+                for scenario, make_request in task_api_scenarios(rows).items():
+                    if scenarios and scenario not in scenarios:
+                        continue
+                    cached = scenario in CACHED_SCENARIOS
+                    for concurrency in concurrency_levels:
+                        # Start empty so no run reuses pages cached by another mode or scenario
+                        task_cache.max_entries = cache_entries if cached else 0
+                        task_cache.invalidate()
+                        stats = await run_load(app, make_request, total_requests, concurrency)
+                        results.append({"benchmark": "task_api", "mode": mode, "rows": rows, "scenario": scenario,
+                                        "concurrency": concurrency, **({"cache": "warm"} if cached else {}),
+                                        **stats})
+                        print(json.dumps(results[-1]), file=sys.stderr)
+        task_cache.max_entries = cache_entries
+        await database.async_engine.dispose()
+
+    asyncio.run(run_all())
+    return results
+
+
+def response_model_page(session, statement) -> bytes:
+    """
+    What FastAPI does for `response_model=List[TaskRead]`: load ORM objects,
+    validate each into TaskRead, dump to JSON-able data and encode with json.
+    """
+    from typing import List
+    from pydantic import TypeAdapter
+    from db_models import TaskRead
+
+    adapter = TypeAdapter(List[TaskRead])
+    tasks = session.exec(statement).all()
+    content = adapter.dump_python(adapter.validate_python(tasks, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def tuples_page(session, statement) -> bytes:
+    from task_queries import columns_statement, serialize_task_rows
+
+    return serialize_task_rows(session.execute(columns_statement(statement)).all())
+
+
+def bench_serialization(directory, page_sizes, total_pages: int = 200):
+    """
+    Time building a task list page through the response_model path and the
+    column-tuple path the API uses, without the HTTP stack or the response
+    cache. Both must produce the same JSON.
+    """
+    from sqlalchemy import create_engine
+    from sqlmodel import Session, SQLModel
+    from task_queries import tasks_statement
+
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'serialization.db')}")
+    SQLModel.metadata.create_all(engine)
+    seed_tasks(engine, 0, max(page_sizes))
+    paths = {"response_model": response_model_page, "tuples": tuples_page}
+    results = []
+    for page_size in page_sizes:
+        statement = tasks_statement(None, None, None, None).limit(page_size)
+        with Session(engine) as session:
+            pages = {path: json.loads(build(session, statement)) for path, build in paths.items()}
+        if pages["response_model"] != pages["tuples"]:
+            raise AssertionError(f"The serialization paths disagree on a page of {page_size} tasks")
+        for path, build in paths.items():
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(total_pages):
+                page_started = time.perf_counter()
+                # A session per page, as per request in the API, so no ORM objects are reused.
+                with Session(engine) as session:
+                    build(session, statement)
+                latencies.append(time.perf_counter() - page_started)
+            elapsed = time.perf_counter() - started
+            results.append({"benchmark": "serialization", "rows": page_size, "path": path,
+                            "pages_per_second": round(total_pages / elapsed, 1), **latency_stats(latencies)})
+            print(json.dumps(results[-1]), file=sys.stderr)
+    engine.dispose()
+    return results
+
+
+# Ingestion and retrieval
+
+def write_allure_results(results_dir, count: int, steps: int = 5):
+    """
+    Write `count` synthetic Allure results shaped like the ones test_main.py produces.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    for index in range(count):
+        uuid = f"bench-{index:08d}"
+        result_steps = []
+        for step in range(steps):
+            attachments = []
+            for name, text in (("Request URL", f"http://127.0.0.1:8000/tasks/{index}/"),
+                               ("Response Status", "200"),
+                               ("Response Body", json.dumps({"id": index, "title": f"Task {index}", "step": step}))):
+                source = f"{uuid}-{step}-{name.replace(' ', '-').lower()}-attachment.txt"
+                with open(os.path.join(results_dir, source), "w") as file:
+                    file.write(text)
+                attachments.append({"name": name, "source": source, "type": "text/plain"})
+            result_steps.append({"name": f"Send PUT request {step}", "status": "passed", "start": 1000 + step * 10,
+                                 "stop": 1005 + step * 10 + index % 7, "attachments": attachments})
+        result = {"uuid": uuid, "name": f"test_update_task_{index}", "fullName": f"test_main#test_{index}",
+                  "status": "passed" if index % 10 else "failed", "start": 1000, "stop": 1100 + index % 50,
+                  "labels": [{"name": "feature", "value": "Task Management"},
+                             {"name": "story", "value": f"Story {index % 5}"}],
+                  "steps": result_steps}
+        with open(os.path.join(results_dir, f"{uuid}-result.json"), "w") as file:
+            json.dump(result, file)
+
+
+def swagger_json():
+    from task_manager import create_app
+
+    return create_app().openapi()
+
+
+def make_fake_embeddings(dimensions: int):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    return DeterministicFakeEmbedding(size=dimensions)
+
+
+def bench_ingest(directory, result_counts, dimensions: int = 256):
+    """
+    Time a full CombinedVectorizer ingest, then a re-run that finds nothing changed.
+    """
+    from vectorizer import CombinedVectorizer
+
+    spec = swagger_json()
+    results = []
+    for count in result_counts:
+        results_dir = os.path.join(directory, f"allure-{count}")
+        write_allure_results(results_dir, count)
+        vector_db = os.path.join(directory, f"vector_db-{count}")
+        for run in ("cold", "unchanged"):
+            vectorizer = CombinedVectorizer("http://bench.invalid/openapi.json", results_dir, vector_db,
+                                            embeddings=make_fake_embeddings(dimensions))
+            vectorizer.fetch_swagger_json = lambda: spec
+            started = time.perf_counter()
+            store = vectorizer.process_and_store()
+            elapsed = time.perf_counter() - started
+            documents = store.index.ntotal
+            results.append({"benchmark": "ingest", "results": count, "scenario": run, "documents": documents,
+                            "seconds": round(elapsed, 3), "results_per_second": round(count / elapsed, 1),
+                            "documents_per_second": round(documents / elapsed, 1)})
+            print(json.dumps(results[-1]), file=sys.stderr)
+    return results
+
+
+def bench_retrieval(vector_db: str, total_queries: int = 200, dimensions: int = 256):
+    """
+    Latency of retrieve_context for free-text and exact-key queries, with
+    cold and warm caches.
+    """
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from rag import RAGTestCoverageAnalysis
+
+    analyzer = RAGTestCoverageAnalysis(vector_db, embeddings=make_fake_embeddings(dimensions),
+                                       llm=FakeListChatModel(responses=["ok"]))
+    scenarios = {
+        "free_text": [f"Which tests check updating task {index} and its status codes?"
+                      for index in range(total_queries)],
+        "exact_key": [f"PUT /tasks/{{task_id}}/ bench-{index:08d}" for index in range(total_queries)],
+    }
+    results = []
+    for scenario, queries in scenarios.items():
+        for cache in ("cold", "warm"):
+            latencies = []
+            started = time.perf_counter()
+            for query in queries:
+                query_started = time.perf_counter()
+                analyzer.retrieve_context(query)
+                latencies.append(time.perf_counter() - query_started)
+            elapsed = time.perf_counter() - started
+            results.append({"benchmark": "retrieval", "scenario": scenario, "cache": cache,
+                            "queries_per_second": round(len(queries) / elapsed, 1), **latency_stats(latencies)})
+            print(json.dumps(results[-1]), file=sys.stderr)
+    return results
+
+
+# Reporting
+
+def result_key(result):
+    return tuple((field, result[field]) for field in KEY_FIELDS if field in result)
+
+
+def compare_results(baseline, current, tolerance: float = 0.1, min_delta_ms: float = 0.1):
+    """
+    Metrics of `current` that are worse than the same result of `baseline`
+    by more than `tolerance`. Latencies must also have grown by `min_delta_ms`,
+    so that timer noise on sub-millisecond paths is not reported.
+    """
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        for metric, value in result.items():
+            if metric in KEY_FIELDS or not isinstance(value, (int, float)) or not before.get(metric):
+                continue
+            if not (metric.endswith("_ms") or metric in HIGHER_IS_BETTER):
+                continue
+            if metric.endswith("_ms") and value - before[metric] < min_delta_ms:
+                continue
+            change = (value - before[metric]) / before[metric]
+            if (-change if metric in HIGHER_IS_BETTER else change) > tolerance:
+                regressions.append({"key": dict(result_key(result)), "metric": metric,
+                                    "baseline": before[metric], "current": value, "change": round(change, 3)})
+    return regressions
+
+
+def run_metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": time.time(), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "args": vars(args)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=["task_api", "serialization", "ingest", "retrieval"],
+                        default=["task_api", "serialization", "ingest", "retrieval"])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000],
+                        help="Task table sizes, e.g. 10000 100000 1000000 10000000")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--scenarios", nargs="+", help="Task API scenarios to run (default: all)")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[100, 1000],
+                        help="Task list page sizes for the serialization benchmark")
+    parser.add_argument("--pages", type=int, default=200, help="Pages built per serialization path and size")
+    parser.add_argument("--allure-results", type=int, nargs="+", default=[1000],
+                        help="Synthetic Allure result counts to ingest")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--min-delta-ms", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        # The embedding cache is keyed by text; a shared one would turn the ingest into cache reads.
+        os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(directory, "embedding_cache.db"))
+        if "task_api" in args.only:
+            results += bench_task_api(directory, args.rows, args.concurrency, args.requests, args.modes,
+                                      args.scenarios)
+        if "serialization" in args.only:
+            results += bench_serialization(directory, args.page_sizes, args.pages)
+        if "ingest" in args.only or "retrieval" in args.only:
+            ingest_results = bench_ingest(directory, args.allure_results, args.dimensions)
+            if "ingest" in args.only:
+                results += ingest_results
+        if "retrieval" in args.only:
+            vector_db = os.path.join(directory, f"vector_db-{args.allure_results[-1]}")
+            results += bench_retrieval(vector_db, args.queries, args.dimensions)
+
+    report = {"meta": run_metadata(args), "results": results}
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare_results(json.load(file), report, args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression['key']} {regression['metric']}: "
+                  f"{regression['baseline']} -> {regression['current']} ({regression['change']:+.0%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint, for benchmarking and
+testing the embedding pipeline without network access or API costs.
+
+Vectors are derived from a hash of each input, so they are deterministic.
+Each request sleeps for a fixed latency plus a per-input cost, and requests
+beyond `max_concurrent` are rejected with 429 and a Retry-After header, like
+a rate-limited API.
+
+    python -m benchmarks.stub_embedding_server --port 8100 --latency 0.05 --max-concurrent 8
+"""
+import argparse
+import asyncio
+import hashlib
+from typing import List, Union
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class EmbeddingRequest(BaseModel):
+    input: Union[str, List[str], List[int], List[List[int]]]
+    model: str = "stub-embedding"
+
+
+def stub_vector(value, dimensions: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(str(value).encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_stub_app(dimensions: int = 256, latency: float = 0.05, per_input_latency: float = 0.0005,
+                    max_concurrent: int = 8, retry_after: float = 0.1) -> FastAPI:
+    app = FastAPI(title="Stub Embedding Server")
+    app.state.stats = {"requests": 0, "inputs": 0, "rejected": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @app.post("/v1/embeddings")
+    async def create_embeddings(request: EmbeddingRequest):
+        stats = app.state.stats
+        inputs = request.input
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        if stats["in_flight"] >= max_concurrent:
+            stats["rejected"] += 1
+            return JSONResponse(status_code=429, headers={"Retry-After": str(retry_after)},
+                                content={"error": {"message": "Rate limit reached", "type": "rate_limit"}})
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(latency + per_input_latency * len(inputs))
+        finally:
+            stats["in_flight"] -= 1
+        stats["requests"] += 1
+        stats["inputs"] += len(inputs)
+
+        tokens = sum(len(value) // 4 + 1 for value in inputs)
+        return {
+            "object": "list",
+            "model": request.model,
+            "data": [{"object": "embedding", "index": index, "embedding": stub_vector(value, dimensions)}
+                     for index, value in enumerate(inputs)],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub OpenAI embeddings server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    args = parser.parse_args()
+
+    app = create_stub_app(dimensions=args.dimensions, latency=args.latency, max_concurrent=args.max_concurrent)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
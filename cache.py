@@ -0,0 +1,122 @@
+# cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Optional
+
+from fastapi import Response
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    version: int = 0
+    expires_at: float = 0.0
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of serialized responses with a TTL.
+
+    Every committed write bumps `version`, which invalidates all entries at
+    once. Readers capture the version before querying the database and store
+    their result under it, so a response computed from data older than a
+    concurrent write is never served afterwards. The cache is per process:
+    with several workers, each one only sees its own writes immediately and
+    the others' once the TTL expires. A `max_entries` of 0 disables caching.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != self.version or entry.expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, body: bytes, version: int,
+            headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        entry = CachedResponse(body, etag, headers or {}, version, time.monotonic() + self.ttl)
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU mapping holding at most `max_entries` items.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def cached_response(entry: CachedResponse, if_none_match: Optional[str]) -> Response:
+    """
+    Answer with 304 when the client already has this entry, otherwise with its body.
+    """
+    headers = {"ETag": entry.etag, **entry.headers}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+task_cache = ResponseCache(
+    max_entries=int(os.getenv("TASK_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TASK_CACHE_TTL", "30")),
+)
@@ -0,0 +1,45 @@
+# chunking.py
+import os
+from typing import List
+
+from langchain_core.documents import Document
+
+from tokens import count_tokens, split_by_tokens
+
+# Upper bound on the tokens of one chunk, well below embedding model limits.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+
+
+def chunk_blocks(blocks: List[str], metadata: dict, context: str = "",
+                 max_tokens: int = CHUNK_MAX_TOKENS) -> List[Document]:
+    """
+    Pack consecutive text blocks (a test header, a step, an attachment, ...)
+    into chunks of at most `max_tokens` tokens, splitting only blocks that are
+    too large on their own. Every chunk after the first starts with `context`
+    so that it still names the test or endpoint it belongs to, and carries the
+    parent's metadata plus its position as `chunk` of `chunks`.
+    """
+    budget = max(1, max_tokens - count_tokens(context))
+    pieces = []
+    for block in blocks:
+        tokens = count_tokens(block)
+        if tokens <= budget:
+            pieces.append((block, tokens))
+        else:
+            pieces.extend((piece, count_tokens(piece)) for piece in split_by_tokens(block, budget))
+
+    chunks, current, current_tokens = [], [], 0
+    for piece, tokens in pieces:
+        if current and current_tokens + tokens > budget:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current or not chunks:
+        chunks.append("".join(current))
+
+    return [
+        Document(page_content=text if index == 0 else context + text,
+                 metadata={**metadata, "chunk": index, "chunks": len(chunks)})
+        for index, text in enumerate(chunks)
+    ]
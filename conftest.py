@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from vector_store import FaissVectorStore
+
+COVERAGE_SWAGGER_JSON = {
+    "paths": {
+        "/tasks/": {
+            "get": {"responses": {"200": {"description": "OK"}, "422": {"description": "Invalid"}}},
+            "post": {"responses": {"201": {"description": "Created"}, "422": {"description": "Invalid"}}},
+        },
+        "/tasks/bulk/": {
+            "delete": {"responses": {"200": {"description": "OK"}}},
+        },
+        "/tasks/{task_id}/": {
+            "put": {"responses": {"200": {"description": "OK"}, "404": {"description": "Not Found"}}},
+            "delete": {"responses": {"200": {"description": "OK"}, "404": {"description": "Not Found"}}},
+        },
+    }
+}
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """
+    Offline embedder that records every text it is asked to embed.
+    """
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return super().embed_query(text)
+
+    @property
+    def texts(self):
+        return [text for call in self.calls for text in call]
+
+
+def write_result(results_dir, uuid, name, requests, status="passed", start=1000):
+    steps = []
+    for index, (method, url, status_code, duration) in enumerate(requests):
+        attachments = []
+        for attachment_name, text in [("Request URL", url), ("Response Status", str(status_code))]:
+            source = f"{uuid}-{index}-{attachment_name.replace(' ', '-')}-attachment.txt"
+            (results_dir / source).write_text(text)
+            attachments.append({"name": attachment_name, "source": source, "type": "text/plain"})
+        steps.append({"name": f"Send {method} request", "status": status, "start": start, "stop": start + duration,
+                      "attachments": attachments})
+    # A step without a request, which must not count as one
+    steps.append({"name": "Check the response", "status": status, "start": start + 1000, "stop": start + 1001})
+    result = {"uuid": uuid, "name": name, "status": status, "start": start, "stop": start + 2000, "steps": steps}
+    (results_dir / f"{uuid}-result.json").write_text(json.dumps(result))
+
+
+@pytest.fixture(scope="session")
+def create_task_app(tmp_path_factory):
+    """
+    Return task_manager.create_app bound to a throwaway database. The engines
+    are built when database is first imported, so tests must get the app from
+    here instead of importing task_manager themselves.
+    """
+    url = f"sqlite:///{tmp_path_factory.mktemp('tasks-db') / 'tasks.db'}"
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("DATABASE_URL", url)
+        monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+        import task_manager
+    import database
+    assert database.DATABASE_URL == url, "database was imported before the fixture"
+    return task_manager.create_app
+
+
+@pytest.fixture
+def vector_db(tmp_path):
+    path = tmp_path / "vector_db"
+    store = FaissVectorStore.create(str(path), CountingEmbeddings(size=8))
+    texts = [f"Test Name: test_{index}\nUUID: uuid-{index}" for index in range(20)]
+    metadatas = [{"source": "allure", "uuid": f"uuid-{index}"} for index in range(20)]
+    for method, endpoint in [("get", "/tasks/"), ("post", "/tasks/"), ("put", "/tasks/{task_id}/")]:
+        texts.append(f"Path: {endpoint}\nMethod: {method.upper()}")
+        metadatas.append({"source": "swagger", "path": endpoint, "method": method})
+    store.add_texts(texts, metadatas, ids=[f"doc-{index}" for index in range(len(texts))])
+    store.save()
+    (path / "manifest.json").write_text(json.dumps({"version": 1, "documents": {}}))
+    return path
@@ -0,0 +1,298 @@
+# coverage_matrix.py
+import json
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+COVERAGE_FILENAME = "coverage.json"
+
+# Attachment names under which the repo's API tests record each request.
+REQUEST_URL_ATTACHMENT = "Request URL"
+RESPONSE_STATUS_ATTACHMENT = "Response Status"
+REQUEST_METHOD_ATTACHMENT = "Request Method"
+REQUEST_BODY_ATTACHMENT = "Request Body"
+
+# Methods whose requests carry a body, used to tell apart operations on one path.
+BODY_METHODS = ("POST", "PUT", "PATCH")
+
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
+HTTP_METHOD_PATTERN = re.compile(r"\b(" + "|".join(HTTP_METHODS) + r")\b")
+PATH_PARAMETER_PATTERN = re.compile(r"\{[^}/]+\}")
+
+# Entries listed per section of the gaps summary.
+SUMMARY_LIMIT = 20
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values.
+    """
+    return sorted_values[max(0, math.ceil(round(fraction * len(sorted_values), 9)) - 1)]
+
+
+def duration_stats(durations: List[float]) -> dict:
+    if not durations:
+        return {"count": 0}
+    values = sorted(durations)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 1),
+        "p50_ms": percentile(values, 0.5),
+        "p95_ms": percentile(values, 0.95),
+        "max_ms": values[-1],
+    }
+
+
+def step_request(step: dict, read_text: Callable[[dict], Optional[str]]) -> Optional[dict]:
+    """
+    The request an Allure step made, or None. A step counts as a request when
+    it has a "Request URL" attachment; its method is taken from the step name
+    ("Send PUT request ...") or a "Request Method" attachment, and its status
+    code from the "Response Status" attachment. Steps named otherwise ("Create
+    a task ...") leave the method to CoverageMatrix.match_request. `read_text`
+    reads an attachment's text.
+    """
+    attachments = {attachment.get("name"): attachment for attachment in step.get("attachments", [])}
+    url = read_text(attachments[REQUEST_URL_ATTACHMENT]) if REQUEST_URL_ATTACHMENT in attachments else None
+    if not url or not url.strip():
+        return None
+    method = HTTP_METHOD_PATTERN.search(step.get("name") or "")
+    if method is None and REQUEST_METHOD_ATTACHMENT in attachments:
+        method = HTTP_METHOD_PATTERN.search((read_text(attachments[REQUEST_METHOD_ATTACHMENT]) or "").upper())
+    status = read_text(attachments[RESPONSE_STATUS_ATTACHMENT]) if RESPONSE_STATUS_ATTACHMENT in attachments else None
+    start, stop = step.get("start"), step.get("stop")
+    return {
+        "method": method.group(1) if method else None,
+        "url": url.strip(),
+        "status_code": status.strip() if status and status.strip().isdigit() else None,
+        "duration_ms": stop - start if start and stop else None,
+        "has_body": REQUEST_BODY_ATTACHMENT in attachments,
+    }
+
+
+def iter_steps(steps: List[dict]):
+    """
+    Yield every step of a result, nested steps included, depth first.
+    """
+    for step in steps:
+        yield step
+        yield from iter_steps(step.get("steps", []))
+
+
+def label_value(result: dict, name: str) -> Optional[str]:
+    return next((label["value"] for label in result.get("labels", []) if label.get("name") == name), None)
+
+
+def summarize_result(result: dict, read_text: Callable[[dict], Optional[str]]) -> dict:
+    """
+    Reduce an Allure result to what coverage and timings need: its status,
+    timing and labels, and every step with the request it made, if any.
+    """
+    steps = [{"name": step.get("name"), "status": step.get("status"), "start": step.get("start"),
+              "stop": step.get("stop"), "request": step_request(step, read_text)}
+             for step in iter_steps(result.get("steps", []))]
+    start, stop = result.get("start"), result.get("stop")
+    return {
+        "uuid": result.get("uuid"),
+        "name": result.get("name"),
+        "full_name": result.get("fullName"),
+        "status": result.get("status"),
+        "start": start,
+        "stop": stop,
+        "duration_ms": stop - start if start and stop else None,
+        "feature": label_value(result, "feature"),
+        "story": label_value(result, "story"),
+        "requests": [step["request"] for step in steps if step["request"]],
+        "steps": steps,
+    }
+
+
+@dataclass
+class EndpointCoverage:
+    method: str
+    path: str
+    documented_codes: List[str]
+    tests: Dict[str, str] = field(default_factory=dict)
+    codes: Counter = field(default_factory=Counter)
+    durations_ms: List[float] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return f"{self.method} {self.path}"
+
+    @property
+    def missing_codes(self) -> List[str]:
+        return [code for code in self.documented_codes if code not in self.codes]
+
+    @property
+    def failed_tests(self) -> List[str]:
+        return sorted(name for name, status in self.tests.items() if status not in ("passed", "skipped"))
+
+    def as_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "documented_codes": self.documented_codes,
+            "tests": self.tests,
+            "codes": dict(sorted(self.codes.items())),
+            "missing_codes": self.missing_codes,
+            "durations_ms": self.durations_ms,
+            "duration": duration_stats(self.durations_ms),
+        }
+
+
+class CoverageMatrix:
+    """
+    Which documented endpoints and response codes the tests exercised,
+    computed from the Swagger spec and Allure results without an LLM.
+
+    Request URLs are matched against the spec with a literal lookup first and
+    then only against templated paths of the same method and segment count.
+    """
+
+    def __init__(self, swagger_json: dict):
+        self.endpoints: Dict[str, EndpointCoverage] = {}
+        self.undocumented: Counter = Counter()
+        self.tests = 0
+        self._literal: Dict[tuple, EndpointCoverage] = {}
+        self._templated: Dict[tuple, list] = {}
+        for path, methods in swagger_json.get("paths", {}).items():
+            for method, details in methods.items():
+                if not isinstance(details, dict):
+                    continue
+                codes = sorted(code for code in details.get("responses", {}) if code.isdigit())
+                self._add_endpoint(EndpointCoverage(method.upper(), path, codes))
+
+    def _add_endpoint(self, endpoint: EndpointCoverage):
+        self.endpoints[endpoint.key] = endpoint
+        if PATH_PARAMETER_PATTERN.search(endpoint.path):
+            parts = PATH_PARAMETER_PATTERN.split(endpoint.path)
+            pattern = re.compile("^" + "[^/]+".join(re.escape(part) for part in parts) + "$")
+            self._templated.setdefault((endpoint.method, endpoint.path.count("/")), []).append((pattern, endpoint))
+        else:
+            self._literal[(endpoint.method, endpoint.path)] = endpoint
+
+    def match(self, method: str, url: str) -> Optional[EndpointCoverage]:
+        path = urlsplit(url).path or "/"
+        endpoint = self._literal.get((method, path))
+        if endpoint is None:
+            for pattern, candidate in self._templated.get((method, path.count("/")), []):
+                if pattern.match(path):
+                    return candidate
+        return endpoint
+
+    def match_request(self, request: dict) -> Optional[EndpointCoverage]:
+        """
+        The endpoint of a request from step_request. Without a method, it is
+        the one documented operation on the path, after dropping operations
+        without a body if the request had one.
+        """
+        if request["method"]:
+            return self.match(request["method"], request["url"])
+        # As in routing, a literal path wins over templated ones that also match it.
+        path = urlsplit(request["url"]).path or "/"
+        candidates = [self._literal[(method, path)] for method in HTTP_METHODS if (method, path) in self._literal]
+        if not candidates:
+            candidates = [endpoint for endpoint in (self.match(method, request["url"]) for method in HTTP_METHODS)
+                          if endpoint is not None]
+        if len(candidates) > 1 and request.get("has_body"):
+            candidates = [endpoint for endpoint in candidates if endpoint.method in BODY_METHODS]
+        return candidates[0] if len(candidates) == 1 else None
+
+    def add_test(self, record: dict):
+        self.tests += 1
+        for request in record["requests"]:
+            endpoint = self.match_request(request)
+            if endpoint is None:
+                self.undocumented[f"{request['method'] or '?'} {urlsplit(request['url']).path}"] += 1
+                continue
+            endpoint.tests[record["name"] or record["uuid"]] = record["status"]
+            if request["status_code"]:
+                endpoint.codes[request["status_code"]] += 1
+            if request["duration_ms"] is not None:
+                endpoint.durations_ms.append(request["duration_ms"])
+
+    @classmethod
+    def build(cls, swagger_json: dict, records: Iterable[dict]) -> "CoverageMatrix":
+        matrix = cls(swagger_json)
+        for record in records:
+            matrix.add_test(record)
+        return matrix
+
+    def summary(self) -> dict:
+        endpoints = list(self.endpoints.values())
+        covered = [endpoint for endpoint in endpoints if endpoint.tests]
+        documented_codes = sum(len(endpoint.documented_codes) for endpoint in endpoints)
+        covered_codes = sum(len(endpoint.documented_codes) - len(endpoint.missing_codes) for endpoint in endpoints)
+        return {
+            "tests": self.tests,
+            "endpoints": len(endpoints),
+            "covered_endpoints": len(covered),
+            "endpoint_coverage": round(len(covered) / len(endpoints), 3) if endpoints else 0.0,
+            "response_codes": documented_codes,
+            "covered_response_codes": covered_codes,
+            "response_code_coverage": round(covered_codes / documented_codes, 3) if documented_codes else 0.0,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "summary": self.summary(),
+            "endpoints": [endpoint.as_dict() for endpoint in self.endpoints.values()],
+            "undocumented": dict(self.undocumented),
+        }
+
+    def gaps_summary(self, limit: int = SUMMARY_LIMIT) -> str:
+        """
+        Compact plain-text summary of the coverage gaps, meant as LLM context.
+        """
+        summary = self.summary()
+        endpoints = list(self.endpoints.values())
+        lines = [
+            f"Tests: {summary['tests']}. Endpoints covered: {summary['covered_endpoints']}/{summary['endpoints']} "
+            f"({summary['endpoint_coverage']:.0%}). Response codes covered: {summary['covered_response_codes']}/"
+            f"{summary['response_codes']} ({summary['response_code_coverage']:.0%})."
+        ]
+
+        def section(title, entries):
+            if entries:
+                lines.append(f"{title}:")
+                lines.extend(f"- {entry}" for entry in entries[:limit])
+                if len(entries) > limit:
+                    lines.append(f"- ... and {len(entries) - limit} more")
+
+        section("Untested endpoints", [endpoint.key for endpoint in endpoints if not endpoint.tests])
+        section("Untested response codes", [f"{endpoint.key}: {', '.join(endpoint.missing_codes)}"
+                                            for endpoint in endpoints if endpoint.tests and endpoint.missing_codes])
+        section("Failing tests", [f"{endpoint.key}: {', '.join(endpoint.failed_tests)}"
+                                  for endpoint in endpoints if endpoint.failed_tests])
+        section("Requests to undocumented endpoints", [f"{key} ({count}x)"
+                                                       for key, count in self.undocumented.most_common()])
+        slowest = sorted((endpoint for endpoint in endpoints if endpoint.durations_ms),
+                         key=lambda endpoint: duration_stats(endpoint.durations_ms)["p95_ms"], reverse=True)
+        section("Slowest endpoints (p95)", [f"{endpoint.key}: {duration_stats(endpoint.durations_ms)['p95_ms']}ms"
+                                            for endpoint in slowest[:5]])
+        return "\n".join(lines)
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.as_dict(), file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CoverageMatrix"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as file:
+            data = json.load(file)
+        matrix = cls({})
+        matrix.tests = data["summary"]["tests"]
+        matrix.undocumented = Counter(data["undocumented"])
+        for entry in data["endpoints"]:
+            matrix._add_endpoint(EndpointCoverage(entry["method"], entry["path"], entry["documented_codes"],
+                                                  entry["tests"], Counter(entry["codes"]), entry["durations_ms"]))
+        return matrix
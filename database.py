@@ -1,10 +1,119 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from instrumentation import instrument_engine
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tasks.db")
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+# Serve requests with async handlers on the event loop instead of sync handlers
+# on the threadpool.
+ASYNC_MODE = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Name of the entry of ENGINE_PROFILES used to build the engines.
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "development")
+
+# Engine settings per deployment profile. The pools hold at least as many
+# connections as Starlette's threadpool has workers (40): a smaller pool
+# deadlocks sync handlers once every worker is waiting for a connection.
+ENGINE_PROFILES = {
+    "development": {
+        "echo": True,
+        "pool_size": 40,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pragmas": {
+            "journal_mode": "WAL",
+            "busy_timeout": 5000,
+        },
+    },
+    "production": {
+        "echo": False,
+        "pool_size": 40,
+        "max_overflow": 20,
+        "pool_timeout": 10,
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -64 * 1024,  # negative values are KiB
+            "temp_store": "MEMORY",
+        },
+    },
+}
+
+
+def _engine_settings(profile: str) -> dict:
+    settings = dict(ENGINE_PROFILES[profile])
+    if "DATABASE_ECHO" in os.environ:
+        settings["echo"] = os.environ["DATABASE_ECHO"].lower() in ("1", "true", "yes")
+    if "DATABASE_POOL_SIZE" in os.environ:
+        settings["pool_size"] = int(os.environ["DATABASE_POOL_SIZE"])
+    return settings
+
+
+def _engine_kwargs(url: str, settings: dict) -> dict:
+    kwargs = {"echo": settings["echo"]}
+    if make_url(url).database not in (None, "", ":memory:"):
+        # In-memory databases use a single shared connection, not a queue pool.
+        kwargs.update(
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+        )
+    return kwargs
 
-DATABASE_URL = "sqlite:///./tasks.db"
 
-engine = create_engine(DATABASE_URL, echo=True)
+def _set_pragmas(sync_engine, pragmas: dict):
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def make_engine(url: str = DATABASE_URL, profile: str = DATABASE_PROFILE):
+    """
+    Build a sync engine with the pool and SQLite pragmas of the given profile.
+    """
+    settings = _engine_settings(profile)
+    sync_engine = create_engine(url, **_engine_kwargs(url, settings))
+    if sync_engine.dialect.name == "sqlite":
+        _set_pragmas(sync_engine, settings["pragmas"])
+    instrument_engine(sync_engine)
+    return sync_engine
+
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL, profile: str = DATABASE_PROFILE):
+    """
+    Build an async engine with the pool and SQLite pragmas of the given profile.
+    """
+    settings = _engine_settings(profile)
+    engine = create_async_engine(url, **_engine_kwargs(url, settings))
+    if engine.dialect.name == "sqlite":
+        _set_pragmas(engine.sync_engine, settings["pragmas"])
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+engine = make_engine()
+async_engine = make_async_engine()
 
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    async with AsyncSession(async_engine) as session:
+        yield session
@@ -1,5 +1,6 @@
 # db_models.py
-from typing import Optional
+from typing import List, Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from datetime import datetime
 
@@ -17,7 +18,15 @@ class TaskBase(SQLModel):
 class Task(TaskBase, table=True):
     """
     The Task model represents a task in the database.
+
+    The status index includes the id so that status-filtered pages are served
+    in keyset order straight from the index.
     """
+    __table_args__ = (
+        Index("ix_task_status_id", "status", "id"),
+        Index("ix_task_created_at", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
 
@@ -33,3 +42,41 @@ class TaskRead(TaskBase):
     Properties to return via API on task read.
     """
     id: int
+
+
+class TaskBulkStatusUpdate(SQLModel):
+    """
+    Properties to receive via API on bulk status update.
+
+    Tasks are selected either by `ids` or by the filter fields.
+    """
+    status: str
+    ids: Optional[List[int]] = None
+    filter_status: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+
+class TaskBulkDelete(SQLModel):
+    """
+    Properties to receive via API on bulk deletion.
+    """
+    ids: List[int]
+
+
+class TaskBulkError(SQLModel):
+    """
+    An item of a bulk request that could not be applied.
+    """
+    index: Optional[int] = None
+    id: Optional[int] = None
+    detail: str
+
+
+class TaskBulkResult(SQLModel):
+    """
+    Properties to return via API on bulk operations.
+    """
+    count: int = 0
+    ids: List[int] = Field(default_factory=list)
+    errors: List[TaskBulkError] = Field(default_factory=list)
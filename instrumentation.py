@@ -0,0 +1,248 @@
+# instrumentation.py
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# With metrics disabled no middleware or engine hooks are installed and stage()
+# hands out a shared no-op timer.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = LATENCY_BUCKETS + (30.0, 60.0, 300.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Database statement latency", ["operation"], buckets=LATENCY_BUCKETS)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Database statements executed per HTTP request", ["route"],
+    buckets=QUERY_COUNT_BUCKETS)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Database time per HTTP request", ["route"], buckets=LATENCY_BUCKETS)
+STAGE_DURATION = Histogram(
+    "pipeline_stage_duration_seconds", "Duration of pipeline stages", ["stage"], buckets=STAGE_BUCKETS)
+STAGE_TOKENS = Counter("pipeline_stage_tokens", "Tokens processed by pipeline stages", ["stage"])
+STAGE_ITEMS = Counter("pipeline_stage_items", "Items processed by pipeline stages", ["stage"])
+
+# Query count and time of the HTTP request being served, if any.
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+class StageTimer:
+    """
+    Times one run of a pipeline stage; use through stage().
+    """
+    enabled = True
+
+    def __init__(self, name: str):
+        self.name = name
+        self.tokens = 0
+        self.items = 0
+        self.seconds = 0.0
+
+    def add_tokens(self, tokens: int):
+        self.tokens += tokens
+
+    def add_items(self, items: int):
+        self.items += items
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._started
+        STAGE_DURATION.labels(self.name).observe(self.seconds)
+        if self.tokens:
+            STAGE_TOKENS.labels(self.name).inc(self.tokens)
+        if self.items:
+            STAGE_ITEMS.labels(self.name).inc(self.items)
+        _totals.add(self)
+        return False
+
+
+class _NoopTimer:
+    enabled = False
+    tokens = items = 0
+    seconds = 0.0
+
+    def add_tokens(self, tokens: int):
+        pass
+
+    def add_items(self, items: int):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class StageTotals:
+    """
+    Running totals per stage, for scripts that report without being scraped.
+    """
+
+    def __init__(self):
+        self._totals: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, timer: StageTimer):
+        with self._lock:
+            totals = self._totals.setdefault(timer.name, {"count": 0, "seconds": 0.0, "tokens": 0, "items": 0})
+            totals["count"] += 1
+            totals["seconds"] += timer.seconds
+            totals["tokens"] += timer.tokens
+            totals["items"] += timer.items
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: dict(totals, seconds=round(totals["seconds"], 3)) for name, totals in self._totals.items()}
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+
+_totals = StageTotals()
+
+
+def stage(name: str):
+    """
+    Context manager timing a pipeline stage (fetch, parse, embed, index,
+    search, llm...). The timer it yields counts tokens and items; callers
+    should only compute those when `timer.enabled`.
+    """
+    return StageTimer(name) if METRICS_ENABLED else _NOOP_TIMER
+
+
+def timed_iter(iterable, name: str):
+    """
+    Yield from `iterable`, timing the production of every item as a run of
+    stage `name`; items with a length count towards the stage's items.
+    """
+    if not METRICS_ENABLED:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        with stage(name) as timer:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            if hasattr(item, "__len__"):
+                timer.add_items(len(item))
+        yield item
+
+
+def stage_totals() -> Dict[str, dict]:
+    return _totals.snapshot()
+
+
+@contextmanager
+def stage_report(title: str = "Stage timings"):
+    """
+    For scripts: log the totals of every stage run inside the block.
+    """
+    _totals.clear()
+    try:
+        yield
+    finally:
+        if METRICS_ENABLED:
+            logger.info("%s: %s", title, stage_totals())
+
+
+def _statement_operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "OTHER"
+
+
+def instrument_engine(engine):
+    """
+    Record the duration of every statement run through `engine` (a sync
+    engine, or the sync_engine of an async one), and count it towards the
+    current HTTP request.
+    """
+    if not METRICS_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_DURATION.labels(_statement_operation(statement)).observe(elapsed)
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+            queries[1] += elapsed
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency per route template and status, and the
+    number and time of database statements per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_queries.reset(token)
+            # Route templates keep the label set bounded; unmatched paths share one label.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status[0])).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(queries[0])
+            DB_TIME_PER_REQUEST.labels(route).observe(queries[1])
+
+
+def instrument_app(app):
+    """
+    Add the metrics middleware and the /metrics endpoint to a FastAPI app.
+    """
+    if not METRICS_ENABLED:
+        return app
+    from fastapi import Response
+
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+    return app
@@ -1,46 +1,219 @@
-from langchain_community.vectorstores import FAISS
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.chains import create_retrieval_chain
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
 
 from dotenv import load_dotenv
 
+from cache import LRUCache
+from coverage_matrix import COVERAGE_FILENAME, CoverageMatrix
+from embedding_cache import CachedEmbeddings
+from instrumentation import stage
+from retrieval import HybridRetriever
+from timings import TIMINGS_FILENAME, TimingStore
+from tokens import count_tokens
+from vector_store import FaissVectorStore
+
 load_dotenv()
 
+# Documents retrieved per source for every question.
+SWAGGER_K = int(os.getenv("RAG_SWAGGER_K", "3"))
+ALLURE_K = int(os.getenv("RAG_ALLURE_K", "5"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "256"))
+# Question/answer turns kept as conversation history between single calls.
+HISTORY_TURNS = int(os.getenv("RAG_HISTORY_TURNS", "5"))
+# LLM calls in flight at once during a batch.
+BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+
+ENDPOINT_QUERY = "Analyze the test coverage of the {method} {path} endpoint and suggest any missing tests."
+
+# Default system prompt for coverage, test-generation and timing questions.
+SYSTEM_PROMPT = """
+You are a Senior Test Analyst with extensive experience in test design, coverage analysis, and quality assurance. Your task is to analyze the test coverage, efficiency, and completeness of the existing test suite based on the following combined context:
+
+1. Swagger API Documentation: Review the API models, endpoints, and operations described in the Swagger documentation.
+2. Allure Test Results: Review the existing test results, including the steps, assertions, and any linked attachments from the Allure reports.
+3. Combined Analysis: Cross-reference the Swagger documentation with the Allure test results to determine if all API endpoints are adequately tested.
+4. Test Efficiency: Evaluate the efficiency of the existing tests.
+5. Missed Steps Identification: Identify any untested scenarios or missed steps based on the Swagger API models and the actual test results.
+6. Additional Coverage Suggestions: Recommend additional test cases that could enhance coverage.
+7. Test Design Best Practices: Explain the rationale behind each recommendation and how it aligns with best test design practices.
+"""
+
+
+def index_version(vector_db_path: str) -> int:
+    """
+    Version of the index written by the vectorizer's manifest; 0 when unknown.
+    """
+    try:
+        with open(os.path.join(vector_db_path, "manifest.json"), "r") as file:
+            return json.load(file).get("version", 0)
+    except (OSError, ValueError):
+        return 0
+
 
 class RAGTestCoverageAnalysis:
-    def __init__(self, vector_db_path: str):
+    def __init__(self, vector_db_path: str, embeddings=None, llm=None, swagger_k: int = SWAGGER_K,
+                 allure_k: int = ALLURE_K, cache_size: int = RETRIEVAL_CACHE_SIZE, history_turns: int = HISTORY_TURNS):
         # Initialize embeddings and load vector store
-        self.embeddings = OpenAIEmbeddings()
-        self.vector_store = FAISS.load_local(vector_db_path, self.embeddings, allow_dangerous_deserialization=True)
-
-        # Initialize the LLM and create the conversational retrieval chain
-        self.llm = ChatOpenAI(model_name="gpt-4")  # Use GPT-4 or GPT-3.5
-        memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-        self.qa_chain = ConversationalRetrievalChain.from_llm(self.llm, retriever=self.vector_store.as_retriever(), memory=memory)
+        self.embeddings = embeddings or CachedEmbeddings(OpenAIEmbeddings())
+        # Memory-mapped and read-only: the index is paged in as searches touch it
+        self.vector_store = FaissVectorStore.load(vector_db_path, self.embeddings, mmap=True)
+        if self.vector_store is None:
+            raise ValueError(f"No vector store found at {vector_db_path}")
+        self.index_version = index_version(vector_db_path)
+        self.swagger_k = swagger_k
+        self.allure_k = allure_k
+        self.query_embeddings = LRUCache(cache_size)
+        self.retrievals = LRUCache(cache_size)
+        self.retriever = HybridRetriever(self.vector_store, embed_query=self.embed_query)
+        # Written by the vectorizer next to the index; None for indexes built without it
+        self.coverage = CoverageMatrix.load(os.path.join(vector_db_path, COVERAGE_FILENAME))
+        self.timings = TimingStore.load(os.path.join(vector_db_path, TIMINGS_FILENAME))
+
+        # The context is retrieved once per question and put in the prompt, so
+        # the LLM is called directly instead of through a retrieval chain.
+        self.llm = llm or ChatOpenAI(model_name="gpt-4")  # Use GPT-4 or GPT-3.5
+        self.history = deque(maxlen=2 * history_turns)
+        self._history_lock = threading.Lock()
+
+    def embed_query(self, query: str):
+        vector = self.query_embeddings.get(query)
+        if vector is None:
+            with stage("embed_query"):
+                vector = self.embeddings.embed_query(query)
+            self.query_embeddings.put(query, vector)
+        return vector
+
+    def retrieve(self, query: str):
+        """
+        Return the Swagger and Allure documents for `query`, searching each
+        source separately so neither can crowd out the other. Queries naming
+        only endpoints or test uuids are answered without embedding them.
+        """
+        # An analyzer serves one index version; a new version gets a new analyzer
+        key = (query, self.swagger_k, self.allure_k)
+        documents = self.retrievals.get(key)
+        if documents is None:
+            documents = (
+                self.retriever.search(query, k=self.swagger_k, source="swagger"),
+                self.retriever.search(query, k=self.allure_k, source="allure"),
+            )
+            self.retrievals.put(key, documents)
+        return documents
 
     def retrieve_context(self, query: str):
-        # Retrieve a broader range of documents to ensure full context
-        docs = self.vector_store.similarity_search(query, k=5)
-        swagger_docs = [doc.page_content for doc in docs if doc.metadata.get("source") == "swagger"]
-        allure_docs = [doc.page_content for doc in docs if doc.metadata.get("source") == "allure"]
+        with stage("retrieve"):
+            swagger_docs, allure_docs = self.retrieve(query)
 
         # Combine the most relevant Swagger and Allure documents
-        context = "\n\n".join(swagger_docs + allure_docs)
+        context = "\n\n".join(doc.page_content for doc in swagger_docs + allure_docs)
         return context
 
-    def analyze_coverage(self, system_prompt: str, query: str):
+    @staticmethod
+    def build_prompt(system_prompt: str, context: str, query: str) -> str:
+        return system_prompt + "\n\nContext:\n" + context + "\n\n" + query
+
+    def ask(self, system_prompt: str, query: str, context: str = None):
         # Retrieve the relevant context for the query
-        context = self.retrieve_context(query)
-        combined_prompt = system_prompt + "\n\nContext:\n" + context + "\n\n" + query
-        return self.qa_chain.run({"question": combined_prompt, "chat_history": []})
+        if context is None:
+            context = self.retrieve_context(query)
+        with self._history_lock:
+            history = list(self.history)
+        prompt = HumanMessage(content=self.build_prompt(system_prompt, context, query))
+        with stage("llm") as timer:
+            answer = self.llm.invoke(history + [prompt]).content
+            if timer.enabled:
+                timer.add_tokens(count_tokens(prompt.content) + count_tokens(answer))
+        # Only the bare question is remembered; the context is retrieved again for every question.
+        with self._history_lock:
+            self.history.extend([HumanMessage(content=query), AIMessage(content=answer)])
+        return answer
+
+    def analyze_coverage(self, system_prompt: str, query: str):
+        # The coverage matrix already holds the cross-reference; the LLM only sees its gaps
+        if self.coverage is not None:
+            return self.ask(system_prompt, query, context=self.coverage.gaps_summary())
+        return self.ask(system_prompt, query)
 
     def generate_new_tests(self, system_prompt: str, query: str):
-        # Retrieve the relevant context for the query
-        context = self.retrieve_context(query)
-        combined_prompt = system_prompt + "\n\nContext:\n" + context + "\n\n" + query
-        return self.qa_chain.run({"question": combined_prompt, "chat_history": []})
+        return self.ask(system_prompt, query)
+
+    def analyze_timings(self, system_prompt: str, query: str):
+        # Percentiles, regressions and slow steps are computed from the timing store, not read by the LLM
+        return self.ask(system_prompt, query, context=self.timings.summary_text())
+
+    def endpoint_queries(self, template: str = ENDPOINT_QUERY):
+        """
+        One coverage question per Swagger operation in the index.
+        """
+        return [template.format(method=method.upper(), path=path) for method, path in self.vector_store.operations()]
+
+    def retrieve_many(self, queries):
+        """
+        Retrieve the documents of every query, embedding all queries that need
+        it in one call so the embedder can batch them.
+        """
+        pending = [query for query in dict.fromkeys(queries)
+                   if self.retrievals.get((query, self.swagger_k, self.allure_k)) is None
+                   and self.query_embeddings.get(query) is None and not self.retriever.is_exact_lookup(query)]
+        if pending:
+            for query, vector in zip(pending, self.embeddings.embed_documents(pending)):
+                self.query_embeddings.put(query, vector)
+        return {query: self.retrieve(query) for query in queries}
+
+    async def arun_batch(self, system_prompt: str, queries=None, max_concurrency: int = BATCH_CONCURRENCY):
+        """
+        Answer every query (one per Swagger operation by default) with at most
+        `max_concurrency` LLM calls in flight, yielding a result dict per query
+        as soon as it is done. Each query is asked on its own, without history.
+        """
+        queries = list(queries) if queries is not None else self.endpoint_queries()
+        documents = await asyncio.to_thread(self.retrieve_many, queries)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def answer(query):
+            swagger_docs, allure_docs = documents[query]
+            context = "\n\n".join(doc.page_content for doc in swagger_docs + allure_docs)
+            result = {"query": query, "sources": [doc.id for doc in swagger_docs + allure_docs]}
+            async with semaphore:
+                started = time.perf_counter()
+                prompt = self.build_prompt(system_prompt, context, query)
+                try:
+                    with stage("llm") as timer:
+                        message = await self.llm.ainvoke([HumanMessage(content=prompt)])
+                        if timer.enabled:
+                            timer.add_tokens(count_tokens(prompt) + count_tokens(message.content))
+                    result["answer"] = message.content
+                except Exception as exc:
+                    result["error"] = f"{type(exc).__name__}: {exc}"
+                result["seconds"] = round(time.perf_counter() - started, 3)
+            return result
+
+        for future in asyncio.as_completed([answer(query) for query in queries]):
+            yield await future
+
+    async def awrite_batch(self, system_prompt: str, output_path: str, queries=None,
+                           max_concurrency: int = BATCH_CONCURRENCY) -> int:
+        """
+        Stream the results of arun_batch to `output_path` as JSON lines and return their count.
+        """
+        count = 0
+        with open(output_path, "w") as file:
+            async for result in self.arun_batch(system_prompt, queries, max_concurrency):
+                file.write(json.dumps(result) + "\n")
+                file.flush()
+                count += 1
+        return count
+
+    def run_batch(self, system_prompt: str, output_path: str, queries=None,
+                  max_concurrency: int = BATCH_CONCURRENCY) -> int:
+        return asyncio.run(self.awrite_batch(system_prompt, output_path, queries, max_concurrency))
 
 
 if __name__ == "__main__":
@@ -48,18 +221,7 @@ if __name__ == "__main__":
 
     rag_analyzer = RAGTestCoverageAnalysis(vector_db_path)
 
-    # Example system prompt
-    system_prompt = """
-    You are a Senior Test Analyst with extensive experience in test design, coverage analysis, and quality assurance. Your task is to analyze the test coverage, efficiency, and completeness of the existing test suite based on the following combined context:
-    
-    1. Swagger API Documentation: Review the API models, endpoints, and operations described in the Swagger documentation.
-    2. Allure Test Results: Review the existing test results, including the steps, assertions, and any linked attachments from the Allure reports.
-    3. Combined Analysis: Cross-reference the Swagger documentation with the Allure test results to determine if all API endpoints are adequately tested.
-    4. Test Efficiency: Evaluate the efficiency of the existing tests.
-    5. Missed Steps Identification: Identify any untested scenarios or missed steps based on the Swagger API models and the actual test results.
-    6. Additional Coverage Suggestions: Recommend additional test cases that could enhance coverage.
-    7. Test Design Best Practices: Explain the rationale behind each recommendation and how it aligns with best test design practices.
-    """
+    system_prompt = SYSTEM_PROMPT
 
     # # Example query to analyze test coverage including Swagger and Allure context
     coverage_query = "Analyze the test coverage for the endpoints from swagger and test results and suggest any missing tests."
@@ -72,6 +234,10 @@ if __name__ == "__main__":
     new_tests = rag_analyzer.generate_new_tests(system_prompt, generate_tests_query)
     print("New Test Cases:", new_tests)
 
-    generate_tests_query = "Analyse the average tests speed and API communication delays"
-    new_tests = rag_analyzer.generate_new_tests(system_prompt, generate_tests_query)
-    print("New Test Cases:", new_tests)
+    timings_query = "Analyse the average tests speed and API communication delays"
+    timings_analysis = rag_analyzer.analyze_timings(system_prompt, timings_query)
+    print("Timings Analysis:", timings_analysis)
+
+    # Coverage report across every endpoint in the index, one JSON line per endpoint
+    report_count = rag_analyzer.run_batch(system_prompt, "coverage_report.jsonl")
+    print(f"Wrote {report_count} endpoint reports to coverage_report.jsonl")
@@ -0,0 +1,194 @@
+# rag_service.py
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from pydantic import BaseModel
+
+from coverage_matrix import COVERAGE_FILENAME
+from instrumentation import instrument_app
+from rag import SYSTEM_PROMPT, RAGTestCoverageAnalysis, index_version
+from timings import TIMINGS_FILENAME
+from vector_store import current_snapshot
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DB_PATH = os.getenv("RAG_VECTOR_DB_PATH", "./combined_vector_db")
+# Seconds between checks for a new index written by the vectorizer.
+RELOAD_INTERVAL = float(os.getenv("RAG_RELOAD_INTERVAL", "5"))
+
+
+def index_signature(vector_db_path: str):
+    """
+    What identifies the data the service answers from: the index snapshot
+    readers open, the manifest version the vectorizer bumps after saving it,
+    and the coverage and timing files it writes last.
+    """
+    signature = [current_snapshot(vector_db_path), index_version(vector_db_path)]
+    for filename in (COVERAGE_FILENAME, TIMINGS_FILENAME):
+        try:
+            signature.append(os.stat(os.path.join(vector_db_path, filename)).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class AnalyzerHolder:
+    """
+    Keeps one warm RAGTestCoverageAnalysis and swaps in a new one when the
+    index on disk changes. An analyzer reads one immutable snapshot of the
+    index and holds the coverage and timings in memory, so it never sees a
+    later ingest. Requests take `current` once and keep that analyzer to the
+    end, so a swap never affects queries in flight; the old one is dropped
+    when the last of them is done.
+    """
+
+    def __init__(self, vector_db_path: str, factory: Optional[Callable] = None):
+        self.vector_db_path = vector_db_path
+        self.factory = factory or self.default_factory
+        self.current: Optional[RAGTestCoverageAnalysis] = None
+        self.signature = None
+        self.loaded_at = None
+        self.reloads = 0
+        self._reload_lock = threading.Lock()
+
+    def default_factory(self, vector_db_path: str) -> RAGTestCoverageAnalysis:
+        previous = self.current
+        if previous is None:
+            # No history: the service answers independent questions from many clients.
+            return RAGTestCoverageAnalysis(vector_db_path, history_turns=0)
+        # Keep the clients and the query embeddings, which do not depend on the index.
+        analyzer = RAGTestCoverageAnalysis(vector_db_path, embeddings=previous.embeddings, llm=previous.llm,
+                                           history_turns=0)
+        analyzer.query_embeddings = previous.query_embeddings
+        return analyzer
+
+    def reload_if_changed(self) -> bool:
+        """
+        Load the index if its signature changed and swap it in; return whether
+        a new analyzer is now serving. A failed load keeps the current one.
+        """
+        with self._reload_lock:
+            signature = index_signature(self.vector_db_path)
+            if signature == self.signature:
+                return False
+            try:
+                analyzer = self.factory(self.vector_db_path)
+            except Exception:
+                logger.exception("Loading the index at %s failed", self.vector_db_path)
+                return False
+            # The vectorizer wrote again while we loaded; pick that up on the next check.
+            if index_signature(self.vector_db_path) != signature:
+                logger.info("Index at %s changed while loading, retrying", self.vector_db_path)
+                return False
+            self.current = analyzer
+            self.signature = signature
+            self.loaded_at = time.time()
+            self.reloads += 1
+            logger.info("Serving index version %s", analyzer.index_version)
+            return True
+
+    async def watch(self, interval: float = RELOAD_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.reload_if_changed)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.current is not None,
+            "index_version": self.current.index_version if self.current else None,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+        }
+
+
+class Question(BaseModel):
+    query: str
+    system_prompt: Optional[str] = None
+
+
+class Answer(BaseModel):
+    answer: str
+    index_version: int
+
+
+router = APIRouter()
+
+
+def _analyzer(request: Request) -> RAGTestCoverageAnalysis:
+    analyzer = request.app.state.analyzers.current
+    if analyzer is None:
+        raise HTTPException(status_code=503, detail="No index loaded yet")
+    return analyzer
+
+
+# Handlers are sync so requests run concurrently in the threadpool while
+# they wait for the embedder and the LLM.
+@router.post("/coverage/", response_model=Answer)
+def analyze_coverage(question: Question, request: Request):
+    analyzer = _analyzer(request)
+    answer = analyzer.analyze_coverage(question.system_prompt or SYSTEM_PROMPT, question.query)
+    return Answer(answer=answer, index_version=analyzer.index_version)
+
+
+@router.post("/tests/", response_model=Answer)
+def generate_new_tests(question: Question, request: Request):
+    analyzer = _analyzer(request)
+    answer = analyzer.generate_new_tests(question.system_prompt or SYSTEM_PROMPT, question.query)
+    return Answer(answer=answer, index_version=analyzer.index_version)
+
+
+@router.post("/timings/", response_model=Answer)
+def analyze_timings(question: Question, request: Request):
+    analyzer = _analyzer(request)
+    answer = analyzer.analyze_timings(question.system_prompt or SYSTEM_PROMPT, question.query)
+    return Answer(answer=answer, index_version=analyzer.index_version)
+
+
+@router.get("/health/")
+def health(request: Request):
+    return request.app.state.analyzers.status()
+
+
+@router.post("/reload/")
+def reload_index(request: Request):
+    """
+    Check for a new index now instead of waiting for the next poll.
+    """
+    analyzers = request.app.state.analyzers
+    reloaded = analyzers.reload_if_changed()
+    return dict(analyzers.status(), reloaded=reloaded)
+
+
+def create_app(vector_db_path: str = VECTOR_DB_PATH, factory: Optional[Callable] = None,
+               reload_interval: float = RELOAD_INTERVAL) -> FastAPI:
+    """
+    Build the RAG service. The index is loaded at startup and checked for a
+    new version every `reload_interval` seconds (never when it is 0).
+    """
+    analyzers = AnalyzerHolder(vector_db_path, factory)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await asyncio.to_thread(analyzers.reload_if_changed)
+        watcher = asyncio.create_task(analyzers.watch(reload_interval)) if reload_interval > 0 else None
+        yield
+        if watcher:
+            watcher.cancel()
+
+    app = FastAPI(title="RAG Test Coverage Service", version="1.0.0", lifespan=lifespan)
+    app.state.analyzers = analyzers
+    app.include_router(router)
+    return instrument_app(app)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(create_app(), host="127.0.0.1", port=int(os.getenv("RAG_SERVICE_PORT", "8001")))
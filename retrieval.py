@@ -0,0 +1,101 @@
+# retrieval.py
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from vector_store import HTTP_METHODS, SOURCE_CODES, FaissVectorStore
+
+# Rank offset of reciprocal-rank fusion; 60 is the value from the original paper.
+RRF_K = 60
+
+# Punctuation around a path or uuid in free text.
+STRIP_CHARS = "\"'`,;:!?()[]<>"
+
+
+def query_keys(query: str) -> List[str]:
+    """
+    Candidate lookup keys of `query`: a method followed by a path forms one
+    "METHOD path" key, and every other token is a key of its own.
+    """
+    tokens = [token.strip(STRIP_CHARS).rstrip(".") for token in query.split()]
+    tokens = [token for token in tokens if token]
+    keys = []
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.upper() in HTTP_METHODS and index + 1 < len(tokens) and tokens[index + 1].startswith("/"):
+            keys.append(f"{token.upper()} {tokens[index + 1]}")
+            index += 2
+        else:
+            keys.append(token)
+            index += 1
+    return keys
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = RRF_K) -> List[Document]:
+    """
+    Merge ranked lists of documents by summing 1 / (k + rank) over the lists
+    each document appears in.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            scores[document.id] = scores.get(document.id, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(document.id, document)
+    return [documents[doc_id] for doc_id in sorted(scores, key=scores.get, reverse=True)]
+
+
+class HybridRetriever:
+    """
+    Retrieval over a FaissVectorStore that combines exact key lookups, BM25
+    and dense search. Queries that consist only of exact keys are answered
+    from the lookup table without embedding them, in every source where they
+    name documents.
+    """
+
+    def __init__(self, vector_store: FaissVectorStore, embed_query: Optional[Callable] = None,
+                 fetch_k: int = 20, rrf_k: int = RRF_K):
+        self.vector_store = vector_store
+        self.embed_query = embed_query or vector_store.embeddings.embed_query
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+
+    def exact_matches(self, query: str, source: str = None):
+        """
+        Return the documents of `source` named exactly by the query, and
+        whether every token of the query is such a name (of any source).
+        """
+        keys = query_keys(query)
+        matches = self.vector_store.lookup(keys)
+        all_matched = bool(keys) and all(key in matches for key in keys)
+        documents = {doc.id: doc for key in keys for doc in matches.get(key, [])
+                     if source is None or doc.metadata.get("source") == source}
+        return list(documents.values()), all_matched
+
+    def is_exact_lookup(self, query: str, sources=tuple(SOURCE_CODES)) -> bool:
+        """
+        Whether searching each of `sources` for `query` needs no embedding.
+        """
+        for source in sources:
+            exact, all_matched = self.exact_matches(query, source)
+            if not (all_matched and exact):
+                return False
+        return True
+
+    def search(self, query: str, k: int = 4, source: str = None, vector: List[float] = None) -> List[Document]:
+        """
+        Return the top `k` documents: exact matches first, then BM25 and dense
+        results fused by reciprocal rank. Pass `vector` to reuse an embedding
+        of the query across several searches.
+        """
+        exact, all_matched = self.exact_matches(query, source)
+        # An endpoint-only query names no Allure result; tests of it are found by search.
+        if all_matched and exact:
+            return exact[:k]
+        lexical = [doc for doc, _ in self.vector_store.lexical_search(query, self.fetch_k, source)]
+        vector = vector if vector is not None else self.embed_query(query)
+        dense = self.vector_store.similarity_search_by_vector(
+            vector, k=self.fetch_k, filter={"source": source} if source else None)
+        fused = reciprocal_rank_fusion([lexical, dense], self.rrf_k)
+        return list({doc.id: doc for doc in exact + fused}.values())[:k]
@@ -1,81 +1,47 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends, HTTPException
-from typing import List
-from sqlmodel import Session, select, SQLModel
+from fastapi import FastAPI
+from sqlmodel import Session, SQLModel
 
-from db_models import Task, TaskCreate, TaskRead
-from database import engine, get_session
+from async_task_manager import router as async_router
+from db_models import Task
+from database import ASYNC_MODE, engine, get_session
+from instrumentation import instrument_app
+from task_queries import ndjson_lines, stream_statement
+from task_routes import make_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist, so add indexes declared since.
+    for index in Task.__table__.indexes:
+        index.create(engine, checkfirst=True)
     yield
 
 
-app = FastAPI(title="Task Management API", version="1.0.0", lifespan=lifespan)
-
-
-@app.post("/tasks/", response_model=TaskRead, status_code=201)
-def create_task(*, session: Session = Depends(get_session), task: TaskCreate):
+def _stream_tasks(statement):
     """
-    Create a new task with a title and description.
-
-    - **title**: The title of the task.
-    - **description**: A detailed description of the task.
-    - **status**: The status of the task (default is 'pending').
+    Yield tasks as NDJSON, one batch of lines per chunk of the database cursor.
     """
-    db_task = Task.from_orm(task)
-    session.add(db_task)
-    session.commit()
-    session.refresh(db_task)
-    return db_task
+    with Session(engine) as session:
+        for rows in session.execute(stream_statement(statement)).partitions():
+            yield ndjson_lines(rows)
 
 
-@app.get("/tasks/", response_model=List[TaskRead])
-def read_tasks(session: Session = Depends(get_session)):
-    """
-    Retrieve all tasks.
-
-    Returns a list of all tasks in the system.
-    """
-    tasks = session.exec(select(Task)).all()
-    return tasks
+router = make_router(get_session, _stream_tasks, asynchronous=False)
 
 
-@app.put("/tasks/{task_id}/", response_model=TaskRead)
-def update_task_status(
-        *, session: Session = Depends(get_session), task_id: int, status: str
-):
+def create_app(async_mode: bool = ASYNC_MODE) -> FastAPI:
     """
-    Update a task's status.
-
-    - **task_id**: The ID of the task to update.
-    - **status**: The new status of the task.
+    Build the API, serving the task routes with async or sync handlers.
     """
-    task = session.get(Task, task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    task.status = status
-    session.add(task)
-    session.commit()
-    session.refresh(task)
-    return task
+    app = FastAPI(title="Task Management API", version="1.0.0", lifespan=lifespan)
+    app.include_router(async_router if async_mode else router)
+    return instrument_app(app)
 
 
-@app.delete("/tasks/{task_id}/", status_code=204)
-def delete_task(*, session: Session = Depends(get_session), task_id: int):
-    """
-    Delete a task.
-
-    - **task_id**: The ID of the task to delete.
-    """
-    task = session.get(Task, task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    session.delete(task)
-    session.commit()
+app = create_app()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+# task_queries.py
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import update
+from sqlmodel import select
+
+from db_models import Task, TaskBulkError, TaskBulkStatusUpdate, TaskCreate, TaskRead
+
+# Number of rows fetched from the database cursor at a time in streaming mode.
+STREAM_BATCH_SIZE = 1000
+
+# Number of ids bound into a single `IN (...)` clause, kept well below
+# SQLite's limit on host parameters per statement.
+BULK_CHUNK_SIZE = 500
+
+# Columns of TaskRead, in the order list responses are serialized from.
+TASK_COLUMNS = tuple(TaskRead.model_fields)
+
+
+def chunks(items: list, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def filter_tasks(
+        statement,
+        status: Optional[str],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime],
+):
+    """
+    Apply the status and created_at range filters to a select, update or delete.
+    """
+    if status is not None:
+        statement = statement.where(Task.status == status)
+    if created_after is not None:
+        statement = statement.where(Task.created_at >= created_after)
+    if created_before is not None:
+        statement = statement.where(Task.created_at < created_before)
+    return statement
+
+
+def tasks_statement(
+        after_id: Optional[int],
+        status: Optional[str],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime],
+):
+    """
+    Build the keyset-paginated select for the task list, ordered by id.
+    """
+    statement = select(Task).order_by(Task.id)
+    if after_id is not None:
+        statement = statement.where(Task.id > after_id)
+    return filter_tasks(statement, status, created_after, created_before)
+
+
+def columns_statement(statement):
+    """
+    Narrow a task select to plain column rows, skipping ORM object construction.
+    """
+    return statement.with_only_columns(*[getattr(Task, name) for name in TASK_COLUMNS])
+
+
+def stream_statement(statement):
+    """
+    Narrow a task select to plain column rows, fetched in batches from the cursor.
+    """
+    return columns_statement(statement).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+
+def tasks_cache_key(
+        after_id: Optional[int],
+        limit: int,
+        status: Optional[str],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime],
+):
+    return "tasks", after_id, limit, status, created_after, created_before
+
+
+def serialize_task_rows(rows) -> bytes:
+    """
+    Serialize rows of columns_statement as a JSON list of TaskRead. The rows
+    come from the database, so they are not validated again; orjson encodes
+    created_at the same way pydantic does.
+    """
+    return orjson.dumps([dict(zip(TASK_COLUMNS, row)) for row in rows])
+
+
+def serialize_task(task) -> bytes:
+    return TaskRead.model_validate(task).model_dump_json().encode()
+
+
+def ndjson_lines(rows) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(TASK_COLUMNS, row))) + b"\n" for row in rows)
+
+
+def validate_bulk_tasks(tasks: List[Any]) -> Tuple[List[dict], List[TaskBulkError]]:
+    """
+    Validate bulk creation items one by one, returning insertable rows and per-item errors.
+    """
+    rows = []
+    errors = []
+    for index, item in enumerate(tasks):
+        try:
+            rows.append(TaskCreate.model_validate(item).model_dump())
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(map(str, error['loc'])) or 'task'}: {error['msg']}" for error in exc.errors()
+            )
+            errors.append(TaskBulkError(index=index, detail=detail))
+    return rows, errors
+
+
+def bulk_status_by_filter(update_request: TaskBulkStatusUpdate):
+    """
+    Build the status update for a filter-based bulk request, or None if it has no filter.
+    """
+    if (update_request.filter_status is None and update_request.created_after is None
+            and update_request.created_before is None):
+        return None
+    return filter_tasks(
+        update(Task),
+        update_request.filter_status,
+        update_request.created_after,
+        update_request.created_before,
+    ).values(status=update_request.status)
+
+
+def missing_ids(ids: List[int], found_ids: List[int]) -> List[TaskBulkError]:
+    found = set(found_ids)
+    return [TaskBulkError(id=task_id, detail="Task not found") for task_id in dict.fromkeys(ids)
+            if task_id not in found]
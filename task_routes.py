@@ -0,0 +1,281 @@
+# task_routes.py
+import inspect
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, update
+
+from cache import cached_response, task_cache
+from db_models import (
+    Task,
+    TaskBulkDelete,
+    TaskBulkResult,
+    TaskBulkStatusUpdate,
+    TaskCreate,
+    TaskRead,
+)
+from task_queries import (
+    bulk_status_by_filter,
+    chunks,
+    columns_statement,
+    missing_ids,
+    serialize_task,
+    serialize_task_rows,
+    tasks_cache_key,
+    tasks_statement,
+    validate_bulk_tasks,
+)
+
+# The handlers below are written once for both database modes. Each one is a
+# generator that yields the result of every session call that does I/O: a
+# value from a Session, an awaitable from an AsyncSession. make_router drives
+# them with run_sync or run_async, which send the value back in.
+
+
+def run_sync(handler):
+    value = None
+    try:
+        while True:
+            value = handler.send(value)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def run_async(handler):
+    value = None
+    try:
+        while True:
+            value = await handler.send(value)
+    except StopIteration as stop:
+        return stop.value
+
+
+def create_task(*, session, task: TaskCreate):
+    """
+    Create a new task with a title and description.
+
+    - **title**: The title of the task.
+    - **description**: A detailed description of the task.
+    - **status**: The status of the task (default is 'pending').
+    """
+    db_task = Task.model_validate(task)
+    session.add(db_task)
+    yield session.commit()
+    task_cache.invalidate()
+    yield session.refresh(db_task)
+    return db_task
+
+
+def read_tasks(
+        *,
+        session,
+        stream_tasks,
+        after_id: Optional[int] = None,
+        limit: int = Query(100, ge=1, le=1000),
+        status: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        stream: bool = False,
+        if_none_match: Optional[str] = Header(None),
+):
+    """
+    Retrieve tasks ordered by id, one page at a time.
+
+    - **after_id**: Return only tasks with an id greater than this cursor.
+    - **limit**: The maximum number of tasks in the page.
+    - **status**: Return only tasks with this status.
+    - **created_after**: Return only tasks created at or after this time.
+    - **created_before**: Return only tasks created before this time.
+    - **stream**: Stream every matching task as NDJSON instead of returning a page.
+
+    When more tasks may follow, the id to pass as the next **after_id** is
+    returned in the `X-Next-Cursor` header. Pages carry an `ETag`; sending it
+    back in `If-None-Match` returns 304 while the page is unchanged.
+    """
+    statement = tasks_statement(after_id, status, created_after, created_before)
+    if stream:
+        return StreamingResponse(stream_tasks(statement), media_type="application/x-ndjson")
+
+    key = tasks_cache_key(after_id, limit, status, created_after, created_before)
+    entry = task_cache.get(key)
+    if entry is None:
+        version = task_cache.version
+        rows = (yield session.execute(columns_statement(statement).limit(limit))).all()
+        headers = {"X-Next-Cursor": str(rows[-1].id)} if len(rows) == limit else {}
+        entry = task_cache.put(key, serialize_task_rows(rows), version, headers)
+    return cached_response(entry, if_none_match)
+
+
+def create_tasks_bulk(*, session, tasks: List[Any] = Body(...)):
+    """
+    Create many tasks in a single transaction.
+
+    - **tasks**: A list of tasks, each with the same fields as on single creation.
+
+    Items that fail validation are reported in **errors** by their index and
+    are not created; all other items are inserted together.
+    """
+    rows, errors = validate_bulk_tasks(tasks)
+    ids = []
+    if rows:
+        # SQLite allocates increasing rowids within a statement, so sorting the
+        # returned ids restores item order without falling back to one INSERT per row.
+        table = Task.__table__
+        ids = sorted((yield session.scalars(insert(table).returning(table.c.id), rows)))
+        yield session.commit()
+        task_cache.invalidate()
+    return TaskBulkResult(count=len(ids), ids=ids, errors=errors)
+
+
+def update_tasks_status_bulk(*, session, update_request: TaskBulkStatusUpdate):
+    """
+    Update the status of many tasks in a single transaction.
+
+    - **status**: The new status of the tasks.
+    - **ids**: The IDs of the tasks to update; unknown IDs are reported in **errors**.
+    - **filter_status**, **created_after**, **created_before**: Select the tasks to
+      update by filter instead of by IDs.
+    """
+    if update_request.ids is not None:
+        ids = []
+        for chunk in chunks(update_request.ids):
+            statement = (
+                update(Task).where(Task.id.in_(chunk))
+                .values(status=update_request.status).returning(Task.id)
+            )
+            ids.extend((yield session.scalars(statement)))
+        yield session.commit()
+        task_cache.invalidate()
+        return TaskBulkResult(count=len(ids), ids=ids, errors=missing_ids(update_request.ids, ids))
+
+    statement = bulk_status_by_filter(update_request)
+    if statement is None:
+        raise HTTPException(status_code=422, detail="Either ids or a filter is required")
+    result = yield session.execute(statement)
+    yield session.commit()
+    task_cache.invalidate()
+    return TaskBulkResult(count=result.rowcount)
+
+
+def delete_tasks_bulk(*, session, delete_request: TaskBulkDelete):
+    """
+    Delete many tasks in a single transaction.
+
+    - **ids**: The IDs of the tasks to delete; unknown IDs are reported in **errors**.
+    """
+    ids = []
+    for chunk in chunks(delete_request.ids):
+        ids.extend((yield session.scalars(delete(Task).where(Task.id.in_(chunk)).returning(Task.id))))
+    yield session.commit()
+    task_cache.invalidate()
+    return TaskBulkResult(count=len(ids), ids=ids, errors=missing_ids(delete_request.ids, ids))
+
+
+def read_task(*, session, task_id: int, if_none_match: Optional[str] = Header(None)):
+    """
+    Retrieve a task.
+
+    - **task_id**: The ID of the task to retrieve.
+
+    The response carries an `ETag`; sending it back in `If-None-Match` returns
+    304 while the task is unchanged.
+    """
+    key = ("task", task_id)
+    entry = task_cache.get(key)
+    if entry is None:
+        version = task_cache.version
+        task = yield session.get(Task, task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        entry = task_cache.put(key, serialize_task(task), version)
+    return cached_response(entry, if_none_match)
+
+
+def update_task_status(*, session, task_id: int, status: str):
+    """
+    Update a task's status.
+
+    - **task_id**: The ID of the task to update.
+    - **status**: The new status of the task.
+    """
+    task = yield session.get(Task, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    task.status = status
+    session.add(task)
+    yield session.commit()
+    task_cache.invalidate()
+    yield session.refresh(task)
+    return task
+
+
+def delete_task(*, session, task_id: int):
+    """
+    Delete a task.
+
+    - **task_id**: The ID of the task to delete.
+    """
+    task = yield session.get(Task, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    yield session.delete(task)
+    yield session.commit()
+    task_cache.invalidate()
+
+
+# Answered by the read routes when If-None-Match holds the current ETag
+NOT_MODIFIED = {304: {"description": "Not Modified"}}
+
+# Items are validated one by one in the handler, so the body is declared as a
+# plain list and the TaskCreate item schema is published here instead.
+BULK_CREATE_BODY = {"requestBody": {"content": {"application/json": {
+    "schema": {"items": {"$ref": "#/components/schemas/TaskCreate"}},
+}}}}
+
+# Registered in this order so the literal /tasks/bulk/ paths match before /tasks/{task_id}/.
+ROUTES = [
+    ("/tasks/", "POST", create_task, {"response_model": TaskRead, "status_code": 201}),
+    ("/tasks/", "GET", read_tasks, {"response_model": List[TaskRead], "responses": NOT_MODIFIED}),
+    ("/tasks/bulk/", "POST", create_tasks_bulk,
+     {"response_model": TaskBulkResult, "status_code": 201, "openapi_extra": BULK_CREATE_BODY}),
+    ("/tasks/bulk/status/", "PUT", update_tasks_status_bulk, {"response_model": TaskBulkResult}),
+    ("/tasks/bulk/", "DELETE", delete_tasks_bulk, {"response_model": TaskBulkResult}),
+    ("/tasks/{task_id}/", "GET", read_task, {"response_model": TaskRead, "responses": NOT_MODIFIED}),
+    ("/tasks/{task_id}/", "PUT", update_task_status, {"response_model": TaskRead}),
+    ("/tasks/{task_id}/", "DELETE", delete_task, {"status_code": 204}),
+]
+
+
+def _endpoint(handler, get_session, stream_tasks, asynchronous: bool):
+    """
+    Wrap a handler as a sync or async endpoint, with the session as a dependency.
+    """
+    signature = inspect.signature(handler)
+    fixed = {"stream_tasks": stream_tasks} if "stream_tasks" in signature.parameters else {}
+    parameters = [
+        parameter.replace(default=Depends(get_session)) if parameter.name == "session" else parameter
+        for parameter in signature.parameters.values() if parameter.name not in fixed
+    ]
+    if asynchronous:
+        async def endpoint(**kwargs):
+            return await run_async(handler(**kwargs, **fixed))
+    else:
+        def endpoint(**kwargs):
+            return run_sync(handler(**kwargs, **fixed))
+    endpoint.__name__ = handler.__name__
+    endpoint.__doc__ = handler.__doc__
+    endpoint.__signature__ = signature.replace(parameters=parameters)
+    return endpoint
+
+
+def make_router(get_session, stream_tasks, asynchronous: bool) -> APIRouter:
+    """
+    Build the task routes on top of a session dependency and an NDJSON streamer.
+    """
+    router = APIRouter()
+    for path, method, handler, options in ROUTES:
+        router.add_api_route(path, _endpoint(handler, get_session, stream_tasks, asynchronous),
+                             methods=[method], **options)
+    return router
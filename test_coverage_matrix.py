@@ -0,0 +1,173 @@
+import json
+import os
+from collections import Counter
+
+import allure
+import pytest
+
+import timings
+import vectorizer
+from conftest import COVERAGE_SWAGGER_JSON, CountingEmbeddings, write_result
+from coverage_matrix import COVERAGE_FILENAME, CoverageMatrix
+from vectorizer import CombinedVectorizer
+
+
+@pytest.fixture
+def results_dir(tmp_path):
+    results_dir = tmp_path / "allure-results"
+    results_dir.mkdir()
+    write_result(results_dir, "uuid-1", "test_create_task", [("POST", "http://127.0.0.1:8000/tasks/", 201, 30)])
+    write_result(results_dir, "uuid-2", "test_read_tasks", [("GET", "http://127.0.0.1:8000/tasks/?limit=5", 200, 10)])
+    write_result(results_dir, "uuid-3", "test_update_task_status", [
+        ("POST", "http://127.0.0.1:8000/tasks/", 201, 20),
+        ("PUT", "http://127.0.0.1:8000/tasks/17/", 200, 50),
+    ], status="failed")
+    write_result(results_dir, "uuid-4", "test_legacy", [("GET", "http://127.0.0.1:8000/legacy/", 404, 5)])
+    return results_dir
+
+
+@allure.feature("Coverage Matrix")
+@allure.story("Endpoint Coverage")
+@allure.title("Test mapping Allure requests onto Swagger endpoints and response codes")
+def test_coverage_matrix(tmp_path, results_dir):
+    vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", str(results_dir),
+                                    str(tmp_path / "vector_db"), embeddings=CountingEmbeddings(size=4))
+    matrix = vectorizer.build_coverage(COVERAGE_SWAGGER_JSON)
+    allure.attach(json.dumps(matrix.as_dict(), indent=2), "Coverage Matrix", allure.attachment_type.JSON)
+
+    with allure.step("Check the per-endpoint coverage"):
+        post = matrix.endpoints["POST /tasks/"]
+        assert sorted(post.tests) == ["test_create_task", "test_update_task_status"]
+        assert post.codes == {"201": 2}
+        assert post.missing_codes == ["422"]
+        put = matrix.endpoints["PUT /tasks/{task_id}/"]
+        assert put.failed_tests == ["test_update_task_status"]
+        assert put.durations_ms == [50]
+        assert matrix.endpoints["GET /tasks/"].codes == {"200": 1}
+        assert not matrix.endpoints["DELETE /tasks/{task_id}/"].tests
+        assert matrix.undocumented == {"GET /legacy/": 1}
+
+    with allure.step("Check the totals"):
+        assert matrix.summary() == {
+            "tests": 4, "endpoints": 5, "covered_endpoints": 3, "endpoint_coverage": 0.6,
+            "response_codes": 9, "covered_response_codes": 3, "response_code_coverage": 0.333,
+        }
+        assert matrix.endpoints["POST /tasks/"].as_dict()["duration"] == {
+            "count": 2, "mean_ms": 25.0, "p50_ms": 20, "p95_ms": 30, "max_ms": 30}
+
+
+@allure.feature("Coverage Matrix")
+@allure.story("Gaps Summary")
+@allure.title("Test the gaps summary and saving the matrix next to the index")
+def test_coverage_gaps_summary(tmp_path, results_dir):
+    vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", str(results_dir),
+                                    str(tmp_path / "vector_db"), embeddings=CountingEmbeddings(size=4))
+    vectorizer.fetch_swagger_json = lambda: COVERAGE_SWAGGER_JSON
+    vectorizer.process_and_store()
+
+    with allure.step("Load the saved matrix"):
+        matrix = CoverageMatrix.load(str(tmp_path / "vector_db" / COVERAGE_FILENAME))
+        summary = matrix.gaps_summary()
+        allure.attach(summary, "Gaps Summary", allure.attachment_type.TEXT)
+
+    with allure.step("Check the summary"):
+        assert summary.splitlines()[0] == ("Tests: 4. Endpoints covered: 3/5 (60%). "
+                                           "Response codes covered: 3/9 (33%).")
+        assert "- DELETE /tasks/bulk/" in summary
+        assert "- DELETE /tasks/{task_id}/" in summary
+        assert "- PUT /tasks/{task_id}/: 404" in summary
+        assert "- PUT /tasks/{task_id}/: test_update_task_status" in summary
+        assert "- GET /legacy/ (1x)" in summary
+        assert "- PUT /tasks/{task_id}/: 50ms" in summary
+
+
+def write_attachments(results_dir, uuid, step_index, texts):
+    attachments = []
+    for name, text in texts.items():
+        source = f"{uuid}-{step_index}-{name.replace(' ', '-')}-attachment.txt"
+        (results_dir / source).write_text(text)
+        attachments.append({"name": name, "source": source, "type": "text/plain"})
+    return attachments
+
+
+@allure.feature("Coverage Matrix")
+@allure.story("Endpoint Coverage")
+@allure.title("Test requests made by steps whose names do not state the HTTP method")
+def test_coverage_without_method_in_step_name(tmp_path):
+    results_dir = tmp_path / "allure-results"
+    results_dir.mkdir()
+    # Shaped like test_main.py: the request is made in a setup step named after what it does
+    steps = [
+        ("Create a task for updating status", {"Request URL": "http://127.0.0.1:8000/tasks/",
+                                               "Request Body": "{'title': 'Task to Update'}",
+                                               "Response Status": "201"}),
+        ("Send PUT request to update task status", {"Request URL": "http://127.0.0.1:8000/tasks/5/",
+                                                    "Response Status": "200"}),
+        ("Remove the task", {"Request URL": "http://127.0.0.1:8000/tasks/5/", "Request Method": "delete",
+                             "Response Status": "200"}),
+        ("Look the task up again", {"Request URL": "http://127.0.0.1:8000/tasks/5/", "Response Status": "404"}),
+        ("Remove every task", {"Request URL": "http://127.0.0.1:8000/tasks/bulk/", "Response Status": "200"}),
+    ]
+    result = {"uuid": "uuid-1", "name": "test_update_task_status", "status": "passed", "start": 1000, "stop": 2000,
+              "steps": [{"name": name, "status": "passed", "start": 1000, "stop": 1010,
+                         "attachments": write_attachments(results_dir, "uuid-1", index, texts)}
+                        for index, (name, texts) in enumerate(steps)]}
+    (results_dir / "uuid-1-result.json").write_text(json.dumps(result))
+
+    vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", str(results_dir),
+                                    str(tmp_path / "vector_db"), embeddings=CountingEmbeddings(size=4))
+    matrix = vectorizer.build_coverage(COVERAGE_SWAGGER_JSON)
+    allure.attach(json.dumps(matrix.as_dict(), indent=2), "Coverage Matrix", allure.attachment_type.JSON)
+
+    with allure.step("Check that a request with a body maps to the one body method on its path"):
+        assert matrix.endpoints["POST /tasks/"].codes == {"201": 1}
+        assert not matrix.endpoints["GET /tasks/"].tests
+
+    with allure.step("Check the method from the step name and from a Request Method attachment"):
+        assert matrix.endpoints["PUT /tasks/{task_id}/"].codes == {"200": 1}
+        assert matrix.endpoints["DELETE /tasks/{task_id}/"].codes == {"200": 1}
+
+    with allure.step("Check the single documented operation of a path and an ambiguous request"):
+        assert matrix.endpoints["DELETE /tasks/bulk/"].codes == {"200": 1}
+        assert matrix.undocumented == {"? /tasks/5/": 1}
+
+
+@allure.feature("Coverage Matrix")
+@allure.story("Ingestion")
+@allure.title("Test that an ingest reads every result and attachment once for chunks, coverage and timings")
+def test_ingest_reads_results_once(tmp_path, results_dir, monkeypatch):
+    reads = Counter()
+
+    def counting(module, name, key):
+        function = getattr(module, name)
+
+        def wrapper(*args, **kwargs):
+            reads[key(*args)] += 1
+            return function(*args, **kwargs)
+        monkeypatch.setattr(module, name, wrapper)
+
+    for module in (vectorizer, timings):
+        counting(module, "load_json", lambda path: os.path.basename(path))
+        counting(module, "read_attachment", lambda results_dir, attachment, *args: attachment["source"])
+
+    with allure.step("Ingest the results"):
+        ingest = vectorizer.CombinedVectorizer("http://swagger.invalid/openapi.json", str(results_dir),
+                                               str(tmp_path / "vector_db"), embeddings=CountingEmbeddings(size=4))
+        ingest.fetch_swagger_json = lambda: COVERAGE_SWAGGER_JSON
+        ingest.process_and_store()
+        allure.attach(json.dumps(reads, indent=2), "Reads", allure.attachment_type.JSON)
+
+    with allure.step("Check that every file was read once"):
+        files = sorted(path.name for path in results_dir.iterdir())
+        assert sorted(reads) == files
+        assert set(reads.values()) == {1}
+
+    with allure.step("Check the coverage and timings built from that pass"):
+        saved = CoverageMatrix.load(str(tmp_path / "vector_db" / COVERAGE_FILENAME))
+        assert saved.as_dict() == ingest.build_coverage(COVERAGE_SWAGGER_JSON).as_dict()
+        store = timings.TimingStore.load(str(tmp_path / "vector_db" / timings.TIMINGS_FILENAME))
+        reference = timings.TimingStore(str(tmp_path / "reference.npz"))
+        assert reference.ingest(str(results_dir), swagger_json=COVERAGE_SWAGGER_JSON)
+        assert store.runs[0]["signature"] == reference.runs[0]["signature"]
+        assert store.percentiles("endpoint") == reference.percentiles("endpoint")
+        assert [row["endpoint"] for row in store.percentiles("endpoint")][0] == "PUT /tasks/{task_id}/"
@@ -0,0 +1,52 @@
+import allure
+from fastapi.testclient import TestClient
+
+from conftest import COVERAGE_SWAGGER_JSON, CountingEmbeddings, write_result
+from instrumentation import stage_report, stage_totals
+from vectorizer import CombinedVectorizer
+
+
+@allure.feature("Instrumentation")
+@allure.story("API Metrics")
+@allure.title("Test request latency and per-request database metrics on /metrics")
+def test_api_metrics(create_task_app):
+    with TestClient(create_task_app()) as client:
+        with allure.step("Send requests to a templated route"):
+            response = client.post("/tasks/", json={"title": "Measured Task", "description": "Count my queries."})
+            task_id = response.json()["id"]
+            assert client.put(f"/tasks/{task_id}/", params={"status": "completed"}).status_code == 200
+
+        with allure.step("Scrape the metrics"):
+            response = client.get("/metrics")
+            allure.attach(response.text, "Metrics", allure.attachment_type.TEXT)
+            assert response.status_code == 200
+
+        with allure.step("Check that latency and database queries are labelled by route template"):
+            assert 'http_request_duration_seconds_count{method="PUT",route="/tasks/{task_id}/",status="200"}' in response.text
+            assert f"/tasks/{task_id}/" not in response.text
+            assert 'db_queries_per_request_count{route="/tasks/"}' in response.text
+            assert 'db_query_duration_seconds_count{operation="INSERT"}' in response.text
+
+
+@allure.feature("Instrumentation")
+@allure.story("Pipeline Stages")
+@allure.title("Test per-stage timings of the ingestion pipeline")
+def test_pipeline_stages(tmp_path):
+    results_dir = tmp_path / "allure-results"
+    results_dir.mkdir()
+    write_result(results_dir, "uuid-1", "test_create_task", [("POST", "http://127.0.0.1:8000/tasks/", 201, 30)])
+    vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", str(results_dir),
+                                    str(tmp_path / "vector_db"), embeddings=CountingEmbeddings(size=4))
+    vectorizer.fetch_swagger_json = lambda: COVERAGE_SWAGGER_JSON
+
+    with allure.step("Run the ingestion inside a stage report"):
+        with stage_report():
+            vectorizer.process_and_store()
+            totals = stage_totals()
+        allure.attach(str(totals), "Stage Totals", allure.attachment_type.TEXT)
+
+    with allure.step("Check the recorded stages"):
+        for name in ("fetch", "parse", "embed", "index", "coverage", "timings"):
+            assert totals[name]["count"] >= 1
+        assert totals["embed"]["items"] == totals["index"]["items"] > 0
+        assert totals["embed"]["tokens"] > 0
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 import requests
 import allure
@@ -188,3 +190,329 @@ def test_delete_task(client):
                       "Assertion: Database Record", allure.attachment_type.TEXT)
         assert task_in_db is None
         session.close()
+
+
+@allure.feature("Task Management")
+@allure.story("Read Tasks")
+@allure.title("Test reading tasks page by page")
+def test_read_tasks_pagination(client):
+    with allure.step("Create tasks to paginate over"):
+        url = "http://127.0.0.1:8000/tasks/"
+        created_ids = []
+        for index in range(3):
+            payload = {"title": f"Page Task {index}", "status": "paginated"}
+            response = client.post(url, json=payload)
+            created_ids.append(response.json()["id"])
+
+        allure.attach(str(created_ids), "Created Task IDs", allure.attachment_type.TEXT)
+
+    with allure.step("Send GET request for the first page"):
+        params = {"status": "paginated", "after_id": created_ids[0] - 1, "limit": 2}
+        response = client.get(url, params=params)
+
+        allure.attach(url, "Request URL", allure.attachment_type.TEXT)
+        allure.attach(str(params), "Request Parameters", allure.attachment_type.JSON)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(str(response.headers), "Response Headers", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Check the first page and its cursor"):
+        expected_status_code = 200
+        allure.attach(f"Expected: {expected_status_code}, Actual: {response.status_code}",
+                      "Assertion: Status Code", allure.attachment_type.TEXT)
+        assert response.status_code == expected_status_code
+
+        page_ids = [task["id"] for task in response.json()]
+        allure.attach(f"Expected: {created_ids[:2]}, Actual: {page_ids}",
+                      "Assertion: Page IDs", allure.attachment_type.TEXT)
+        assert page_ids == created_ids[:2]
+
+        next_cursor = response.headers.get("X-Next-Cursor")
+        allure.attach(f"Expected: {created_ids[1]}, Actual: {next_cursor}",
+                      "Assertion: Next Cursor", allure.attachment_type.TEXT)
+        assert next_cursor == str(created_ids[1])
+
+    with allure.step("Send GET request for the next page"):
+        params = {"status": "paginated", "after_id": next_cursor, "limit": 2}
+        response = client.get(url, params=params)
+
+        allure.attach(url, "Request URL", allure.attachment_type.TEXT)
+        allure.attach(str(params), "Request Parameters", allure.attachment_type.JSON)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Check the last page"):
+        page_ids = [task["id"] for task in response.json()]
+        allure.attach(f"Expected: {created_ids[2:]}, Actual: {page_ids}",
+                      "Assertion: Page IDs", allure.attachment_type.TEXT)
+        assert page_ids == created_ids[2:]
+
+        allure.attach(f"Expected: None, Actual: {response.headers.get('X-Next-Cursor')}",
+                      "Assertion: Next Cursor", allure.attachment_type.TEXT)
+        assert "X-Next-Cursor" not in response.headers
+
+
+@allure.feature("Task Management")
+@allure.story("Read Tasks")
+@allure.title("Test streaming tasks as NDJSON")
+def test_read_tasks_stream(client):
+    with allure.step("Create a task to stream"):
+        url = "http://127.0.0.1:8000/tasks/"
+        payload = {"title": "Streamed Task", "status": "streamed"}
+        response = client.post(url, json=payload)
+        task_id = response.json()["id"]
+
+        allure.attach(str(task_id), "Created Task ID", allure.attachment_type.TEXT)
+
+    with allure.step("Send GET request in streaming mode"):
+        params = {"status": "streamed", "stream": "true"}
+        response = client.get(url, params=params)
+
+        allure.attach(url, "Request URL", allure.attachment_type.TEXT)
+        allure.attach(str(params), "Request Parameters", allure.attachment_type.JSON)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(str(response.headers), "Response Headers", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.TEXT)
+
+    with allure.step("Check the streamed lines"):
+        expected_status_code = 200
+        allure.attach(f"Expected: {expected_status_code}, Actual: {response.status_code}",
+                      "Assertion: Status Code", allure.attachment_type.TEXT)
+        assert response.status_code == expected_status_code
+
+        content_type = response.headers["Content-Type"]
+        allure.attach(f"Expected: application/x-ndjson, Actual: {content_type}",
+                      "Assertion: Content Type", allure.attachment_type.TEXT)
+        assert content_type.startswith("application/x-ndjson")
+
+        tasks = [json.loads(line) for line in response.text.splitlines()]
+        allure.attach(f"Expected: {task_id} streamed, Actual: {[task['id'] for task in tasks]}",
+                      "Assertion: Streamed Task", allure.attachment_type.TEXT)
+        assert task_id in [task["id"] for task in tasks]
+        assert all(task["status"] == "streamed" for task in tasks)
+
+
+@allure.feature("Task Management")
+@allure.story("Bulk Operations")
+@allure.title("Test creating and updating tasks in bulk")
+def test_bulk_create_and_update_tasks(client):
+    with allure.step("Send POST request to create tasks in bulk"):
+        url = "http://127.0.0.1:8000/tasks/bulk/"
+        payload = [
+            {"title": "Bulk Task 1", "description": "First bulk task."},
+            {"description": "Missing title."},
+            {"title": "Bulk Task 2"},
+        ]
+        response = client.post(url, json=payload)
+
+        allure.attach(url, "Request URL", allure.attachment_type.TEXT)
+        allure.attach(str(payload), "Request Body", allure.attachment_type.JSON)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(str(response.headers), "Response Headers", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Check that valid tasks were created and the invalid one reported"):
+        expected_status_code = 201
+        allure.attach(f"Expected: {expected_status_code}, Actual: {response.status_code}",
+                      "Assertion: Status Code", allure.attachment_type.TEXT)
+        assert response.status_code == expected_status_code
+
+        data = response.json()
+        allure.attach(f"Expected: 2, Actual: {data['count']}",
+                      "Assertion: Created Count", allure.attachment_type.TEXT)
+        assert data["count"] == 2
+        assert len(data["ids"]) == 2
+
+        error_indexes = [error["index"] for error in data["errors"]]
+        allure.attach(f"Expected: [1], Actual: {error_indexes}",
+                      "Assertion: Error Indexes", allure.attachment_type.TEXT)
+        assert error_indexes == [1]
+        task_ids = data["ids"]
+
+    with allure.step("Check that the bulk body is documented as TaskCreate items"):
+        schema = client.get("http://127.0.0.1:8000/openapi.json").json()
+        content = schema["paths"]["/tasks/bulk/"]["post"]["requestBody"]["content"]["application/json"]
+        assert content["schema"]["items"] == {"$ref": "#/components/schemas/TaskCreate"}
+
+    with allure.step("Send PUT request to update the status of the tasks in bulk"):
+        url = "http://127.0.0.1:8000/tasks/bulk/status/"
+        missing_id = task_ids[-1] + 1000000
+        payload = {"status": "completed", "ids": task_ids + [missing_id]}
+        response = client.put(url, json=payload)
+
+        allure.attach(url, "Request URL", allure.attachment_type.TEXT)
+        allure.attach(str(payload), "Request Body", allure.attachment_type.JSON)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Check that the tasks were updated and the unknown id reported"):
+        expected_status_code = 200
+        allure.attach(f"Expected: {expected_status_code}, Actual: {response.status_code}",
+                      "Assertion: Status Code", allure.attachment_type.TEXT)
+        assert response.status_code == expected_status_code
+
+        data = response.json()
+        allure.attach(f"Expected: {task_ids}, Actual: {data['ids']}",
+                      "Assertion: Updated IDs", allure.attachment_type.TEXT)
+        assert sorted(data["ids"]) == sorted(task_ids)
+
+        error_ids = [error["id"] for error in data["errors"]]
+        allure.attach(f"Expected: [{missing_id}], Actual: {error_ids}",
+                      "Assertion: Error IDs", allure.attachment_type.TEXT)
+        assert error_ids == [missing_id]
+
+    with allure.step("Validate the task statuses in the database"):
+        session = TestingSessionLocal()
+        statuses = [session.get(Task, task_id).status for task_id in task_ids]
+
+        allure.attach(str(statuses), "Database Data", allure.attachment_type.JSON)
+        allure.attach(f"Expected: all completed, Actual: {statuses}",
+                      "Assertion: Database Status", allure.attachment_type.TEXT)
+        assert statuses == ["completed"] * len(task_ids)
+        session.close()
+
+
+@allure.feature("Task Management")
+@allure.story("Bulk Operations")
+@allure.title("Test deleting tasks in bulk")
+def test_bulk_delete_tasks(client):
+    with allure.step("Create tasks for deletion"):
+        url = "http://127.0.0.1:8000/tasks/bulk/"
+        payload = [{"title": "Bulk Delete 1"}, {"title": "Bulk Delete 2"}]
+        response = client.post(url, json=payload)
+        task_ids = response.json()["ids"]
+
+        allure.attach(str(task_ids), "Created Task IDs", allure.attachment_type.TEXT)
+
+    with allure.step("Send DELETE request to delete the tasks in bulk"):
+        url = "http://127.0.0.1:8000/tasks/bulk/"
+        payload = {"ids": task_ids}
+        response = client.delete(url, json=payload)
+
+        allure.attach(url, "Request URL", allure.attachment_type.TEXT)
+        allure.attach(str(payload), "Request Body", allure.attachment_type.JSON)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Check if the tasks were deleted successfully"):
+        expected_status_code = 200
+        allure.attach(f"Expected: {expected_status_code}, Actual: {response.status_code}",
+                      "Assertion: Status Code", allure.attachment_type.TEXT)
+        assert response.status_code == expected_status_code
+
+        data = response.json()
+        allure.attach(f"Expected: {len(task_ids)}, Actual: {data['count']}",
+                      "Assertion: Deleted Count", allure.attachment_type.TEXT)
+        assert data["count"] == len(task_ids)
+        assert data["errors"] == []
+
+    with allure.step("Validate the task deletion in the database"):
+        session = TestingSessionLocal()
+        tasks_in_db = [session.get(Task, task_id) for task_id in task_ids]
+
+        allure.attach(str(tasks_in_db), "Database Data", allure.attachment_type.JSON)
+        allure.attach(f"Expected: all None, Actual: {tasks_in_db}",
+                      "Assertion: Database Records", allure.attachment_type.TEXT)
+        assert tasks_in_db == [None] * len(task_ids)
+        session.close()
+
+
+@allure.feature("Task Management")
+@allure.story("Read Task")
+@allure.title("Test conditional task reads with ETag")
+def test_read_task_etag(client):
+    with allure.step("Create a task to read"):
+        url = "http://127.0.0.1:8000/tasks/"
+        payload = {"title": "Cached Task", "description": "Read me twice."}
+        response = client.post(url, json=payload)
+        task_id = response.json()["id"]
+
+        allure.attach(str(task_id), "Created Task ID", allure.attachment_type.TEXT)
+
+    with allure.step("Send GET request to read the task"):
+        url = f"http://127.0.0.1:8000/tasks/{task_id}/"
+        response = client.get(url)
+        etag = response.headers.get("ETag")
+
+        allure.attach(url, "Request URL", allure.attachment_type.TEXT)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(str(response.headers), "Response Headers", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Check the task and its ETag"):
+        expected_status_code = 200
+        allure.attach(f"Expected: {expected_status_code}, Actual: {response.status_code}",
+                      "Assertion: Status Code", allure.attachment_type.TEXT)
+        assert response.status_code == expected_status_code
+
+        allure.attach(f"Expected: ETag header, Actual: {etag}",
+                      "Assertion: ETag", allure.attachment_type.TEXT)
+        assert etag
+        assert response.json()["title"] == "Cached Task"
+
+    with allure.step("Send conditional GET request with the ETag"):
+        headers = {"If-None-Match": etag}
+        response = client.get(url, headers=headers)
+
+        allure.attach(str(headers), "Request Headers", allure.attachment_type.TEXT)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+
+    with allure.step("Check that the unchanged task is not sent again"):
+        expected_status_code = 304
+        allure.attach(f"Expected: {expected_status_code}, Actual: {response.status_code}",
+                      "Assertion: Status Code", allure.attachment_type.TEXT)
+        assert response.status_code == expected_status_code
+        assert response.content == b""
+
+    with allure.step("Update the task status"):
+        response = client.put(url, params={"status": "completed"})
+
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Send conditional GET request with the old ETag"):
+        response = client.get(url, headers=headers)
+
+        allure.attach(str(headers), "Request Headers", allure.attachment_type.TEXT)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Check that the updated task is sent"):
+        expected_status_code = 200
+        allure.attach(f"Expected: {expected_status_code}, Actual: {response.status_code}",
+                      "Assertion: Status Code", allure.attachment_type.TEXT)
+        assert response.status_code == expected_status_code
+
+        allure.attach(f"Expected: completed, Actual: {response.json()['status']}",
+                      "Assertion: Status", allure.attachment_type.TEXT)
+        assert response.json()["status"] == "completed"
+        assert response.headers["ETag"] != etag
+
+
+@allure.feature("Task Management")
+@allure.story("Read Tasks")
+@allure.title("Test that list pages serialize tasks like single reads and keep the documented schema")
+def test_read_tasks_serialization(client):
+    with allure.step("Create a task"):
+        url = "http://127.0.0.1:8000/tasks/"
+        payload = {"title": "Serialized Task", "description": None}
+        task_id = client.post(url, json=payload).json()["id"]
+
+    with allure.step("Read the task from a list page and on its own"):
+        params = {"after_id": task_id - 1, "limit": 1}
+        response = client.get(url, params=params)
+        single = client.get(f"{url}{task_id}/").json()
+
+        allure.attach(url, "Request URL", allure.attachment_type.TEXT)
+        allure.attach(str(response.status_code), "Response Status", allure.attachment_type.TEXT)
+        allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+
+    with allure.step("Check that both representations match"):
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "application/json"
+        assert response.json() == [single]
+
+    with allure.step("Check that the list is still documented as TaskRead items"):
+        schema = client.get("http://127.0.0.1:8000/openapi.json").json()
+        content = schema["paths"]["/tasks/"]["get"]["responses"]["200"]["content"]["application/json"]
+        assert content["schema"]["items"] == {"$ref": "#/components/schemas/TaskRead"}
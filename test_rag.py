@@ -0,0 +1,220 @@
+import asyncio
+import json
+
+import allure
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+
+from conftest import CountingEmbeddings
+from coverage_matrix import COVERAGE_FILENAME, CoverageMatrix
+from rag import RAGTestCoverageAnalysis
+from retrieval import query_keys, reciprocal_rank_fusion
+from vector_store import FaissVectorStore
+
+
+def make_analyzer(vector_db, responses=("ok",)):
+    return RAGTestCoverageAnalysis(str(vector_db), embeddings=CountingEmbeddings(size=8),
+                                   llm=FakeListChatModel(responses=list(responses)), swagger_k=2, allure_k=3)
+
+
+@allure.feature("RAG")
+@allure.story("Retrieval")
+@allure.title("Test that every source contributes its own top documents")
+def test_retrieve_per_source(vector_db):
+    analyzer = make_analyzer(vector_db)
+    swagger_docs, allure_docs = analyzer.retrieve("Test Name: test_3\nUUID: uuid-3")
+
+    with allure.step("Check the retrieved documents"):
+        allure.attach(analyzer.retrieve_context("Test Name: test_3\nUUID: uuid-3"), "Context",
+                      allure.attachment_type.TEXT)
+        assert len(swagger_docs) == 2
+        assert all(doc.metadata["source"] == "swagger" for doc in swagger_docs)
+        assert len(allure_docs) == 3
+        assert all(doc.metadata["source"] == "allure" for doc in allure_docs)
+        assert allure_docs[0].metadata["uuid"] == "uuid-3"
+
+
+@allure.feature("RAG")
+@allure.story("Retrieval")
+@allure.title("Test that retrievals are cached and done once per question")
+def test_retrieval_cache(vector_db):
+    analyzer = make_analyzer(vector_db, responses=["first", "second"])
+
+    with allure.step("Ask twice with the same query"):
+        assert analyzer.analyze_coverage("You are a tester.", "Which tests cover /tasks/?") == "first"
+        assert analyzer.generate_new_tests("You are a tester.", "Which tests cover /tasks/?") == "second"
+        assert analyzer.embeddings.calls == [["Which tests cover /tasks/?"]]
+        assert len(analyzer.retrievals) == 1
+        assert [message.content for message in analyzer.history][1::2] == ["first", "second"]
+
+    with allure.step("Check that a different k misses the result cache but not the embedding cache"):
+        analyzer.allure_k += 1
+        analyzer.retrieve("Which tests cover /tasks/?")
+        assert len(analyzer.retrievals) == 2
+        assert len(analyzer.embeddings.calls) == 1
+
+
+@allure.feature("RAG")
+@allure.story("Hybrid Retrieval")
+@allure.title("Test that exact endpoint and uuid lookups skip the embedding call")
+def test_exact_lookup_fast_path(vector_db):
+    analyzer = make_analyzer(vector_db)
+
+    with allure.step("Look up an endpoint and a test uuid"):
+        assert query_keys('"put /tasks/{task_id}/", uuid-7.') == ["PUT /tasks/{task_id}/", "uuid-7"]
+        swagger_docs, allure_docs = analyzer.retrieve("PUT /tasks/{task_id}/ uuid-7")
+        assert [doc.metadata["method"] for doc in swagger_docs] == ["put"]
+        assert [doc.metadata["uuid"] for doc in allure_docs] == ["uuid-7"]
+        assert analyzer.embeddings.calls == []
+
+    with allure.step("Check that a path without a method matches every operation on it"):
+        swagger_docs, _ = analyzer.retrieve("/tasks/")
+        assert sorted(doc.metadata["method"] for doc in swagger_docs) == ["get", "post"]
+
+    with allure.step("Check that an endpoint-only query still finds tests by search"):
+        assert not analyzer.retriever.is_exact_lookup("PUT /tasks/{task_id}/")
+        allure_docs = analyzer.retriever.search("PUT /tasks/{task_id}/", k=3, source="allure")
+        assert len(allure_docs) == 3
+        assert all(doc.metadata["source"] == "allure" for doc in allure_docs)
+        swagger_docs = analyzer.retriever.search("PUT /tasks/{task_id}/", k=3, source="swagger")
+        assert [doc.metadata["method"] for doc in swagger_docs] == ["put"]
+
+
+@allure.feature("RAG")
+@allure.story("Hybrid Retrieval")
+@allure.title("Test BM25 search, reciprocal-rank fusion and index updates")
+def test_hybrid_search(vector_db):
+    analyzer = make_analyzer(vector_db)
+    store = analyzer.vector_store
+
+    with allure.step("Search lexically without embedding"):
+        results = store.lexical_search("Method PUT", k=2, source="swagger")
+        allure.attach(str(results), "BM25 Results", allure.attachment_type.TEXT)
+        assert results[0][0].metadata["method"] == "put"
+        assert analyzer.embeddings.calls == []
+
+    with allure.step("Fuse rankings"):
+        a, b, c = (Document(id=name, page_content=name) for name in "abc")
+        assert [doc.id for doc in reciprocal_rank_fusion([[a, b, c], [b, c]])] == ["b", "c", "a"]
+
+    with allure.step("Combine exact, lexical and dense results for a question"):
+        docs = analyzer.retriever.search("Which tests exercise PUT /tasks/{task_id}/ status updates?", k=2,
+                                         source="swagger")
+        assert docs[0].metadata["method"] == "put"
+        assert len(docs) == 2
+        assert len(analyzer.embeddings.calls) == 1
+
+    with allure.step("Check that deleted documents leave the lexical index"):
+        writable = FaissVectorStore.load(str(vector_db), CountingEmbeddings(size=8), mmap=False)
+        writable.delete(["doc-22"])
+        assert writable.lexical_search("PUT", k=5, source="swagger") == []
+        assert writable.lookup(["PUT /tasks/{task_id}/"]) == {}
+
+
+class SlowLLM:
+    """
+    Async fake LLM that records how many calls overlap and fails on request.
+    """
+
+    def __init__(self, delay=0.02, fail_on="Which tests are slow?"):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        return AIMessage(content=f"answer {len(self.prompts)}")
+
+    async def ainvoke(self, messages):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            prompt = messages[-1].content
+            self.prompts.append(prompt)
+            if prompt.endswith(self.fail_on):
+                raise TimeoutError("LLM timed out")
+            return AIMessage(content=f"answer {len(self.prompts)}")
+        finally:
+            self.in_flight -= 1
+
+
+@allure.feature("RAG")
+@allure.story("Batch Analysis")
+@allure.title("Test a batch over every endpoint with bounded concurrency and JSONL output")
+def test_run_batch(vector_db, tmp_path):
+    analyzer = make_analyzer(vector_db)
+    analyzer.llm = SlowLLM()
+
+    with allure.step("Generate one query per Swagger operation"):
+        queries = analyzer.endpoint_queries()
+        allure.attach("\n".join(queries), "Queries", allure.attachment_type.TEXT)
+        assert len(queries) == 3
+        assert "PUT /tasks/{task_id}/" in queries[2]
+
+    with allure.step("Run the batch with extra questions"):
+        queries += ["Which tests delete tasks?", "Which tests are slow?"]
+        output = tmp_path / "report.jsonl"
+        count = analyzer.run_batch("You are a tester.", str(output), queries, max_concurrency=2)
+        results = [json.loads(line) for line in output.read_text().splitlines()]
+        allure.attach(output.read_text(), "Report", allure.attachment_type.TEXT)
+
+    with allure.step("Check the results"):
+        assert count == len(results) == 5
+        assert sorted(result["query"] for result in results) == sorted(queries)
+        assert analyzer.llm.max_in_flight == 2
+        failed = [result for result in results if "error" in result]
+        assert [(result["query"], result["error"]) for result in failed] == [
+            ("Which tests are slow?", "TimeoutError: LLM timed out")]
+        assert all(result["sources"] for result in results)
+        # All questions are embedded together, and the batch leaves the shared history alone.
+        assert len(analyzer.embeddings.calls) == 1
+        assert len(analyzer.history) == 0
+
+
+@allure.feature("RAG")
+@allure.story("Coverage Analysis")
+@allure.title("Test that coverage analysis sends only the coverage gaps to the LLM")
+def test_analyze_coverage_uses_gaps_summary(vector_db):
+    matrix = CoverageMatrix({"paths": {"/tasks/": {"get": {"responses": {"200": {}}}}}})
+    matrix.save(str(vector_db / COVERAGE_FILENAME))
+    analyzer = make_analyzer(vector_db)
+    analyzer.llm = SlowLLM()
+
+    analyzer.analyze_coverage("You are a tester.", "Which endpoints lack tests?")
+    prompt = analyzer.llm.prompts[0]
+    allure.attach(prompt, "Prompt", allure.attachment_type.TEXT)
+    assert "Untested endpoints:\n- GET /tasks/" in prompt
+    assert "Test Name:" not in prompt
+    assert analyzer.embeddings.calls == []
+
+
+@allure.feature("RAG")
+@allure.story("Index Snapshots")
+@allure.title("Test that a loaded reader keeps serving its snapshot while the writer saves")
+def test_reader_snapshot_isolation(vector_db):
+    reader = FaissVectorStore.load(str(vector_db), CountingEmbeddings(size=8), mmap=True)
+
+    with allure.step("Delete and add documents through the writer and save"):
+        writer = FaissVectorStore.load(str(vector_db), CountingEmbeddings(size=8), mmap=False)
+        writer.delete(["doc-22"])
+        writer.add_texts(["Path: /tasks/bulk/\nMethod: DELETE"],
+                         [{"source": "swagger", "path": "/tasks/bulk/", "method": "delete"}], ids=["doc-new"])
+        writer.save()
+
+    with allure.step("Check that the reader still sees the version it loaded"):
+        assert [doc.id for doc, _ in reader.lexical_search("PUT", k=5, source="swagger")] == ["doc-22"]
+        assert reader.lexical_search("bulk", k=5, source="swagger") == []
+        assert list(reader.lookup(["PUT /tasks/{task_id}/"])) == ["PUT /tasks/{task_id}/"]
+        vector = CountingEmbeddings(size=8).embed_query("Path: /tasks/{task_id}/\nMethod: PUT")
+        assert "doc-22" in [doc.id for doc in reader.similarity_search_by_vector(vector, k=3,
+                                                                                  filter={"source": "swagger"})]
+
+    with allure.step("Check that a reader loaded after the save sees the new version"):
+        latest = FaissVectorStore.load(str(vector_db), CountingEmbeddings(size=8), mmap=True)
+        assert latest.version == reader.version + 1
+        assert latest.lexical_search("PUT", k=5, source="swagger") == []
+        assert [doc.id for doc, _ in latest.lexical_search("bulk", k=5, source="swagger")] == ["doc-new"]
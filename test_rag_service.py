@@ -0,0 +1,105 @@
+import json
+import threading
+
+import allure
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+from conftest import CountingEmbeddings
+from rag import RAGTestCoverageAnalysis
+from rag_service import create_app
+from vector_store import FaissVectorStore
+
+
+class GatedLLM:
+    """
+    Fake LLM that blocks every call until it is released.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def invoke(self, messages):
+        self.started.set()
+        assert self.release.wait(5)
+        return AIMessage(content=f"answer from {self.name}")
+
+
+def write_version(vector_db, version, deleted=()):
+    store = FaissVectorStore.load(str(vector_db), CountingEmbeddings(size=8), mmap=False)
+    store.delete(list(deleted))
+    store.add_texts([f"Path: /tasks/v{version}/\nMethod: GET"],
+                    [{"source": "swagger", "path": f"/tasks/v{version}/", "method": "get"}],
+                    ids=[f"doc-v{version}"])
+    store.save()
+    (vector_db / "manifest.json").write_text(json.dumps({"version": version, "documents": {}}))
+
+
+@allure.feature("RAG Service")
+@allure.story("Hot Swap")
+@allure.title("Test answering from a warm index and swapping in a new version without dropping queries")
+def test_hot_swap(vector_db):
+    llms = []
+
+    def factory(path):
+        if llms and llms[-1].name == "broken":
+            raise ValueError("Half-written index")
+        llms.append(GatedLLM(f"index {len(llms) + 1}"))
+        return RAGTestCoverageAnalysis(path, embeddings=CountingEmbeddings(size=8), llm=llms[-1], history_turns=0)
+
+    with TestClient(create_app(str(vector_db), factory=factory, reload_interval=0)) as client:
+        with allure.step("Check that the index is loaded at startup"):
+            assert client.get("/health/").json()["index_version"] == 1
+
+        with allure.step("Start a coverage question on the first index"):
+            responses = []
+            thread = threading.Thread(target=lambda: responses.append(
+                client.post("/coverage/", json={"query": "Which tests cover /tasks/?"})))
+            thread.start()
+            assert llms[0].started.wait(5)
+
+        with allure.step("Write and load a new index version while the question is in flight"):
+            old = client.app.state.analyzers.current
+            # The new version drops the PUT operation and adds GET /tasks/v2/
+            write_version(vector_db, 2, deleted=["doc-22"])
+            reload = client.post("/reload/").json()
+            allure.attach(json.dumps(reload), "Reload", allure.attachment_type.JSON)
+            assert reload["reloaded"] and reload["index_version"] == 2
+            assert not client.post("/reload/").json()["reloaded"]
+
+        with allure.step("Check that the replaced analyzer still retrieves from the version it loaded"):
+            assert [doc.id for doc in old.retriever.search("PUT /tasks/{task_id}/", k=2, source="swagger")] == [
+                "doc-22"]
+            assert old.vector_store.lexical_search("v2", k=5) == []
+            new = client.app.state.analyzers.current
+            assert new.retriever.search("PUT /tasks/{task_id}/ v2", k=2, source="swagger")[0].id == "doc-v2"
+            assert "doc-22" not in [doc.id for doc, _ in new.vector_store.lexical_search("PUT", k=5)]
+
+        with allure.step("Check that the question in flight finishes on the index it started with"):
+            llms[0].release.set()
+            thread.join(5)
+            assert responses[0].status_code == 200
+            assert responses[0].json() == {"answer": "answer from index 1", "index_version": 1}
+
+        with allure.step("Check that new questions use the new index"):
+            llms[1].release.set()
+            response = client.post("/tests/", json={"query": "GET /tasks/v2/"})
+            assert response.json() == {"answer": "answer from index 2", "index_version": 2}
+
+        with allure.step("Check that a failed load keeps serving the current index"):
+            llms[-1].name = "broken"
+            write_version(vector_db, 3)
+            assert not client.post("/reload/").json()["reloaded"]
+            assert client.get("/health/").json()["index_version"] == 2
+
+
+@allure.feature("RAG Service")
+@allure.story("Startup")
+@allure.title("Test that the service reports when no index has been written yet")
+def test_no_index(tmp_path):
+    with TestClient(create_app(str(tmp_path / "missing"), reload_interval=0)) as client:
+        assert client.get("/health/").json()["ready"] is False
+        response = client.post("/coverage/", json={"query": "Which tests cover /tasks/?"})
+        assert response.status_code == 503
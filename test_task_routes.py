@@ -0,0 +1,67 @@
+import json
+
+import allure
+import pytest
+from fastapi.testclient import TestClient
+
+
+@allure.feature("Task Management")
+@allure.story("Database Modes")
+@allure.title("Test every task route in-process with sync and async handlers")
+@pytest.mark.parametrize("async_mode", [False, True], ids=["sync", "async"])
+def test_task_routes(create_task_app, async_mode):
+    # The database is shared by the session, so every task of this test carries its own status
+    status = f"routes-{'async' if async_mode else 'sync'}"
+
+    with TestClient(create_task_app(async_mode=async_mode)) as client:
+        with allure.step("Create a task"):
+            response = client.post("/tasks/", json={"title": "Routed Task", "status": status})
+            allure.attach(response.text, "Response Body", allure.attachment_type.JSON)
+            assert response.status_code == 201
+            task = response.json()
+            assert task["title"] == "Routed Task" and task["status"] == status
+
+        with allure.step("Create tasks in bulk"):
+            payload = [{"title": "Bulk 1", "status": status}, {"description": "Missing title."},
+                       {"title": "Bulk 2", "status": status}]
+            response = client.post("/tasks/bulk/", json=payload)
+            assert response.status_code == 201
+            created = response.json()
+            assert created["count"] == 2
+            assert [error["index"] for error in created["errors"]] == [1]
+            ids = [task["id"]] + created["ids"]
+
+        with allure.step("List the tasks and revalidate the page with its ETag"):
+            response = client.get("/tasks/", params={"status": status, "limit": 2})
+            assert response.status_code == 200
+            assert [row["id"] for row in response.json()] == ids[:2]
+            assert response.headers["X-Next-Cursor"] == str(ids[1])
+            response = client.get("/tasks/", params={"status": status, "limit": 2},
+                                  headers={"If-None-Match": response.headers["ETag"]})
+            assert response.status_code == 304
+
+        with allure.step("Stream the tasks as NDJSON"):
+            response = client.get("/tasks/", params={"status": status, "stream": True})
+            assert response.headers["Content-Type"] == "application/x-ndjson"
+            assert [json.loads(line)["id"] for line in response.text.splitlines()] == ids
+
+        with allure.step("Update a task and read it back"):
+            response = client.put(f"/tasks/{ids[0]}/", params={"status": "completed"})
+            assert response.status_code == 200
+            assert response.json()["status"] == "completed"
+            assert client.get(f"/tasks/{ids[0]}/").json()["status"] == "completed"
+
+        with allure.step("Update statuses in bulk by ids and by filter"):
+            response = client.put("/tasks/bulk/status/", json={"status": "completed", "ids": [ids[1], -1]})
+            assert response.json()["count"] == 1
+            assert [error["id"] for error in response.json()["errors"]] == [-1]
+            response = client.put("/tasks/bulk/status/", json={"status": "completed", "filter_status": status})
+            assert response.json()["count"] == 1
+            assert client.get("/tasks/", params={"status": status}).json() == []
+
+        with allure.step("Delete a task, then the rest in bulk"):
+            assert client.delete(f"/tasks/{ids[0]}/").status_code == 204
+            assert client.get(f"/tasks/{ids[0]}/").status_code == 404
+            response = client.request("DELETE", "/tasks/bulk/", json={"ids": ids})
+            assert response.json()["count"] == 2
+            assert [error["id"] for error in response.json()["errors"]] == [ids[0]]
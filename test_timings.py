@@ -0,0 +1,74 @@
+import json
+
+import allure
+import pytest
+
+from conftest import COVERAGE_SWAGGER_JSON, write_result
+from timings import TimingStore, main
+
+
+def write_run(results_dir, put_ms, start):
+    results_dir.mkdir()
+    for index in range(10):
+        write_result(results_dir, f"uuid-{index}", f"test_update_{index}", [
+            ("POST", "http://127.0.0.1:8000/tasks/", 201, 10 + index),
+            ("PUT", f"http://127.0.0.1:8000/tasks/{index}/", 200, put_ms + index),
+        ], start=start)
+    return results_dir
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TimingStore(str(tmp_path / "timings.npz"))
+    for run, put_ms, start in [("run-1", 100, 1000), ("run-2", 300, 5000)]:
+        assert store.ingest(str(write_run(tmp_path / run, put_ms, start)), run=run,
+                            swagger_json=COVERAGE_SWAGGER_JSON)
+    store.save()
+    return store
+
+
+@allure.feature("Timings")
+@allure.story("Percentiles")
+@allure.title("Test endpoint percentiles, regressions and slowest steps across runs")
+def test_timing_queries(store):
+    with allure.step("Check per-endpoint percentiles of one run"):
+        rows = {row["endpoint"]: row for row in store.percentiles("endpoint", runs=[0])}
+        allure.attach(json.dumps(rows, indent=2), "Percentiles", allure.attachment_type.JSON)
+        assert rows["PUT /tasks/{task_id}/"] == {"endpoint": "PUT /tasks/{task_id}/", "count": 10, "mean_ms": 104.5,
+                                                 "p50_ms": 104.0, "p95_ms": 109.0, "p99_ms": 109.0}
+        assert rows["POST /tasks/"]["p50_ms"] == 14.0
+
+    with allure.step("Check the regressions between the runs"):
+        regressions = store.regressions(by="endpoint")
+        assert [(row["endpoint"], row["ratio"]) for row in regressions] == [("PUT /tasks/{task_id}/", 2.92)]
+
+    with allure.step("Check the slowest steps"):
+        slowest = store.slowest_steps(limit=2)
+        assert [row["duration_ms"] for row in slowest] == [309.0, 308.0]
+        assert slowest[0]["test"] == "test_update_9"
+        assert slowest[0]["run"] == "run-2"
+
+
+@allure.feature("Timings")
+@allure.story("Storage")
+@allure.title("Test incremental ingestion, reloading and the summary for the LLM")
+def test_timing_store_roundtrip(store, tmp_path, capsys):
+    with allure.step("Skip a run that did not change"):
+        assert not store.ingest(str(tmp_path / "run-2"), run="run-2")
+
+    with allure.step("Reload the store"):
+        loaded = TimingStore.load(store.path)
+        assert [run["name"] for run in loaded.runs] == ["run-1", "run-2"]
+        assert loaded.percentiles("test") == store.percentiles("test")
+
+    with allure.step("Check the summary"):
+        summary = loaded.summary_text()
+        allure.attach(summary, "Summary", allure.attachment_type.TEXT)
+        assert summary.startswith("Runs: 2. Latest run: 10 tests")
+        assert "- PUT /tasks/{task_id}/: p50 304.0ms, p95 309.0ms, p99 309.0ms over 10 requests" in summary
+        assert "Regressions since the previous run:" not in summary
+
+    with allure.step("Query the store from the command line"):
+        main(["--store", store.path, "regressions", "--by", "endpoint"])
+        lines = capsys.readouterr().out.splitlines()
+        assert json.loads(lines[0])["endpoint"] == "PUT /tasks/{task_id}/"
@@ -0,0 +1,455 @@
+import json
+import os
+
+import allure
+import faiss
+import numpy as np
+import pytest
+from fastapi import FastAPI, Header, Response
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_openai import OpenAIEmbeddings
+
+from benchmarks.stub_embedding_server import create_stub_app
+from conftest import CountingEmbeddings
+from embedding_cache import CachedEmbeddings
+from vector_store import INDEX_FILENAME, FaissVectorStore, IndexConfig, snapshot_path
+from timings import TIMINGS_FILENAME, TimingStore
+from vectorizer import CombinedVectorizer, EmbeddingScheduler
+
+SWAGGER_JSON = {
+    "paths": {
+        "/tasks/": {
+            "get": {"summary": "Read Tasks", "responses": {"200": {"description": "OK"}}},
+            "post": {"summary": "Create Task", "responses": {"201": {"description": "Created"}}},
+        },
+        "/tasks/{task_id}/": {
+            "put": {"summary": "Update Task Status", "responses": {"200": {"description": "OK"}}},
+        },
+    }
+}
+
+
+def write_allure_result(results_dir, uuid, name, status="passed", attachment="http://127.0.0.1:8000/tasks/"):
+    (results_dir / f"{uuid}-attachment.txt").write_text(attachment)
+    result = {
+        "uuid": uuid,
+        "name": name,
+        "fullName": f"test_main#{name}",
+        "status": status,
+        "start": 1000,
+        "stop": 1250,
+        "labels": [{"name": "feature", "value": "Task Management"}, {"name": "story", "value": name}],
+        "steps": [{
+            "name": "Send GET request",
+            "status": status,
+            "start": 1000,
+            "stop": 1200,
+            "attachments": [{"name": "Request URL", "source": f"{uuid}-attachment.txt", "type": "text/plain"}],
+        }],
+    }
+    (results_dir / f"{uuid}-result.json").write_text(json.dumps(result))
+
+
+@pytest.fixture
+def allure_dir(tmp_path):
+    results_dir = tmp_path / "allure-results"
+    results_dir.mkdir()
+    write_allure_result(results_dir, "uuid-1", "test_read_tasks")
+    write_allure_result(results_dir, "uuid-2", "test_create_task")
+    return results_dir
+
+
+@pytest.fixture
+def make_vectorizer(tmp_path, allure_dir):
+    def make():
+        embeddings = CountingEmbeddings(size=16, calls=[])
+        vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", str(allure_dir),
+                                        str(tmp_path / "vector_db"), embeddings=embeddings)
+        vectorizer.fetch_swagger_json = lambda: SWAGGER_JSON
+        return vectorizer
+    return make
+
+
+@allure.feature("Vectorizer")
+@allure.story("Incremental Re-indexing")
+@allure.title("Test that unchanged documents are not embedded again")
+def test_incremental_reindex_skips_unchanged(make_vectorizer):
+    with allure.step("Index Swagger operations and Allure results"):
+        first = make_vectorizer()
+        first.process_and_store()
+        assert len(first.embeddings.texts) == 5
+
+    with allure.step("Re-run the pipeline on unchanged data"):
+        second = make_vectorizer()
+        second.process_and_store()
+        allure.attach(str(second.embeddings.calls), "Embedding Calls", allure.attachment_type.TEXT)
+        assert second.embeddings.texts == []
+        assert second.load_manifest()["version"] == 1
+
+
+@allure.feature("Vectorizer")
+@allure.story("Incremental Re-indexing")
+@allure.title("Test that changed and removed documents are updated in place")
+def test_incremental_reindex_updates_changed_and_stale(make_vectorizer, allure_dir):
+    with allure.step("Index the initial data"):
+        make_vectorizer().process_and_store()
+
+    with allure.step("Change one Allure result and remove another"):
+        write_allure_result(allure_dir, "uuid-1", "test_read_tasks", status="failed")
+        (allure_dir / "uuid-2-result.json").unlink()
+
+        vectorizer = make_vectorizer()
+        vector_store = vectorizer.process_and_store()
+
+    with allure.step("Check that only the changed result was embedded"):
+        allure.attach(str(vectorizer.embeddings.calls), "Embedding Calls", allure.attachment_type.TEXT)
+        assert len(vectorizer.embeddings.texts) == 1
+        assert "Status: failed" in vectorizer.embeddings.texts[0]
+
+    with allure.step("Check the index and manifest contents"):
+        stored_ids = sorted(vector_store.docstore.doc_ids())
+        allure.attach(str(stored_ids), "Stored IDs", allure.attachment_type.TEXT)
+        assert "allure:uuid-2#0" not in stored_ids
+        assert len(stored_ids) == vector_store.index.ntotal == 4
+
+        manifest = vectorizer.load_manifest()
+        assert sorted(doc_id for entry in manifest["documents"].values() for doc_id in entry["ids"]) == stored_ids
+        assert manifest["version"] == 2
+
+
+@allure.feature("Vectorizer")
+@allure.story("Embedding Cache")
+@allure.title("Test that cached texts are never embedded twice")
+def test_embedding_cache_hits(tmp_path):
+    with allure.step("Embed documents and a query through an empty cache"):
+        fake = CountingEmbeddings(size=16, calls=[])
+        cache_path = str(tmp_path / "embeddings.db")
+        cached = CachedEmbeddings(fake, cache_path=cache_path)
+        vectors = cached.embed_documents(["alpha", "beta", "alpha"])
+        query_vector = cached.embed_query("gamma")
+        assert fake.texts == ["alpha", "beta", "gamma"]
+
+    with allure.step("Embed the same texts through a new cache on the same file"):
+        fake_again = CountingEmbeddings(size=16, calls=[])
+        cached_again = CachedEmbeddings(fake_again, cache_path=cache_path)
+        assert np.allclose(cached_again.embed_documents(["alpha", "beta", "alpha"]), vectors)
+        assert np.allclose(cached_again.embed_query("gamma"), query_vector)
+        assert np.allclose(cached_again.embed_query("alpha"), vectors[0])
+
+        allure.attach(str(fake_again.calls), "Embedding Calls", allure.attachment_type.TEXT)
+        assert fake_again.texts == []
+
+
+@allure.feature("Vectorizer")
+@allure.story("Embedding Cache")
+@allure.title("Test that the cache evicts least recently used entries")
+def test_embedding_cache_eviction(tmp_path):
+    fake = CountingEmbeddings(size=4, calls=[])
+    cached = CachedEmbeddings(fake, cache_path=str(tmp_path / "embeddings.db"), max_entries=10)
+    for index in range(10):
+        cached.embed_query(f"text {index}")
+    cached.embed_query("text 0")
+    cached.embed_query("text 10")
+
+    fake.calls.clear()
+    cached.embed_query("text 0")
+    assert fake.texts == []
+    cached.embed_query("text 1")
+    assert fake.texts == ["text 1"]
+
+
+@allure.feature("Vectorizer")
+@allure.story("Embedding Cache")
+@allure.title("Test that rebuilding an index from cached embeddings makes no embedding calls")
+def test_rebuild_with_embedding_cache(tmp_path, allure_dir):
+    cache_path = str(tmp_path / "embeddings.db")
+
+    def run(vector_db_path):
+        fake = CountingEmbeddings(size=16, calls=[])
+        vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", str(allure_dir),
+                                        str(tmp_path / vector_db_path),
+                                        embeddings=CachedEmbeddings(fake, cache_path=cache_path))
+        vectorizer.fetch_swagger_json = lambda: SWAGGER_JSON
+        vectorizer.process_and_store()
+        return fake
+
+    assert len(run("first_db").texts) == 5
+    assert run("second_db").texts == []
+
+
+@allure.feature("Vectorizer")
+@allure.story("Allure Ingestion")
+@allure.title("Test that a missing results directory is skipped instead of aborting the ingest")
+def test_missing_results_directory(tmp_path, allure_dir):
+    vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", [str(tmp_path / "missing"), str(allure_dir)],
+                                    str(tmp_path / "vector_db"), embeddings=CountingEmbeddings(size=16, calls=[]))
+    vectorizer.fetch_swagger_json = lambda: SWAGGER_JSON
+
+    with allure.step("Ingest a missing and an existing directory"):
+        vectorizer.process_and_store()
+
+    with allure.step("Check that the existing directory was ingested"):
+        keys = vectorizer.load_manifest()["documents"]
+        assert sorted(key for key in keys if key.startswith("allure:")) == ["allure:uuid-1", "allure:uuid-2"]
+        timings = TimingStore.load(str(tmp_path / "vector_db" / TIMINGS_FILENAME))
+        assert [run["name"] for run in timings.runs] == [str(allure_dir)]
+
+
+@allure.feature("Vectorizer")
+@allure.story("Allure Ingestion")
+@allure.title("Test that attachments are truncated or skipped and results parsed in parallel")
+def test_allure_ingestion_limits_attachments(tmp_path, allure_dir):
+    with allure.step("Add a result with an oversized text attachment and an image"):
+        write_allure_result(allure_dir, "uuid-3", "test_large_body", attachment="x" * 5000)
+        (allure_dir / "uuid-3-screenshot.png").write_bytes(b"\x89PNG" + b"\0" * 100)
+        result = json.loads((allure_dir / "uuid-3-result.json").read_text())
+        result["steps"][0]["attachments"].append(
+            {"name": "Screenshot", "source": "uuid-3-screenshot.png", "type": "image/png"})
+        (allure_dir / "uuid-3-result.json").write_text(json.dumps(result))
+
+    with allure.step("Parse the results with a thread pool and a process pool"):
+        documents = {}
+        for use_processes in (False, True):
+            vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", str(allure_dir),
+                                            str(tmp_path / "vector_db"), embeddings=CountingEmbeddings(size=4),
+                                            max_workers=2, use_processes=use_processes,
+                                            attachment_max_bytes=1000)
+            documents[use_processes] = {doc.metadata["uuid"]: doc.page_content
+                                        for doc in vectorizer.iter_allure_documents()}
+
+    with allure.step("Check the document contents"):
+        assert documents[False] == documents[True]
+        assert sorted(documents[False]) == ["uuid-1", "uuid-2", "uuid-3"]
+
+        content = documents[False]["uuid-3"]
+        allure.attach(content, "Document Content", allure.attachment_type.TEXT)
+        assert "x" * 1000 + "\n[truncated at 1000 bytes]" in content
+        assert "x" * 1001 not in content
+        assert "Screenshot" not in content
+
+
+@allure.feature("Vectorizer")
+@allure.story("Chunking")
+@allure.title("Test splitting oversized results at step boundaries with de-duplicated attachments")
+def test_allure_result_chunking(tmp_path, allure_dir):
+    with allure.step("Write a result with many steps that repeat the same headers"):
+        (allure_dir / "headers.txt").write_text("content-type: application/json\nserver: uvicorn")
+        steps = [{
+            "name": f"Send request {index}",
+            "status": "passed",
+            "start": 1000,
+            "stop": 1100,
+            "attachments": [{"name": "Response Headers", "source": "headers.txt", "type": "text/plain"}],
+        } for index in range(40)]
+        result = {"uuid": "uuid-big", "name": "test_many_steps", "status": "passed", "labels": [], "steps": steps}
+        (allure_dir / "uuid-big-result.json").write_text(json.dumps(result))
+
+    with allure.step("Chunk the result with a small token budget"):
+        vectorizer = CombinedVectorizer("http://swagger.invalid/openapi.json", str(allure_dir),
+                                        str(tmp_path / "vector_db"), embeddings=CountingEmbeddings(size=4),
+                                        chunk_max_tokens=100)
+        chunks = [doc for doc in vectorizer.iter_allure_documents() if doc.metadata["uuid"] == "uuid-big"]
+
+    with allure.step("Check the chunks"):
+        allure.attach("\n---\n".join(chunk.page_content for chunk in chunks), "Chunks", allure.attachment_type.TEXT)
+        assert len(chunks) > 1
+        assert [chunk.metadata["chunk"] for chunk in chunks] == list(range(len(chunks)))
+        assert all(chunk.metadata["chunks"] == len(chunks) for chunk in chunks)
+        assert all("UUID: uuid-big" in chunk.page_content for chunk in chunks)
+        assert all(chunk.page_content.count("Step Name:") >= 1 for chunk in chunks)
+
+        full_text = "".join(chunk.page_content for chunk in chunks)
+        assert full_text.count("server: uvicorn") == 1
+        assert "Attachment (Response Headers): same as Response Headers of step 'Send request 0'" in full_text
+
+    with allure.step("Index the chunks and check their ids"):
+        vector_store = vectorizer.store_vectors(vectorizer.vectorize_swagger(SWAGGER_JSON) + chunks)
+        stored_ids = set(vector_store.docstore.doc_ids())
+        assert {f"allure:uuid-big#{index}" for index in range(len(chunks))} <= stored_ids
+        assert vectorizer.load_manifest()["documents"]["allure:uuid-big"]["ids"] == [
+            f"allure:uuid-big#{index}" for index in range(len(chunks))]
+
+
+class FlakyEmbeddings(CountingEmbeddings):
+    """
+    Offline embedder whose first `failures` calls time out.
+    """
+    failures: int = 0
+
+    def embed_documents(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError("embedding request timed out")
+        return super().embed_documents(texts)
+
+
+@allure.feature("Vectorizer")
+@allure.story("Embedding Scheduler")
+@allure.title("Test batching by count and token budget with retries")
+def test_embedding_scheduler_batches_and_retries():
+    with allure.step("Embed texts through a scheduler over a flaky embedder"):
+        fake = FlakyEmbeddings(size=8, calls=[], failures=2)
+        scheduler = EmbeddingScheduler(fake, batch_size=4, max_tokens_per_batch=50, max_in_flight=3,
+                                       backoff_base=0.001)
+        texts = [f"text {index}" for index in range(10)] + ["long " * 100]
+        vectors = scheduler.embed_documents(texts)
+
+    with allure.step("Check vector order, batch sizes and metrics"):
+        assert np.allclose(vectors, DeterministicFakeEmbedding(size=8).embed_documents(texts))
+        allure.attach(str([len(call) for call in fake.calls]), "Batch Sizes", allure.attachment_type.TEXT)
+        assert sorted(len(call) for call in fake.calls) == [1, 2, 4, 4]
+
+        metrics = scheduler.metrics.as_dict()
+        allure.attach(str(metrics), "Metrics", allure.attachment_type.JSON)
+        assert metrics["texts"] == 11
+        assert metrics["requests"] == 4
+        assert metrics["retries"] == 2
+
+
+@allure.feature("Vectorizer")
+@allure.story("Embedding Scheduler")
+@allure.title("Test concurrent embedding against the rate-limited stub server")
+def test_embedding_scheduler_against_stub_server():
+    with allure.step("Embed texts through the OpenAI client pointed at the stub server"):
+        app = create_stub_app(dimensions=8, latency=0.01, max_concurrent=2, retry_after=0.01)
+        client = OpenAIEmbeddings(base_url="http://stub/v1", api_key="stub", check_embedding_ctx_length=False,
+                                  max_retries=0, http_client=TestClient(app, base_url="http://stub"))
+        scheduler = EmbeddingScheduler(client, batch_size=10, max_in_flight=4, backoff_base=0.01)
+        texts = [f"text {index}" for index in range(100)]
+        vectors = scheduler.embed_documents(texts)
+
+    with allure.step("Check that every batch was eventually accepted"):
+        stats = app.state.stats
+        allure.attach(str(stats), "Server Stats", allure.attachment_type.JSON)
+        assert len(vectors) == 100
+        assert stats["inputs"] == 100
+        assert stats["requests"] == scheduler.metrics.requests == 10
+        assert scheduler.metrics.retries == stats["rejected"]
+        assert stats["max_in_flight"] <= 2
+
+
+@allure.feature("Vectorizer")
+@allure.story("Index Types")
+@allure.title("Test building, filtering, deleting and memory-mapped loading for every index type")
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw", "ivf_pq"])
+def test_vector_store_index_types(tmp_path, index_type):
+    config = IndexConfig(index_type=index_type, nlist=4, nprobe=4, pq_m=4, pq_bits=4)
+    vectors = np.random.default_rng(1).random((config.min_train_size + 10, 16), dtype="float32")
+    sources = ["swagger" if index % 5 == 0 else "allure" for index in range(len(vectors))]
+    ids = [f"{source}:{index}#0" for index, source in enumerate(sources)]
+
+    with allure.step(f"Build a {index_type} store"):
+        store = FaissVectorStore.create(str(tmp_path / "db"), CountingEmbeddings(size=16), config)
+        store.add_embeddings(zip(ids, vectors.tolist()), [{"source": source} for source in sources], ids=ids)
+        inner = faiss.downcast_index(store.index.index)
+        allure.attach(type(inner).__name__, "Index Class", allure.attachment_type.TEXT)
+        assert store.index.ntotal == len(vectors)
+        assert not isinstance(inner, faiss.IndexFlat) or index_type == "flat"
+
+    with allure.step("Search with and without a source filter"):
+        top = store.similarity_search_by_vector(vectors[7].tolist(), k=5)
+        assert "allure:7#0" in [doc.page_content for doc in top]
+        swagger = store.similarity_search_by_vector(vectors[7].tolist(), k=5, filter={"source": "swagger"})
+        assert len(swagger) == 5
+        assert all(doc.metadata["source"] == "swagger" for doc in swagger)
+
+    with allure.step("Delete a document, save and load memory-mapped"):
+        store.delete(["allure:7#0"])
+        store.save()
+        loaded = FaissVectorStore.load(str(tmp_path / "db"), CountingEmbeddings(size=16), mmap=True)
+        assert loaded.read_only
+        results = loaded.similarity_search_by_vector(vectors[7].tolist(), k=5)
+        assert len(results) == 5
+        assert "allure:7#0" not in [doc.page_content for doc in results]
+        assert loaded.existing_ids(["allure:8#0", "allure:7#0"]) == {"allure:8#0"}
+
+    with allure.step("Check that the loaded index is mapped from its snapshot file"):
+        if os.path.exists("/proc/self/maps"):
+            with open("/proc/self/maps") as maps:
+                mapped = {line.split(maxsplit=5)[-1].strip() for line in maps if line.count(" ") >= 5}
+            assert os.path.join(snapshot_path(str(tmp_path / "db"), loaded.version), INDEX_FILENAME) in mapped
+
+
+def create_swagger_app(fetches):
+    """
+    Two services serving their specs with an ETag and with Last-Modified.
+    """
+    app = FastAPI()
+    other_spec = {"paths": {"/users/": {"get": {"summary": "Read Users", "responses": {"200": {"description": "OK"}}}}}}
+
+    @app.get("/tasks/openapi.json")
+    def tasks_spec(if_none_match: str = Header(None)):
+        if if_none_match == '"v1"':
+            return Response(status_code=304)
+        fetches.append("tasks")
+        return Response(json.dumps(SWAGGER_JSON), media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/users/openapi.json")
+    def users_spec(if_modified_since: str = Header(None)):
+        last_modified = "Sat, 17 Oct 2026 00:00:00 GMT"
+        if if_modified_since == last_modified:
+            return Response(status_code=304)
+        fetches.append("users")
+        return Response(json.dumps(other_spec), media_type="application/json",
+                        headers={"Last-Modified": last_modified})
+
+    return app
+
+
+class RecordingSession:
+    """
+    Sends requests to an app in-process and records the timeouts they were sent with.
+    """
+
+    def __init__(self, app):
+        self.client = TestClient(app)
+        self.timeouts = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.timeouts.append(timeout)
+        return self.client.get(url, headers=headers)
+
+
+@allure.feature("Vectorizer")
+@allure.story("Ingest CLI")
+@allure.title("Test a dry run and an ingest over several Swagger specs and Allure directories")
+def test_multiple_sources_and_dry_run(tmp_path, allure_dir):
+    other_dir = tmp_path / "other-results"
+    other_dir.mkdir()
+    write_allure_result(other_dir, "uuid-3", "test_read_users", attachment="http://127.0.0.1:8001/users/")
+    fetches = []
+    session = RecordingSession(create_swagger_app(fetches))
+
+    def make():
+        vectorizer = CombinedVectorizer(["http://testserver/tasks/openapi.json", "http://testserver/users/openapi.json"],
+                                        [str(allure_dir), str(other_dir)], str(tmp_path / "vector_db"),
+                                        embeddings=CountingEmbeddings(size=16, calls=[]), swagger_timeout=2.5)
+        vectorizer._session = session
+        return vectorizer
+
+    with allure.step("Dry-run before the first ingest"):
+        (tmp_path / "vector_db").mkdir()
+        vectorizer = make()
+        report = vectorizer.dry_run()
+        allure.attach(json.dumps(report, indent=2), "Dry Run", allure.attachment_type.JSON)
+        assert report["swagger"]["documents"] == 4
+        assert report["allure"]["documents"] == 3
+        assert report["changed"]["documents"] == 7
+        assert report["changed"]["tokens"] == report["swagger"]["tokens"] + report["allure"]["tokens"] > 0
+        assert vectorizer.embeddings.calls == []
+        assert list((tmp_path / "vector_db").iterdir()) == []
+        assert session.timeouts == [2.5, 2.5]
+
+    with allure.step("Ingest both specs and both directories"):
+        vectorizer = make()
+        vectorizer.process_and_store()
+        keys = set(vectorizer.load_manifest()["documents"])
+        assert {"swagger:GET /users/", "swagger:PUT /tasks/{task_id}/", "allure:uuid-1", "allure:uuid-3"} <= keys
+        assert sorted(fetches) == ["tasks", "tasks", "users", "users"]
+
+    with allure.step("Check that the next run revalidates the specs instead of downloading them"):
+        report = make().dry_run()
+        assert report["changed"]["documents"] == 0
+        assert report["removed"]["documents"] == 0
+        assert sorted(fetches) == ["tasks", "tasks", "users", "users"]
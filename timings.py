@@ -0,0 +1,347 @@
+# timings.py
+import argparse
+import functools
+import io
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from allure_results import iter_result_files, load_json, read_attachment
+from coverage_matrix import CoverageMatrix, summarize_result
+
+TIMINGS_STORE_PATH = os.getenv("TIMINGS_STORE_PATH", "timings.npz")
+TIMINGS_FILENAME = "timings.npz"
+
+TEST, STEP = 0, 1
+STATUSES = ["passed", "failed", "broken", "skipped", "unknown"]
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Columns holding codes into a vocabulary of strings; -1 means none.
+STRING_COLUMNS = ("test", "name", "feature", "story", "endpoint")
+COLUMN_TYPES = {
+    "run": np.int32, "kind": np.int8, "status": np.int8, "start": np.int64, "duration": np.float64,
+    **{column: np.int32 for column in STRING_COLUMNS},
+}
+
+# Path segments that are ids when no Swagger spec is available to resolve templates.
+ID_SEGMENT_PATTERN = re.compile(r"^(\d+|[0-9a-fA-F-]{32,36})$")
+
+
+def normalize_path(url: str) -> str:
+    path = urlsplit(url).path or "/"
+    return "/".join("{id}" if ID_SEGMENT_PATTERN.match(segment) else segment for segment in path.split("/"))
+
+
+def result_signature(results_dir: str) -> List[int]:
+    paths = list(iter_result_files(results_dir))
+    return [len(paths), max((os.stat(path).st_mtime_ns for path in paths), default=0)]
+
+
+class TimingRun:
+    """
+    The test and step rows of one run, built one result summary (see
+    coverage_matrix.summarize_result) at a time and added with
+    TimingStore.add_run. Endpoints are resolved against `matrix` when given.
+    """
+
+    def __init__(self, name: str, matrix: CoverageMatrix = None):
+        self.name = name
+        self.matrix = matrix
+        self.files = 0
+        self.mtime_ns = 0
+        # (kind, test, name, feature, story, status, start, stop, endpoint)
+        self.rows: List[tuple] = []
+
+    @property
+    def signature(self) -> List[int]:
+        # Same as result_signature of the run's directory
+        return [self.files, self.mtime_ns]
+
+    def add(self, summary: Optional[dict], mtime_ns: int):
+        """
+        Count a result file and add its rows; `summary` is None for a file that could not be read.
+        """
+        self.files += 1
+        self.mtime_ns = max(self.mtime_ns, mtime_ns)
+        if not (summary and summary["start"] and summary["stop"]):
+            return
+        test = summary["full_name"] or summary["name"]
+        labels = (summary["feature"], summary["story"])
+        self.rows.append((TEST, test, summary["name"], *labels, summary["status"], summary["start"],
+                          summary["stop"], None))
+        for step in summary["steps"]:
+            if step["start"] and step["stop"]:
+                self.rows.append((STEP, test, step["name"], *labels, step["status"], step["start"], step["stop"],
+                                  self._endpoint(step["request"])))
+
+    def _endpoint(self, request: Optional[dict]) -> Optional[str]:
+        if not request:
+            return None
+        matched = self.matrix.match_request(request) if self.matrix else None
+        if matched:
+            return matched.key
+        return f"{request['method']} {normalize_path(request['url'])}" if request["method"] else None
+
+
+class TimingStore:
+    """
+    Columnar store of test and step durations across Allure runs.
+
+    Every test and step is one row of parallel NumPy arrays; strings are
+    stored as codes into per-column vocabularies, so grouping and percentile
+    queries are array operations. The store is saved as a single .npz file
+    and grows one run at a time.
+    """
+
+    def __init__(self, path: str = TIMINGS_STORE_PATH):
+        self.path = path
+        self.columns = {column: np.empty(0, dtype=dtype) for column, dtype in COLUMN_TYPES.items()}
+        self.vocabularies: Dict[str, List[str]] = {column: [] for column in STRING_COLUMNS}
+        self.runs: List[dict] = []
+        self._codes = {column: {} for column in STRING_COLUMNS}
+
+    @classmethod
+    def load(cls, path: str = TIMINGS_STORE_PATH) -> "TimingStore":
+        """
+        Open the store at `path`, or an empty one if there is none yet.
+        """
+        store = cls(path)
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as data:
+                store.columns = {column: data[column] for column in COLUMN_TYPES}
+                meta = json.loads(str(data["meta"]))
+            store.vocabularies = meta["vocabularies"]
+            store.runs = meta["runs"]
+            store._codes = {column: {value: code for code, value in enumerate(values)}
+                            for column, values in store.vocabularies.items()}
+        return store
+
+    def save(self):
+        meta = json.dumps({"vocabularies": self.vocabularies, "runs": self.runs})
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.array(meta), **self.columns)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(buffer.getvalue())
+        os.replace(tmp_path, self.path)
+
+    def _code(self, column: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        codes = self._codes[column]
+        if value not in codes:
+            codes[value] = len(self.vocabularies[column])
+            self.vocabularies[column].append(value)
+        return codes[value]
+
+    def ingest(self, results_dir: str, run: str = None, swagger_json: dict = None) -> bool:
+        """
+        Add the results in `results_dir` as a run named `run` (the directory by
+        default). A directory without results, or whose result files have not
+        changed since it was last ingested, is skipped; returns whether a run
+        was added.
+        """
+        run_name = run or os.path.abspath(results_dir)
+        if not self._changed(run_name, result_signature(results_dir)):
+            return False
+        timing_run = TimingRun(run_name, CoverageMatrix(swagger_json) if swagger_json else None)
+        read_text = functools.partial(read_attachment, results_dir, max_bytes=4096)
+        for path in iter_result_files(results_dir):
+            mtime_ns, summary = 0, None
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+                summary = summarize_result(load_json(path), read_text)
+            except (OSError, ValueError):
+                pass
+            timing_run.add(summary, mtime_ns)
+        return self.add_run(timing_run)
+
+    def _changed(self, run_name: str, signature: List[int]) -> bool:
+        if not signature[0]:
+            return False
+        return not any(entry["name"] == run_name and entry["signature"] == signature for entry in self.runs)
+
+    def add_run(self, timing_run: TimingRun) -> bool:
+        """
+        Append the rows of `timing_run`, unless it has no results or a run of
+        the same name and signature is already stored; returns whether it was added.
+        """
+        if not self._changed(timing_run.name, timing_run.signature):
+            return False
+        run_id = len(self.runs)
+        rows = {column: [] for column in COLUMN_TYPES}
+        for kind, test, name, feature, story, status, start, stop, endpoint in timing_run.rows:
+            for column, value in (("run", run_id), ("kind", kind), ("status", status_code(status)),
+                                  ("start", start), ("duration", stop - start), ("test", self._code("test", test)),
+                                  ("name", self._code("name", name)), ("feature", self._code("feature", feature)),
+                                  ("story", self._code("story", story)),
+                                  ("endpoint", self._code("endpoint", endpoint))):
+                rows[column].append(value)
+
+        for column, dtype in COLUMN_TYPES.items():
+            self.columns[column] = np.concatenate([self.columns[column], np.asarray(rows[column], dtype=dtype)])
+        self.runs.append({"name": timing_run.name, "signature": timing_run.signature, "ingested_at": time.time(),
+                          "started": min(rows["start"], default=0), "rows": len(rows["run"])})
+        return True
+
+    def _mask(self, kind: int, runs: List[int] = None):
+        mask = self.columns["kind"] == kind
+        if runs is not None:
+            mask &= np.isin(self.columns["run"], runs)
+        return mask
+
+    @staticmethod
+    def _group_by(column: str):
+        # Endpoints and step names are properties of steps, everything else of tests.
+        return STEP if column in ("endpoint", "step") else TEST
+
+    def percentiles(self, by: str = "endpoint", runs: List[int] = None, quantiles=QUANTILES) -> List[dict]:
+        """
+        Duration percentiles (nearest rank) and mean per value of `by`:
+        endpoint, step, test, feature or story. Sorted by p95, slowest first.
+        """
+        column = "name" if by == "step" else by
+        mask = self._mask(self._group_by(by), runs) & (self.columns[column] >= 0)
+        codes, durations = self.columns[column][mask], self.columns["duration"][mask]
+        if not len(codes):
+            return []
+        order = np.lexsort((durations, codes))
+        codes, durations = codes[order], durations[order]
+        groups, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+        stats = {"mean_ms": np.add.reduceat(durations, starts) / counts}
+        for quantile in quantiles:
+            ranks = np.maximum(np.ceil(np.round(quantile * counts, 9)).astype(np.int64) - 1, 0)
+            stats[f"p{round(quantile * 100)}_ms"] = durations[starts + ranks]
+        vocabulary = self.vocabularies[column]
+        rows = []
+        for index, code in enumerate(groups):
+            row = {by: vocabulary[code], "count": int(counts[index])}
+            row.update({key: round(float(values[index]), 1) for key, values in stats.items()})
+            rows.append(row)
+        return sorted(rows, key=lambda row: row.get("p95_ms", row["mean_ms"]), reverse=True)
+
+    def regressions(self, base: int = None, head: int = None, by: str = "test", threshold: float = 1.2,
+                    min_delta_ms: float = 10.0) -> List[dict]:
+        """
+        Groups whose median duration grew by at least `threshold` times and
+        `min_delta_ms` from run `base` to run `head` (by default the two
+        latest runs). Sorted by the growth ratio.
+        """
+        order = sorted(range(len(self.runs)), key=lambda run: self.runs[run]["started"])
+        head = order[-1] if head is None and order else head
+        if base is None:
+            position = order.index(head) if head in order else 0
+            if position == 0:
+                return []
+            base = order[position - 1]
+        before = {row[by]: row["p50_ms"] for row in self.percentiles(by, [base], (0.5,))}
+        rows = []
+        for row in self.percentiles(by, [head], (0.5,)):
+            previous = before.get(row[by])
+            if previous is None:
+                continue
+            delta = row["p50_ms"] - previous
+            if delta >= min_delta_ms and row["p50_ms"] >= threshold * previous:
+                rows.append({by: row[by], "base_p50_ms": previous, "head_p50_ms": row["p50_ms"],
+                             "ratio": round(row["p50_ms"] / previous, 2) if previous else None})
+        return sorted(rows, key=lambda row: row["ratio"] or float("inf"), reverse=True)
+
+    def slowest_steps(self, limit: int = 10, runs: List[int] = None) -> List[dict]:
+        indexes = np.flatnonzero(self._mask(STEP, runs))
+        durations = self.columns["duration"][indexes]
+        if len(indexes) > limit:
+            top = np.argpartition(durations, -limit)[-limit:]
+            indexes, durations = indexes[top], durations[top]
+        indexes = indexes[np.argsort(durations)[::-1]]
+        vocabularies = self.vocabularies
+        return [{
+            "test": vocabularies["test"][self.columns["test"][index]],
+            "step": vocabularies["name"][self.columns["name"][index]],
+            "endpoint": vocabularies["endpoint"][self.columns["endpoint"][index]]
+            if self.columns["endpoint"][index] >= 0 else None,
+            "run": self.runs[self.columns["run"][index]]["name"],
+            "duration_ms": float(self.columns["duration"][index]),
+        } for index in indexes]
+
+    def summary_text(self, limit: int = 5) -> str:
+        """
+        Compact plain-text timing report, meant as LLM context.
+        """
+        if not self.runs:
+            return "No test timings recorded."
+        # Runs that started together are ordered by ingestion, as in regressions()
+        latest = max(range(len(self.runs)), key=lambda run: (self.runs[run]["started"], run))
+        tests = self.columns["duration"][self._mask(TEST, [latest])]
+        lines = [f"Runs: {len(self.runs)}. Latest run: {len(tests)} tests"]
+        if len(tests):
+            p50, p95, p99 = np.percentile(tests, [50, 95, 99], method="inverted_cdf")
+            lines[0] += f", test duration p50 {p50:.0f}ms, p95 {p95:.0f}ms, p99 {p99:.0f}ms, total {tests.sum():.0f}ms."
+        sections = [
+            ("Endpoint latency (latest run)", [f"{row['endpoint']}: p50 {row['p50_ms']}ms, p95 {row['p95_ms']}ms, "
+                                               f"p99 {row['p99_ms']}ms over {row['count']} requests"
+                                               for row in self.percentiles("endpoint", [latest])]),
+            ("Slowest features (latest run)", [f"{row['feature']}: p95 {row['p95_ms']}ms over {row['count']} tests"
+                                               for row in self.percentiles("feature", [latest])]),
+            ("Regressions since the previous run", [f"{row['test']}: {row['base_p50_ms']}ms -> "
+                                                    f"{row['head_p50_ms']}ms ({row['ratio']}x)"
+                                                    for row in self.regressions()]),
+            ("Slowest steps (latest run)", [f"{row['test']} / {row['step']}: {row['duration_ms']:.0f}ms"
+                                            for row in self.slowest_steps(limit, [latest])]),
+        ]
+        for title, entries in sections:
+            if entries:
+                lines.append(f"{title}:")
+                lines.extend(f"- {entry}" for entry in entries[:limit])
+        return "\n".join(lines)
+
+
+def status_code(status: Optional[str]) -> int:
+    return STATUSES.index(status) if status in STATUSES else STATUSES.index("unknown")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test and API timing analytics over Allure results.")
+    parser.add_argument("--store", default=TIMINGS_STORE_PATH, help="Path of the .npz timing store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Add allure-results directories as runs")
+    ingest.add_argument("results_dirs", nargs="+")
+    ingest.add_argument("--swagger", help="Swagger JSON file used to resolve endpoint templates")
+    report = commands.add_parser("percentiles", help="Duration percentiles per group")
+    report.add_argument("--by", default="endpoint", choices=["endpoint", "step", "test", "feature", "story"])
+    regressions = commands.add_parser("regressions", help="Groups that got slower between two runs")
+    regressions.add_argument("--by", default="test", choices=["endpoint", "step", "test", "feature", "story"])
+    regressions.add_argument("--threshold", type=float, default=1.2)
+    slowest = commands.add_parser("slowest", help="Slowest steps")
+    slowest.add_argument("--limit", type=int, default=10)
+    commands.add_parser("summary", help="Plain-text report, as given to the LLM")
+    args = parser.parse_args(argv)
+
+    store = TimingStore.load(args.store)
+    if args.command == "ingest":
+        swagger_json = load_json(args.swagger) if args.swagger else None
+        added = [path for path in args.results_dirs if store.ingest(path, swagger_json=swagger_json)]
+        if added:
+            store.save()
+        print(f"Ingested {len(added)} of {len(args.results_dirs)} runs; the store has {len(store.runs)} runs.")
+        return
+    if args.command == "summary":
+        print(store.summary_text())
+        return
+    if args.command == "percentiles":
+        rows = store.percentiles(args.by)
+    elif args.command == "regressions":
+        rows = store.regressions(by=args.by, threshold=args.threshold)
+    else:
+        rows = store.slowest_steps(args.limit)
+    for row in rows:
+        sys.stdout.write(json.dumps(row) + "\n")
+
+
+if __name__ == "__main__":
+    main()
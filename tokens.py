@@ -0,0 +1,46 @@
+# tokens.py
+import functools
+import logging
+import os
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+
+# Rough characters per token, used when the tiktoken encoding is unavailable.
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(name: str = TOKEN_ENCODING):
+    """
+    Load a tiktoken encoding, or return None if it cannot be loaded (tiktoken
+    downloads encodings on first use, which fails on offline machines).
+    """
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as exc:
+        logger.warning("Token encoding %s unavailable, estimating token counts: %s", name, exc)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text: str, max_tokens: int):
+    """
+    Split `text` into consecutive pieces of at most `max_tokens` tokens each.
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        step = max_tokens * CHARS_PER_TOKEN
+        return [text[start:start + step] for start in range(0, len(text), step)] or [""]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[start:start + max_tokens])
+            for start in range(0, len(tokens), max_tokens)] or [""]
@@ -0,0 +1,596 @@
+# vector_store.py
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from instrumentation import stage
+from tokens import count_tokens
+
+INDEX_FILENAME = "index.faiss"
+DOCSTORE_FILENAME = "docstore.db"
+CONFIG_FILENAME = "index_config.json"
+# Every save publishes an immutable copy of the store under SNAPSHOTS_DIRNAME;
+# CURRENT_FILENAME names the latest one, which is the one readers open.
+SNAPSHOTS_DIRNAME = "snapshots"
+CURRENT_FILENAME = "CURRENT"
+# Snapshots kept for readers still serving from an older one.
+KEEP_SNAPSHOTS = 3
+
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# FAISS ids carry the document source above this bit, so that a search can be
+# restricted to one source with an id range selector instead of post-filtering.
+SOURCE_SHIFT = 48
+SOURCE_CODES = {"swagger": 1, "allure": 2}
+
+# Swagger operations are looked up by "METHOD path" and by path, Allure results by uuid.
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
+
+
+def lookup_keys(metadata: dict) -> List[str]:
+    """
+    Exact lookup keys of a document, derived from its metadata.
+    """
+    if metadata.get("source") == "swagger" and metadata.get("path"):
+        return [f"{metadata.get('method', '').upper()} {metadata['path']}", metadata["path"]]
+    if metadata.get("uuid"):
+        return [metadata["uuid"]]
+    return []
+
+
+def current_snapshot(path: str) -> Optional[int]:
+    """
+    Version of the latest snapshot of the store at `path`, or None if it has none.
+    """
+    try:
+        with open(os.path.join(path, CURRENT_FILENAME), "r") as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        return None
+
+
+def snapshot_path(path: str, version: int) -> str:
+    return os.path.join(path, SNAPSHOTS_DIRNAME, str(version))
+
+
+def source_id_range(source: str):
+    """
+    Half-open range of FAISS ids allocated to documents of `source`.
+    """
+    code = SOURCE_CODES[source]
+    return code << SOURCE_SHIFT, (code + 1) << SOURCE_SHIFT
+
+
+# Share of deleted-but-still-indexed vectors (HNSW cannot remove vectors)
+# above which the index is rebuilt from the live ones.
+MAX_TOMBSTONE_RATIO = 0.2
+
+
+@dataclass
+class IndexConfig:
+    """
+    Index type and its build and search parameters.
+
+    Types that need training (IVF) start as a flat index and are rebuilt as
+    the requested type, trained on a random sample of at most `train_size`
+    vectors, once the index holds enough vectors to train it.
+    """
+    index_type: str = VECTOR_INDEX_TYPE
+    nlist: int = 1024
+    hnsw_m: int = 32
+    pq_m: int = 16
+    pq_bits: int = 8
+    nprobe: int = 16
+    ef_search: int = 64
+    train_size: int = 100_000
+
+    def __post_init__(self):
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {self.index_type!r}, expected one of {INDEX_TYPES}")
+
+    @property
+    def needs_training(self) -> bool:
+        return self.index_type in ("ivf_flat", "ivf_pq")
+
+    @property
+    def min_train_size(self) -> int:
+        # FAISS recommends at least 39 training points per centroid.
+        centroids = max(self.nlist, 2 ** self.pq_bits if self.index_type == "ivf_pq" else 0)
+        return 39 * centroids
+
+    def factory_string(self, index_type: str = None) -> str:
+        index_type = index_type or self.index_type
+        return {
+            "flat": "IDMap2,Flat",
+            "ivf_flat": f"IDMap2,IVF{self.nlist},Flat",
+            "hnsw": f"IDMap2,HNSW{self.hnsw_m}",
+            "ivf_pq": f"IDMap2,IVF{self.nlist},PQ{self.pq_m}x{self.pq_bits}",
+        }[index_type]
+
+
+class SQLiteDocstore:
+    """
+    Chunk text and metadata keyed by FAISS id in a SQLite file. Rows are only
+    read for the ids a search returns, so opening the store costs nothing
+    regardless of its size.
+
+    The same file holds the lexical side of the store: an FTS5 inverted index
+    over the chunk text, ranked with BM25, and a table of exact lookup keys.
+    Both are kept in step with the documents table by add() and delete().
+    """
+
+    def __init__(self, path: str, read_only: bool = False, immutable: bool = False):
+        self.path = path
+        self.read_only = read_only or immutable
+        # A snapshot never changes, so SQLite can skip locking and change detection.
+        self.immutable = immutable
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            if self.read_only:
+                uri = f"file:{self.path}?mode=ro" + ("&immutable=1" if self.immutable else "")
+                self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            else:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._connection = sqlite3.connect(self.path, check_same_thread=False)
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS documents ("
+                    " faiss_id INTEGER PRIMARY KEY, doc_id TEXT NOT NULL UNIQUE,"
+                    " content TEXT NOT NULL, metadata TEXT NOT NULL)"
+                )
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS sequences (source INTEGER PRIMARY KEY, next_id INTEGER NOT NULL)"
+                )
+                self._create_lexical_index()
+                self._connection.commit()
+        return self._connection
+
+    def _create_lexical_index(self):
+        connection = self._connection
+        if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'").fetchone():
+            return
+        connection.execute(
+            "CREATE VIRTUAL TABLE documents_fts USING fts5(content, content='documents', content_rowid='faiss_id')"
+        )
+        connection.execute("CREATE TABLE IF NOT EXISTS lookup_keys (key TEXT NOT NULL, faiss_id INTEGER NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_lookup_keys_key ON lookup_keys (key)")
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_lookup_keys_faiss_id ON lookup_keys (faiss_id)")
+        # Index documents stored before the lexical index existed.
+        connection.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+        connection.executemany("INSERT INTO lookup_keys (key, faiss_id) VALUES (?, ?)", [
+            (key, faiss_id) for faiss_id, metadata in connection.execute("SELECT faiss_id, metadata FROM documents")
+            for key in lookup_keys(json.loads(metadata))
+        ])
+
+    def allocate_ids(self, sources: List[int]) -> List[int]:
+        """
+        Allocate new FAISS ids in each source's range; ids are never reused.
+        """
+        with self._lock:
+            next_ids = dict(self.connection.execute("SELECT source, next_id FROM sequences").fetchall())
+            ids = []
+            for source in sources:
+                next_id = next_ids.get(source, 0)
+                ids.append((source << SOURCE_SHIFT) | next_id)
+                next_ids[source] = next_id + 1
+            self.connection.executemany("INSERT OR REPLACE INTO sequences (source, next_id) VALUES (?, ?)",
+                                        list(next_ids.items()))
+        return ids
+
+    def add(self, faiss_ids: List[int], doc_ids: List[str], documents: List[Document]):
+        with self._lock:
+            self.connection.executemany(
+                "INSERT INTO documents (faiss_id, doc_id, content, metadata) VALUES (?, ?, ?, ?)",
+                [(faiss_id, doc_id, document.page_content, json.dumps(document.metadata, default=str))
+                 for faiss_id, doc_id, document in zip(faiss_ids, doc_ids, documents)],
+            )
+            self.connection.executemany(
+                "INSERT INTO documents_fts (rowid, content) VALUES (?, ?)",
+                [(faiss_id, document.page_content) for faiss_id, document in zip(faiss_ids, documents)],
+            )
+            self.connection.executemany("INSERT INTO lookup_keys (key, faiss_id) VALUES (?, ?)", [
+                (key, faiss_id) for faiss_id, document in zip(faiss_ids, documents)
+                for key in lookup_keys(document.metadata)
+            ])
+
+    def _select(self, column: str, values: list, fields: str):
+        rows = []
+        with self._lock:
+            for start in range(0, len(values), 500):
+                chunk = values[start:start + 500]
+                rows.extend(self.connection.execute(
+                    f"SELECT {fields} FROM documents WHERE {column} IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+        return rows
+
+    def get(self, faiss_ids: List[int]) -> Dict[int, Document]:
+        rows = self._select("faiss_id", list(faiss_ids), "faiss_id, doc_id, content, metadata")
+        return {faiss_id: Document(id=doc_id, page_content=content, metadata=json.loads(metadata))
+                for faiss_id, doc_id, content, metadata in rows}
+
+    def live_ids(self, faiss_ids: List[int]) -> List[int]:
+        return [row[0] for row in self._select("faiss_id", list(faiss_ids), "faiss_id")]
+
+    def faiss_ids(self, doc_ids: Iterable[str]) -> Dict[str, int]:
+        return {doc_id: faiss_id for doc_id, faiss_id in self._select("doc_id", list(doc_ids), "doc_id, faiss_id")}
+
+    def delete(self, faiss_ids: List[int]):
+        with self._lock:
+            params = [(i,) for i in faiss_ids]
+            # External-content FTS5 tables need the old text to remove its postings.
+            self.connection.executemany(
+                "INSERT INTO documents_fts (documents_fts, rowid, content)"
+                " SELECT 'delete', faiss_id, content FROM documents WHERE faiss_id = ?", params
+            )
+            self.connection.executemany("DELETE FROM lookup_keys WHERE faiss_id = ?", params)
+            self.connection.executemany("DELETE FROM documents WHERE faiss_id = ?", params)
+
+    def lookup(self, keys: List[str]) -> List[tuple]:
+        """
+        (key, faiss_id) pairs of the documents with any of the exact lookup `keys`.
+        """
+        if not keys:
+            return []
+        with self._lock:
+            return self.connection.execute(
+                f"SELECT key, faiss_id FROM lookup_keys WHERE key IN ({','.join('?' * len(keys))})"
+                " ORDER BY faiss_id", list(keys)
+            ).fetchall()
+
+    def bm25_search(self, query: str, k: int, id_range=None) -> List[tuple]:
+        """
+        Return up to `k` (faiss_id, score) pairs ranked by BM25, any query term
+        matching; lower scores are better, as with FTS5's bm25().
+        """
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+        match = " OR ".join('"' + term + '"' for term in dict.fromkeys(terms))
+        sql = "SELECT rowid, bm25(documents_fts) FROM documents_fts WHERE documents_fts MATCH ?"
+        params = [match]
+        if id_range:
+            sql += " AND rowid >= ? AND rowid < ?"
+            params.extend(id_range)
+        with self._lock:
+            return self.connection.execute(sql + " ORDER BY bm25(documents_fts) LIMIT ?", params + [k]).fetchall()
+
+    def distinct_metadata(self, fields: List[str], id_range=None) -> List[tuple]:
+        """
+        Distinct combinations of the metadata `fields`, sorted, over all documents or an id range.
+        """
+        columns = ", ".join(f"json_extract(metadata, '$.{field}')" for field in fields)
+        sql = f"SELECT DISTINCT {columns} FROM documents"
+        params = []
+        if id_range:
+            sql += " WHERE faiss_id >= ? AND faiss_id < ?"
+            params.extend(id_range)
+        with self._lock:
+            return self.connection.execute(f"{sql} ORDER BY {columns}", params).fetchall()
+
+    def doc_ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self.connection.execute("SELECT doc_id FROM documents ORDER BY faiss_id")]
+
+    def count(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def commit(self):
+        if self._connection is not None and not self.read_only:
+            with self._lock:
+                self._connection.commit()
+
+    def snapshot(self, path: str):
+        """
+        Copy the committed documents to a new database at `path`, without a
+        write-ahead log so that it can be opened immutable.
+        """
+        target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self.connection.backup(target)
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class FaissVectorStore(VectorStore):
+    """
+    FAISS index of a configurable type (see IndexConfig) with a SQLite
+    docstore, stored as one directory. Readers open the index memory-mapped:
+    the vectors, inverted lists and HNSW graph stay in the page cache and only
+    the id map is read into RAM. Documents are looked up lazily per search.
+
+    The writer updates the files at the top of the directory; save() then
+    publishes a snapshot of them. Readers open the latest snapshot, and as
+    nothing writes to a snapshot, a loaded reader never sees a later save.
+    """
+
+    def __init__(self, embedding: Embeddings, path: str, config: IndexConfig = None, index=None,
+                 docstore: SQLiteDocstore = None, read_only: bool = False, version: int = None):
+        self.embedding = embedding
+        self.path = path
+        # Snapshot a reader was loaded from; None for the writer.
+        self.version = version
+        self.config = config or IndexConfig()
+        self.index = index
+        self.docstore = docstore or SQLiteDocstore(os.path.join(path, DOCSTORE_FILENAME), read_only=read_only)
+        self.read_only = read_only
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return all(os.path.exists(os.path.join(path, name)) for name in (INDEX_FILENAME, DOCSTORE_FILENAME))
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True, nprobe: int = None,
+             ef_search: int = None) -> Optional["FaissVectorStore"]:
+        """
+        Open a saved store, or return None if there is none at `path`. With
+        `mmap` the store is read-only: the index of the latest snapshot is
+        memory-mapped and its docstore opened immutable. Without, the
+        writable files are opened.
+        """
+        if not cls.exists(path):
+            return None
+        version = current_snapshot(path) if mmap else None
+        # Stores saved before snapshots existed are read from the writable files.
+        directory = snapshot_path(path, version) if version is not None else path
+        config = IndexConfig()
+        config_path = os.path.join(directory, CONFIG_FILENAME)
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = IndexConfig(**json.load(file))
+        config.nprobe = nprobe or config.nprobe
+        config.ef_search = ef_search or config.ef_search
+
+        # IO_FLAG_MMAP only maps IVF inverted lists; IO_FLAG_MMAP_IFC maps the
+        # whole file, so flat codes and HNSW storage are not copied either.
+        flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        index = faiss.read_index(os.path.join(directory, INDEX_FILENAME), flags)
+        docstore = SQLiteDocstore(os.path.join(directory, DOCSTORE_FILENAME), read_only=mmap,
+                                  immutable=version is not None)
+        if version is not None:
+            # Open now: the snapshot may be pruned later, but open files stay readable.
+            docstore.connection
+        return cls(embedding, path, config, index, docstore, read_only=mmap, version=version)
+
+    @classmethod
+    def create(cls, path: str, embedding: Embeddings, config: IndexConfig = None) -> "FaissVectorStore":
+        """
+        Start an empty store at `path`, discarding any store files left there.
+        """
+        for name in (INDEX_FILENAME, DOCSTORE_FILENAME, DOCSTORE_FILENAME + "-wal", DOCSTORE_FILENAME + "-shm"):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        return cls(embedding, path, config)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: List[dict] = None,
+                   ids: List[str] = None, path: str = None, config: IndexConfig = None, **kwargs):
+        store = cls.create(path, embedding, config)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    def _inner_index(self):
+        return faiss.downcast_index(self.index.index)
+
+    def _all_vectors(self):
+        ids = faiss.vector_to_array(self.index.id_map).astype("int64")
+        return ids, self._inner_index().reconstruct_n(0, self.index.ntotal)
+
+    def _rebuild(self, index_type: str, live_only: bool = False):
+        ids, vectors = self._all_vectors()
+        if live_only:
+            live = np.asarray(self.docstore.live_ids(ids.tolist()), dtype="int64")
+            keep = np.isin(ids, live)
+            ids, vectors = ids[keep], vectors[keep]
+        index = faiss.index_factory(vectors.shape[1], self.config.factory_string(index_type))
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > self.config.train_size:
+                sample = vectors[np.random.default_rng(0).choice(len(vectors), self.config.train_size, replace=False)]
+            index.train(sample)
+        index.add_with_ids(vectors, ids)
+        self.index = index
+
+    def _maybe_upgrade(self):
+        is_flat = isinstance(self._inner_index(), faiss.IndexFlat)
+        if is_flat and self.config.needs_training and self.index.ntotal >= self.config.min_train_size:
+            self._rebuild(self.config.index_type)
+
+    def add_embeddings(self, text_embeddings: Iterable, metadatas: List[dict] = None,
+                       ids: List[str] = None) -> List[str]:
+        texts, vectors = zip(*text_embeddings)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"doc-{os.urandom(8).hex()}" for _ in texts]
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+        vectors = np.asarray(vectors, dtype="float32")
+
+        if self.index is None:
+            # Types that need training start flat until there is enough data.
+            index_type = "flat" if self.config.needs_training else self.config.index_type
+            self.index = faiss.index_factory(vectors.shape[1], self.config.factory_string(index_type))
+        faiss_ids = self.docstore.allocate_ids([SOURCE_CODES.get(m.get("source"), 0) for m in metadatas])
+        self.docstore.add(faiss_ids, ids, documents)
+        self.index.add_with_ids(vectors, np.asarray(faiss_ids, dtype="int64"))
+        self._maybe_upgrade()
+        return list(ids)
+
+    def add_texts(self, texts: Iterable[str], metadatas: List[dict] = None, ids: List[str] = None,
+                  **kwargs) -> List[str]:
+        texts = list(texts)
+        with stage("embed") as timer:
+            vectors = self.embedding.embed_documents(texts)
+            timer.add_items(len(texts))
+            if timer.enabled:
+                timer.add_tokens(sum(count_tokens(text) for text in texts))
+        with stage("index") as timer:
+            timer.add_items(len(texts))
+            return self.add_embeddings(zip(texts, vectors), metadatas, ids)
+
+    def add_documents(self, documents: List[Document], ids: List[str] = None, **kwargs) -> List[str]:
+        return self.add_texts([doc.page_content for doc in documents], [doc.metadata for doc in documents], ids=ids)
+
+    def existing_ids(self, ids: Iterable[str]) -> set:
+        return set(self.docstore.faiss_ids(ids))
+
+    def delete(self, ids: List[str] = None, **kwargs) -> bool:
+        faiss_ids = list(self.docstore.faiss_ids(ids or []).values())
+        if not faiss_ids:
+            return False
+        self.docstore.delete(faiss_ids)
+        if isinstance(self._inner_index(), faiss.IndexHNSW):
+            # HNSW graphs cannot drop vectors: searches skip ids missing from the docstore.
+            if self.index.ntotal - self.docstore.count() > MAX_TOMBSTONE_RATIO * self.index.ntotal:
+                self._rebuild("hnsw", live_only=True)
+        else:
+            self.index.remove_ids(np.asarray(faiss_ids, dtype="int64"))
+        return True
+
+    def _search_params(self, selector):
+        inner = self._inner_index()
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=max(self.config.ef_search, 1))
+        if isinstance(inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.config.nprobe)
+        return faiss.SearchParameters(sel=selector) if selector else None
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, filter: dict = None,
+                                               fetch_k: int = 20, **kwargs):
+        if self.index is None or self.index.ntotal == 0:
+            return []
+        filter = dict(filter or {})
+        selector = None
+        source = filter.get("source")
+        if isinstance(source, str) and source in SOURCE_CODES:
+            selector = faiss.IDSelectorRange(*source_id_range(filter.pop("source")))
+        # Over-fetch when results may be dropped by post-filters or tombstones.
+        search_k = max(k, fetch_k) if filter or isinstance(self._inner_index(), faiss.IndexHNSW) else k
+        with stage("search"):
+            distances, faiss_ids = self.index.search(np.asarray([embedding], dtype="float32"),
+                                                     min(search_k, self.index.ntotal),
+                                                     params=self._search_params(selector))
+            hits = [(int(i), float(d)) for i, d in zip(faiss_ids[0], distances[0]) if i != -1]
+            documents = self.docstore.get([faiss_id for faiss_id, _ in hits])
+        results = []
+        for faiss_id, distance in hits:
+            document = documents.get(faiss_id)
+            if document is None:
+                continue
+            if any(document.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            results.append((document, distance))
+            if len(results) == k:
+                break
+        return results
+
+    def lexical_search(self, query: str, k: int = 4, source: str = None) -> List[tuple]:
+        """
+        Return up to `k` (document, score) pairs ranked by BM25 without
+        embedding the query; lower scores are better.
+        """
+        with stage("lexical_search"):
+            hits = self.docstore.bm25_search(query, k, source_id_range(source) if source else None)
+            documents = self.docstore.get([faiss_id for faiss_id, _ in hits])
+        return [(documents[faiss_id], score) for faiss_id, score in hits if faiss_id in documents]
+
+    def lookup(self, keys: List[str]) -> Dict[str, List[Document]]:
+        """
+        Map each of `keys` that names documents exactly ("METHOD path", path
+        or Allure uuid) to those documents.
+        """
+        rows = self.docstore.lookup(list(dict.fromkeys(keys)))
+        documents = self.docstore.get([faiss_id for _, faiss_id in rows])
+        matches = {}
+        for key, faiss_id in rows:
+            document = documents.get(faiss_id)
+            if document is not None:
+                matches.setdefault(key, []).append(document)
+        return matches
+
+    def operations(self) -> List[tuple]:
+        """
+        Distinct (method, path) pairs of the Swagger operations in the store.
+        """
+        return self.docstore.distinct_metadata(["method", "path"], source_id_range("swagger"))
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: dict = None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict = None, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, filter, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def save(self):
+        """
+        Commit the docstore and replace the index and config files atomically,
+        then publish them as a new snapshot for readers.
+        """
+        if self.read_only:
+            raise ValueError("Cannot save a store opened read-only")
+        os.makedirs(self.path, exist_ok=True)
+        self.docstore.commit()
+        index_path = os.path.join(self.path, INDEX_FILENAME)
+        faiss.write_index(self.index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        config_path = os.path.join(self.path, CONFIG_FILENAME)
+        with open(config_path + ".tmp", "w") as file:
+            json.dump(asdict(self.config), file, indent=2)
+        os.replace(config_path + ".tmp", config_path)
+        self._publish_snapshot()
+
+    def _publish_snapshot(self):
+        version = (current_snapshot(self.path) or 0) + 1
+        directory = snapshot_path(self.path, version)
+        tmp_directory = directory + ".tmp"
+        for stale in (tmp_directory, directory):
+            shutil.rmtree(stale, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        try:
+            # The index file is replaced, never rewritten, on save, so it can be shared.
+            os.link(os.path.join(self.path, INDEX_FILENAME), os.path.join(tmp_directory, INDEX_FILENAME))
+        except OSError:
+            shutil.copyfile(os.path.join(self.path, INDEX_FILENAME), os.path.join(tmp_directory, INDEX_FILENAME))
+        shutil.copyfile(os.path.join(self.path, CONFIG_FILENAME), os.path.join(tmp_directory, CONFIG_FILENAME))
+        self.docstore.snapshot(os.path.join(tmp_directory, DOCSTORE_FILENAME))
+        os.replace(tmp_directory, directory)
+
+        current_path = os.path.join(self.path, CURRENT_FILENAME)
+        with open(current_path + ".tmp", "w") as file:
+            file.write(str(version))
+        os.replace(current_path + ".tmp", current_path)
+
+        # Readers of a pruned snapshot keep working from their open files.
+        for name in os.listdir(os.path.join(self.path, SNAPSHOTS_DIRNAME)):
+            if name.isdigit() and int(name) <= version - KEEP_SNAPSHOTS:
+                shutil.rmtree(os.path.join(self.path, SNAPSHOTS_DIRNAME, name), ignore_errors=True)
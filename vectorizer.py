@@ -1,144 +1,778 @@
 import os
+import argparse
 import json
+import hashlib
+import functools
+import itertools
+import logging
+import random
+import threading
+import time
 import requests
-from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Union
+from langchain_core.embeddings import Embeddings
 
 from dotenv import load_dotenv
 
+from allure_results import ATTACHMENT_MAX_BYTES, iter_result_files, load_json, read_attachment
+from chunking import CHUNK_MAX_TOKENS, chunk_blocks
+from coverage_matrix import COVERAGE_FILENAME, CoverageMatrix, summarize_result
+from embedding_cache import CachedEmbeddings
+from instrumentation import stage, stage_report, stage_totals, timed_iter
+from timings import TIMINGS_FILENAME, TimingRun, TimingStore
+from tokens import count_tokens
+from vector_store import FaissVectorStore, IndexConfig
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+# Validators and bodies of the fetched Swagger specs, for conditional requests.
+SWAGGER_CACHE_FILENAME = "swagger_cache.json"
+
+# Seconds to wait for a Swagger spec to connect and to send data.
+SWAGGER_TIMEOUT = float(os.getenv("SWAGGER_TIMEOUT", "10"))
+
+# Number of documents embedded and added to the index at a time; the embedding
+# scheduler splits each of these into several concurrent requests.
+DOCUMENT_BATCH_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors():
+    """
+    Errors after which an embedding request is retried with backoff. openai
+    is slow to import, so it is only imported once a request has failed.
+    """
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+        ConnectionError,
+        TimeoutError,
+    )
+
+
+def document_key(document):
+    """
+    Stable identity of a source document: Swagger path+method or Allure uuid.
+    """
+    metadata = document.metadata
+    if metadata.get("source") == "swagger":
+        return f"swagger:{metadata['method'].upper()} {metadata['path']}"
+    return f"allure:{metadata['uuid']}"
+
+
+def content_hash(chunks):
+    payload = json.dumps([[chunk.page_content, chunk.metadata] for chunk in chunks], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def swagger_operation_chunks(path, method, details, max_tokens=CHUNK_MAX_TOKENS):
+    """
+    Build the chunks of one Swagger operation, with schemas serialized compactly.
+    """
+    header = f"API Path: {path}\nMethod: {method.upper()}\n"
+    blocks = [
+        f"{header}Summary: {details.get('summary', 'No summary provided')}\n"
+        f"Description: {details.get('description', 'No description provided')}\n",
+        f"Parameters: {compact_json(details.get('parameters', []))}\n",
+        f"Request Body: {compact_json(details.get('requestBody', {}))}\n",
+        f"Responses: {compact_json(details.get('responses', {}))}\n",
+    ]
+    metadata = {"source": "swagger", "path": path, "method": method}
+    return chunk_blocks(blocks, metadata, context=header, max_tokens=max_tokens)
+
+
+def allure_result_chunks(result, results_dir, max_bytes=ATTACHMENT_MAX_BYTES, max_tokens=CHUNK_MAX_TOKENS,
+                         read_text=None):
+    """
+    Build the chunks of one Allure result, split at step and attachment
+    boundaries. An attachment identical to an earlier one of the same test
+    (repeated response headers, for example) is replaced by a reference.
+    `read_text` reads an attachment, by default from `results_dir`.
+    """
+    read_text = read_text or functools.partial(read_attachment, results_dir, max_bytes=max_bytes)
+    # Extracting labels
+    labels = result.get("labels", [])
+    feature = next((label["value"] for label in labels if label["name"] == "feature"), "No feature")
+    story = next((label["value"] for label in labels if label["name"] == "story"), "No story")
+    title = result.get("name", "No title")
+
+    # Collecting main test details
+    test_uuid = result.get("uuid")
+    start_time = result.get("start")
+    stop_time = result.get("stop")
+    duration = stop_time - start_time if start_time and stop_time else "N/A"
+
+    blocks = [
+        f"Test Name: {result.get('name')}\nStatus: {result.get('status')}\nUUID: {test_uuid}\n"
+        f"Full Name: {result.get('fullName')}\nDuration: {duration}ms\nLabels: {compact_json(labels)}\n"
+    ]
+
+    # Process each step and its attachments
+    seen_attachments = {}
+    for step in result.get("steps", []):
+        step_name = step.get("name")
+        step_start = step.get("start")
+        step_stop = step.get("stop")
+        step_duration = step_stop - step_start if step_start and step_stop else "N/A"
+        step_blocks = [f"\nStep Name: {step_name}\nStatus: {step.get('status')}\nDuration: {step_duration}ms\n"]
+
+        for attachment in step.get("attachments", []):
+            attachment_content = read_text(attachment)
+            if not attachment_content:
+                continue
+            digest = hashlib.sha256(attachment_content.encode()).digest()
+            if digest in seen_attachments:
+                step_blocks.append(f"\nAttachment ({attachment['name']}): same as {seen_attachments[digest]}\n")
+                continue
+            seen_attachments[digest] = f"{attachment['name']} of step '{step_name}'"
+            step_blocks.append(f"\nAttachment ({attachment['name']}):\n{attachment_content}\n")
+
+        # Keep a step and its attachments in one chunk unless they do not fit
+        step_text = "".join(step_blocks)
+        if count_tokens(step_text) <= max_tokens:
+            blocks.append(step_text)
+        else:
+            blocks.extend(step_blocks)
+
+    metadata = {
+        "source": "allure",
+        "uuid": test_uuid,
+        "feature": feature,
+        "story": story,
+        "title": title,
+    }
+    context = f"Test Name: {result.get('name')}\nUUID: {test_uuid}\n"
+    return chunk_blocks(blocks, metadata, context=context, max_tokens=max_tokens)
+
+
+def batched_documents(documents, size):
+    """
+    Group chunks into batches of about `size`, never splitting the chunks of
+    one source document across batches.
+    """
+    batch = []
+    for _, chunks in itertools.groupby(documents, key=document_key):
+        chunks = list(chunks)
+        if batch and len(batch) + len(chunks) > size:
+            yield batch
+            batch = []
+        batch.extend(chunks)
+    if batch:
+        yield batch
+
+
+def merge_swagger_specs(specs):
+    """
+    Merge the paths of several Swagger specs into the first one. An operation
+    defined by more than one spec keeps its first definition.
+    """
+    if len(specs) == 1:
+        return specs[0]
+    merged = dict(specs[0], paths={path: dict(methods) for path, methods in specs[0].get("paths", {}).items()})
+    for spec in specs[1:]:
+        for path, methods in spec.get("paths", {}).items():
+            operations = merged["paths"].setdefault(path, {})
+            for method, details in methods.items():
+                if method in operations and operations[method] != details:
+                    logger.warning("Keeping the first of several definitions of %s %s", method.upper(), path)
+                operations.setdefault(method, details)
+    return merged
+
+
+def iter_results_dirs(results_dirs):
+    """
+    Yield (result file, its results directory) for every directory in turn.
+    """
+    for results_dir in results_dirs:
+        for path in iter_result_files(results_dir):
+            yield path, results_dir
+
+
+def _allure_file_chunks(item, max_bytes, max_tokens):
+    """
+    Parse one result file into its chunks and a record of the file for
+    ResultRecorder: its directory, modification time and summary (None if
+    the file is unreadable). Each attachment is read once for both.
+    """
+    path, results_dir = item
+    record = {"results_dir": results_dir, "mtime_ns": 0, "summary": None}
+    try:
+        record["mtime_ns"] = os.stat(path).st_mtime_ns
+        result = load_json(path)
+    except (OSError, ValueError) as exc:
+        logger.warning("Skipping unreadable Allure result %s: %s", path, exc)
+        return [], record
+    texts = {}
+
+    def read_text(attachment):
+        if attachment["source"] not in texts:
+            texts[attachment["source"]] = read_attachment(results_dir, attachment, max_bytes)
+        return texts[attachment["source"]]
+
+    record["summary"] = summarize_result(result, read_text)
+    return allure_result_chunks(result, results_dir, max_bytes, max_tokens, read_text), record
+
+
+def _allure_file_summary(item):
+    path, results_dir = item
+    try:
+        result = load_json(path)
+    except (OSError, ValueError) as exc:
+        logger.warning("Skipping unreadable Allure result %s: %s", path, exc)
+        return None
+    # Request URLs and status codes are short, so attachments are read only in part.
+    return summarize_result(result, functools.partial(read_attachment, results_dir, max_bytes=4096))
+
+
+def _bounded_map(executor, fn, items, max_pending):
+    """
+    Like `executor.map`, but submits at most `max_pending` items ahead of the
+    consumer, so results of a huge input are never all held in memory.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class ResultRecorder:
+    """
+    Feeds the records of parsed result files into the coverage matrix and one
+    TimingRun per results directory. Both resolve endpoints against the
+    Swagger spec, which is fetched concurrently, so records are held back
+    until it is in.
+    """
+
+    def __init__(self, swagger_future):
+        self.swagger_future = swagger_future
+        self.matrix = None
+        self.runs: Dict[str, TimingRun] = {}
+        self._pending = []
+
+    def add(self, record):
+        self._pending.append(record)
+        if self.matrix is None and self.swagger_future.done() and self.swagger_future.exception() is None:
+            self.matrix = CoverageMatrix(self.swagger_future.result())
+        if self.matrix is not None:
+            self._flush()
+
+    def _flush(self):
+        for record in self._pending:
+            results_dir = record["results_dir"]
+            if results_dir not in self.runs:
+                self.runs[results_dir] = TimingRun(os.path.abspath(results_dir), self.matrix)
+            self.runs[results_dir].add(record["summary"], record["mtime_ns"])
+            if record["summary"]:
+                self.matrix.add_test(record["summary"])
+        self._pending.clear()
+
+    def finish(self, swagger_json) -> CoverageMatrix:
+        if self.matrix is None:
+            self.matrix = CoverageMatrix(swagger_json)
+        self._flush()
+        return self.matrix
+
+
+class TokenBucket:
+    """
+    Token-per-minute budget shared by all in-flight embedding requests.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self.available = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        # A request larger than the whole budget waits for a full bucket.
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                wait = (tokens - self.available) / self.rate
+            time.sleep(wait)
+
+
+@dataclass
+class EmbeddingMetrics:
+    texts: int = 0
+    tokens: int = 0
+    requests: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self):
+        return {
+            "texts": self.texts,
+            "tokens": self.tokens,
+            "requests": self.requests,
+            "retries": self.retries,
+            "seconds": round(self.seconds, 3),
+            "texts_per_second": round(self.texts / self.seconds, 1) if self.seconds else 0.0,
+            "tokens_per_second": round(self.tokens / self.seconds, 1) if self.seconds else 0.0,
+        }
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Embeddings wrapper that splits large inputs into batches bounded by both
+    text count and token count, sends up to `max_in_flight` batches at once,
+    keeps within an optional tokens-per-minute budget and retries rate-limit
+    and transient errors with jittered exponential backoff.
+    """
+
+    def __init__(self, embeddings: Embeddings, batch_size: int = 128, max_tokens_per_batch: int = 100_000,
+                 max_in_flight: int = 4, tokens_per_minute: int = None, max_retries: int = 6,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_in_flight = max_in_flight
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics = EmbeddingMetrics()
+        self._metrics_lock = threading.Lock()
+
+    @property
+    def model(self):
+        return getattr(self.embeddings, "model", None) or type(self.embeddings).__name__
+
+    def plan_batches(self, texts):
+        """
+        Group texts into batches of (indexes, token count), keeping their order.
+        """
+        batches = []
+        indexes, batch_tokens = [], 0
+        for index, text in enumerate(texts):
+            tokens = count_tokens(text)
+            if indexes and (len(indexes) >= self.batch_size or batch_tokens + tokens > self.max_tokens_per_batch):
+                batches.append((indexes, batch_tokens))
+                indexes, batch_tokens = [], 0
+            indexes.append(index)
+            batch_tokens += tokens
+        if indexes:
+            batches.append((indexes, batch_tokens))
+        return batches
+
+    def _backoff(self, attempt, exc):
+        response = getattr(exc, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _call(self, embed, texts_count, tokens):
+        for attempt in range(self.max_retries + 1):
+            if self.token_bucket:
+                self.token_bucket.acquire(tokens)
+            try:
+                result = embed()
+            except retryable_errors() as exc:
+                if attempt == self.max_retries:
+                    raise
+                with self._metrics_lock:
+                    self.metrics.retries += 1
+                delay = self._backoff(attempt, exc)
+                logger.warning("Embedding request failed (%s), retrying in %.1fs", exc, delay)
+                time.sleep(delay)
+                continue
+            with self._metrics_lock:
+                self.metrics.requests += 1
+                self.metrics.texts += texts_count
+                self.metrics.tokens += tokens
+            return result
+
+    def embed_documents(self, texts):
+        started = time.perf_counter()
+        batches = self.plan_batches(texts)
+        vectors = [None] * len(texts)
+
+        def embed_batch(batch):
+            indexes, tokens = batch
+            batch_texts = [texts[index] for index in indexes]
+            batch_vectors = self._call(lambda: self.embeddings.embed_documents(batch_texts), len(indexes), tokens)
+            for index, vector in zip(indexes, batch_vectors):
+                vectors[index] = vector
+
+        if len(batches) <= 1:
+            for batch in batches:
+                embed_batch(batch)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+                for future in [executor.submit(embed_batch, batch) for batch in batches]:
+                    future.result()
+
+        with self._metrics_lock:
+            self.metrics.seconds += time.perf_counter() - started
+        return vectors
+
+    def embed_query(self, text):
+        started = time.perf_counter()
+        vector = self._call(lambda: self.embeddings.embed_query(text), 1, count_tokens(text))
+        with self._metrics_lock:
+            self.metrics.seconds += time.perf_counter() - started
+        return vector
+
 
 class CombinedVectorizer:
-    def __init__(self, swagger_url: str, allure_results_dir: str, vector_db_path: str):
-        self.swagger_url = swagger_url
-        self.allure_results_dir = allure_results_dir
+    def __init__(self, swagger_url: Union[str, List[str]], allure_results_dir: Union[str, List[str]],
+                 vector_db_path: str, embeddings=None, max_workers: int = None, use_processes: bool = False,
+                 attachment_max_bytes: int = ATTACHMENT_MAX_BYTES, batch_size: int = DOCUMENT_BATCH_SIZE,
+                 chunk_max_tokens: int = CHUNK_MAX_TOKENS, index_config: IndexConfig = None,
+                 swagger_timeout: float = SWAGGER_TIMEOUT):
+        # Several specs are merged into one; several result directories are read in turn.
+        self.swagger_urls = [swagger_url] if isinstance(swagger_url, str) else list(swagger_url)
+        self.allure_results_dirs = ([allure_results_dir] if isinstance(allure_results_dir, str)
+                                    else list(allure_results_dir))
+        self.swagger_url = self.swagger_urls[0]
+        self.allure_results_dir = self.allure_results_dirs[0]
         self.vector_db_path = vector_db_path
-        self.embeddings = OpenAIEmbeddings()
+        self.scheduler = None
+        self._embeddings = embeddings
+        self.manifest_path = os.path.join(vector_db_path, MANIFEST_FILENAME)
+        self.swagger_cache_path = os.path.join(vector_db_path, SWAGGER_CACHE_FILENAME)
+        self.swagger_timeout = swagger_timeout
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.use_processes = use_processes
+        self.attachment_max_bytes = attachment_max_bytes
+        self.batch_size = batch_size
+        self.chunk_max_tokens = chunk_max_tokens
+        self.index_config = index_config or IndexConfig()
+        self.fetched_swagger = None
+        self._session = None
+
+    @property
+    def embeddings(self):
+        # Created on first use: a dry run never embeds, and langchain_openai is slow to import.
+        if self._embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+
+            # The scheduler owns batching and retries, so the client itself does not retry.
+            self.scheduler = EmbeddingScheduler(OpenAIEmbeddings(max_retries=0))
+            self._embeddings = CachedEmbeddings(self.scheduler)
+        return self._embeddings
+
+    @property
+    def session(self):
+        # One session for every spec, so connections to the same host are reused.
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    def load_swagger_cache(self):
+        try:
+            with open(self.swagger_cache_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save_swagger_cache(self, cache):
+        tmp_path = self.swagger_cache_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(cache, file)
+        os.replace(tmp_path, self.swagger_cache_path)
+
+    def fetch_swagger_source(self, url, cached=None):
+        """
+        Fetch one spec, revalidating `cached` (a previous result of this
+        method) with its ETag and Last-Modified instead of downloading the
+        spec again when it has not changed.
+        """
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        response = self.session.get(url, headers=headers, timeout=self.swagger_timeout)
+        if response.status_code == 304 and cached:
+            return cached
+        if response.status_code != 200:
+            raise ValueError(f"Failed to fetch Swagger JSON from {url}: {response.status_code}")
+        return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                "spec": response.json()}
 
     def fetch_swagger_json(self):
-        response = requests.get(self.swagger_url)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise ValueError(f"Failed to fetch Swagger JSON: {response.status_code}")
+        """
+        Fetch every Swagger source at once and merge them. The responses are
+        kept in `fetched_swagger` for process_and_store to save as the cache.
+        """
+        cache = self.load_swagger_cache()
+        with ThreadPoolExecutor(max_workers=len(self.swagger_urls)) as executor:
+            entries = list(executor.map(lambda url: self.fetch_swagger_source(url, cache.get(url)),
+                                        self.swagger_urls))
+        self.fetched_swagger = dict(zip(self.swagger_urls, entries))
+        return merge_swagger_specs([entry["spec"] for entry in entries])
 
+    def _fetch_swagger_timed(self):
+        with stage("fetch"):
+            return self.fetch_swagger_json()
 
     def vectorize_swagger(self, swagger_json):
         documents = []
         for path, methods in swagger_json.get("paths", {}).items():
             for method, details in methods.items():
-                summary = details.get("summary", "No summary provided")
-                description = details.get("description", "No description provided")
-                request_body = details.get("requestBody", {})
-                responses = details.get("responses", {})
-                parameters = details.get("parameters", [])
-
-                # Consolidate all relevant information into one document
-                doc_content = f"""
-                API Path: {path}
-                Method: {method.upper()}
-                Summary: {summary}
-                Description: {description}
-                Parameters: {json.dumps(parameters, indent=2)}
-                Request Body: {json.dumps(request_body, indent=2)}
-                Responses: {json.dumps(responses, indent=2)}
-                """
-                doc_metadata = {"source": "swagger", "path": path, "method": method}
-                documents.append(Document(page_content=doc_content, metadata=doc_metadata))
+                # Path-level keys such as shared "parameters" are not operations
+                if isinstance(details, dict):
+                    documents.extend(swagger_operation_chunks(path, method, details, self.chunk_max_tokens))
         return documents
 
+    def iter_allure_results(self):
+        """
+        Yield parsed Allure results one at a time, parsing files in the worker pool.
+        """
+        with self._executor() as executor:
+            paths = (path for path, _ in iter_results_dirs(self.allure_results_dirs))
+            yield from _bounded_map(executor, load_json, paths, self.max_workers * 4)
+
     def fetch_allure_results(self):
-        allure_results = []
-        for root, _, filenames in os.walk(self.allure_results_dir):
-            for filename in filenames:
-                if filename.endswith("-result.json"):
-                    filepath = os.path.join(root, filename)
-                    with open(filepath, "r") as file:
-                        allure_results.append(json.load(file))
-        return allure_results
+        return list(self.iter_allure_results())
 
     def load_attachment(self, source):
-        attachment_path = os.path.join(self.allure_results_dir, source)
-        if os.path.exists(attachment_path):
-            with open(attachment_path, "r") as file:
-                return file.read()
-        return None
-
+        return read_attachment(self.allure_results_dir, {"source": source}, self.attachment_max_bytes)
 
     def vectorize_allure_results(self, allure_results):
-        documents = []
-        for result in allure_results:
-            # Extracting labels
-            labels = result.get("labels", [])
-            feature = next((label["value"] for label in labels if label["name"] == "feature"), "No feature")
-            story = next((label["value"] for label in labels if label["name"] == "story"), "No story")
-            title = result.get("name", "No title")
-
-            # Collecting main test details
-            test_name = result.get("name")
-            test_status = result.get("status")
-            test_uuid = result.get("uuid")
-            test_fullname = result.get("fullName")
-            labels_text = json.dumps(labels, indent=2)
-            start_time = result.get("start")
-            stop_time = result.get("stop")
-            duration = stop_time - start_time if start_time and stop_time else "N/A"
-
-            # Start creating the full test context
-            full_test_content = f"Test Name: {test_name}\nStatus: {test_status}\nUUID: {test_uuid}\nFull Name: {test_fullname}\nDuration: {duration}ms\nLabels: {labels_text}\n"
-
-            # Process each step and its attachments
-            for step in result.get("steps", []):
-                step_name = step.get("name")
-                step_status = step.get("status")
-                step_start = step.get("start")
-                step_stop = step.get("stop")
-                step_duration = step_stop - step_start if step_start and step_stop else "N/A"
-
-                full_test_content += f"\nStep Name: {step_name}\nStatus: {step_status}\nDuration: {step_duration}ms\n"
-
-                for attachment in step.get("attachments", []):
-                    attachment_content = self.load_attachment(attachment["source"])
-                    if attachment_content:
-                        full_test_content += f"\nAttachment ({attachment['name']}):\n{attachment_content}\n"
-
-            # Finalize the document content
-            doc_metadata = {
-                "source": "allure",
-                "uuid": test_uuid,
-                "feature": feature,
-                "story": story,
-                "title": title,
-            }
-            documents.append(Document(page_content=full_test_content, metadata=doc_metadata))
+        return [
+            chunk
+            for result in allure_results
+            for chunk in allure_result_chunks(result, self.allure_results_dir, self.attachment_max_bytes,
+                                              self.chunk_max_tokens)
+        ]
 
-        return documents
+    def iter_allure_documents(self, on_record=None):
+        """
+        Yield the chunks of every Allure result, parsing results and reading
+        their attachments in the worker pool with a bounded number of files in
+        flight. Chunks of one result are yielded together, after passing the
+        record of its file to `on_record`.
+        """
+        parse = functools.partial(_allure_file_chunks, max_bytes=self.attachment_max_bytes,
+                                  max_tokens=self.chunk_max_tokens)
+        with self._executor() as executor:
+            for chunks, record in _bounded_map(executor, parse, iter_results_dirs(self.allure_results_dirs),
+                                               self.max_workers * 4):
+                if on_record:
+                    on_record(record)
+                yield from chunks
+
+    def build_coverage(self, swagger_json):
+        """
+        Compute the coverage matrix of the Swagger operations by the Allure
+        results on their own, reading results in the worker pool. An ingest
+        builds it from the records of its single pass instead.
+        """
+        with self._executor() as executor:
+            records = _bounded_map(executor, _allure_file_summary, iter_results_dirs(self.allure_results_dirs),
+                                   self.max_workers * 4)
+            return CoverageMatrix.build(swagger_json, (record for record in records if record))
+
+    def _executor(self):
+        if self.use_processes:
+            return ProcessPoolExecutor(max_workers=self.max_workers)
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def load_manifest(self):
+        # The manifest maps each document key to its content hash and the ids
+        # of its vectors in the index; `version` increases on every change.
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as file:
+                return json.load(file)
+        return {"version": 0, "documents": {}}
+
+    def save_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def load_vector_store(self):
+        return FaissVectorStore.load(self.vector_db_path, self.embeddings, mmap=False)
 
     def store_vectors(self, documents):
-        vector_store = FAISS.from_documents(documents, self.embeddings)
-        vector_store.save_local(self.vector_db_path)
+        return self.store_vector_batches([documents])
+
+    def store_vector_batches(self, batches):
+        """
+        Bring the index in line with the documents of `batches`, embedding only
+        new or changed ones and deleting vectors of documents that changed or
+        disappeared. Batches are embedded as they arrive, so only one batch of
+        documents is held in memory at a time.
+        """
+        vector_store = self.load_vector_store()
+        manifest = self.load_manifest() if vector_store else {"version": 0, "documents": {}}
+        indexed = manifest["documents"]
+        seen = set()
+        modified = False
+
+        for documents in batches:
+            current = {}
+            for document in documents:
+                current.setdefault(document_key(document), []).append(document)
+            seen.update(current)
+            hashes = {key: content_hash(chunks) for key, chunks in current.items()}
+            changed = [key for key in current if indexed.get(key, {}).get("hash") != hashes[key]]
+            if not changed:
+                continue
+
+            chunk_ids = {key: [f"{key}#{index}" for index in range(len(current[key]))] for key in changed}
+            new_ids = [chunk_id for key in changed for chunk_id in chunk_ids[key]]
+            new_docs = [chunk for key in changed for chunk in current[key]]
+            stale_ids = [doc_id for key in changed if key in indexed for doc_id in indexed[key]["ids"]]
+            if vector_store:
+                # Also drop vectors written by a run that did not get to save the manifest.
+                vector_store.delete(list(dict.fromkeys(stale_ids + new_ids)))
+            else:
+                vector_store = FaissVectorStore.create(self.vector_db_path, self.embeddings, self.index_config)
+            vector_store.add_documents(new_docs, ids=new_ids)
+
+            for key in changed:
+                indexed[key] = {"hash": hashes[key], "ids": chunk_ids[key]}
+            modified = True
+
+        removed = [key for key in indexed if key not in seen]
+        if removed:
+            vector_store.delete([doc_id for key in removed for doc_id in indexed.pop(key)["ids"]])
+            modified = True
+
+        if modified:
+            manifest["version"] += 1
+            vector_store.save()
+            self.save_manifest(manifest)
         return vector_store
 
+    def swagger_batches(self, swagger_future):
+        """
+        Yield the Swagger documents once the spec fetched by `swagger_future` is in.
+        """
+        swagger_json = swagger_future.result()
+        with stage("parse") as timer:
+            swagger_docs = self.vectorize_swagger(swagger_json)
+            timer.add_items(len(swagger_docs))
+        yield swagger_docs
+
     def process_and_store(self):
-        # Fetch and vectorize Swagger data
-        swagger_json = self.fetch_swagger_json()
-        swagger_docs = self.vectorize_swagger(swagger_json)
+        os.makedirs(self.vector_db_path, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=1) as fetcher:
+            # The Swagger spec is fetched while Allure results are parsed and
+            # embedded, and its documents are stored last. Should the fetch fail,
+            # the embeddings already computed stay in the embedding cache.
+            swagger_future = fetcher.submit(self._fetch_swagger_timed)
+
+            # Stream Allure results and store every batch of documents as it is
+            # ready; the same pass records the coverage and timings of each result.
+            recorder = ResultRecorder(swagger_future)
+            allure_batches = timed_iter(batched_documents(self.iter_allure_documents(recorder.add), self.batch_size),
+                                        "parse")
+            vector_store = self.store_vector_batches(
+                itertools.chain(allure_batches, self.swagger_batches(swagger_future)))
+            swagger_json = swagger_future.result()
+        # Validators for conditional requests on the next run; a dry run leaves them alone.
+        if self.fetched_swagger:
+            self.save_swagger_cache(self.fetched_swagger)
 
-        # Fetch and vectorize Allure results
-        allure_results = self.fetch_allure_results()
-        allure_docs = self.vectorize_allure_results(allure_results)
+        # Cross-reference endpoints and tests without an LLM
+        with stage("coverage"):
+            recorder.finish(swagger_json).save(os.path.join(self.vector_db_path, COVERAGE_FILENAME))
 
-        # Combine all documents and store them
-        all_docs = swagger_docs + allure_docs
-        self.store_vectors(all_docs)
+        # Keep the test and step timings of this run for speed and latency questions
+        with stage("timings"):
+            timings = TimingStore.load(os.path.join(self.vector_db_path, TIMINGS_FILENAME))
+            ingested = [timings.add_run(timing_run) for timing_run in recorder.runs.values()]
+            if any(ingested):
+                timings.save()
+        if self.scheduler:
+            logger.info("Embedding metrics: %s", self.scheduler.metrics.as_dict())
+        return vector_store
 
+    def dry_run(self):
+        """
+        Parse every source as an ingest would and report the documents, chunks
+        and tokens per source, and how many of them changed since the last
+        ingest according to the manifest, without embedding or writing anything.
+        """
+        indexed = self.load_manifest()["documents"]
+        report = {source: {"documents": 0, "chunks": 0, "tokens": 0} for source in ("swagger", "allure", "changed")}
+        seen = set()
 
-if __name__ == "__main__":
-    swagger_url = "http://127.0.0.1:8000/openapi.json"
-    allure_results_dir = "./allure-results"
-    vector_db_path = "./combined_vector_db"
+        def count(documents):
+            for key, chunks in itertools.groupby(documents, key=document_key):
+                chunks = list(chunks)
+                with stage("tokens") as timer:
+                    tokens = sum(count_tokens(chunk.page_content) for chunk in chunks)
+                    timer.add_items(len(chunks))
+                totals = [report[chunks[0].metadata["source"]]]
+                if indexed.get(key, {}).get("hash") != content_hash(chunks):
+                    totals.append(report["changed"])
+                for total in totals:
+                    total["documents"] += 1
+                    total["chunks"] += len(chunks)
+                    total["tokens"] += tokens
+                seen.add(key)
+
+        with ThreadPoolExecutor(max_workers=1) as fetcher:
+            swagger_future = fetcher.submit(self._fetch_swagger_timed)
+            for batch in timed_iter(batched_documents(self.iter_allure_documents(), self.batch_size), "parse"):
+                count(batch)
+            for batch in self.swagger_batches(swagger_future):
+                count(batch)
+        report["removed"] = {"documents": len(set(indexed) - seen)}
+        return report
 
-    vectorizer = CombinedVectorizer(swagger_url, allure_results_dir, vector_db_path)
-    vectorizer.process_and_store()
\ No newline at end of file
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest Swagger specs and Allure results into the vector index.")
+    parser.add_argument("--swagger-url", nargs="+", default=["http://127.0.0.1:8000/openapi.json"],
+                        help="Swagger specs to merge")
+    parser.add_argument("--allure-results", nargs="+", default=["./allure-results"],
+                        help="Allure results directories to ingest")
+    parser.add_argument("--vector-db", default="./combined_vector_db")
+    parser.add_argument("--workers", type=int, help="Parsing workers (default: CPU count + 4, at most 32)")
+    parser.add_argument("--processes", action="store_true", help="Parse in processes instead of threads")
+    parser.add_argument("--timeout", type=float, default=SWAGGER_TIMEOUT, help="Swagger request timeout in seconds")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report document and token counts and stage timings without embedding")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    vectorizer = CombinedVectorizer(args.swagger_url, args.allure_results, args.vector_db,
+                                    max_workers=args.workers, use_processes=args.processes,
+                                    swagger_timeout=args.timeout)
+    with stage_report("Ingest stage timings"):
+        if args.dry_run:
+            report = vectorizer.dry_run()
+            report["stages"] = stage_totals()
+            print(json.dumps(report, indent=2))
+        else:
+            vectorizer.process_and_store()
+
+
+if __name__ == "__main__":
+    main()